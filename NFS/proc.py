@@ -1,4 +1,4 @@
-from typing import Tuple, Optional, Union
+from typing import List, Tuple, Optional, Union
 
 from .fattr import FileAttribute
 from .fhandle import FileHandle
@@ -26,6 +26,10 @@ class NFSPROC:
     REMOVE_RET_TYPE = Stat
     MKDIR_RET_TYPE = Tuple[Stat, Optional[FileHandle], Optional[FileAttribute]]
     RMDIR_RET_TYPE = Stat
+    READDIR_RET_TYPE = Tuple[Stat, Optional[List[Tuple[str, str]]],
+                             Optional[bool]]
+    READV_RET_TYPE = Tuple[Stat, Optional[FileAttribute], Optional[List[str]]]
+    WRITEV_RET_TYPE = Tuple[Stat, Optional[FileAttribute]]
 
     def getattr(self, fhandle: FileHandle) -> GETATTR_RET_TYPE:
         pass
@@ -41,6 +45,22 @@ class NFSPROC:
             -> WRITE_RET_TYPE:
         pass
 
+    def readv(self, fhandle: FileHandle, segments: List[Tuple[int, int]]) \
+            -> READV_RET_TYPE:
+        """
+        Vectored READ: reads every (offset, count) segment of one file, and
+        replies with the content of each segment in order.
+        """
+        pass
+
+    def writev(self, fhandle: FileHandle, segments: List[Tuple[int, str]]) \
+            -> WRITEV_RET_TYPE:
+        """
+        Vectored WRITE: writes every (offset, data) segment of one file in
+        order, as a single procedure.
+        """
+        pass
+
     def create(self, fhandle: FileHandle, name: str) -> CREATE_RET_TYPE:
         pass
 
@@ -53,3 +73,14 @@ class NFSPROC:
     def rmdir(self, fhandle: FileHandle, name: str) -> RMDIR_RET_TYPE:
         pass
 
+    def readdir(self, fhandle: FileHandle, cookie: str, count: int) \
+            -> READDIR_RET_TYPE:
+        """
+        Lists a directory in pages. Each entry is a (name, cookie) pair; a
+        following call passing the cookie of the last entry resumes after it,
+        and the empty string starts from the beginning. The cookie is opaque
+        to the client. count bounds the size of the reply in bytes, and the
+        final boolean tells whether the listing is complete.
+        """
+        pass
+
@@ -9,6 +9,7 @@ class Stat(Enum):
 
     NFS_OK = 0
     NFSERR_NOENT = 2
+    NFSERR_IO = 5
     NFSERR_EXIST = 17
     NFSERR_NOTDIR = 20
     NFSERR_ISDIR = 21
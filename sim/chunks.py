@@ -0,0 +1,92 @@
+from threading import Lock
+from typing import Tuple
+from weakref import WeakValueDictionary
+
+CHUNK_SIZE = 4096  # Largest chunk a file stores (see RawFile.EXTENT_SIZE)
+
+
+class Chunk:
+    """
+    Immutable run of file data. Chunks are interned (see ChunkTable), so two
+    chunks with the same content are the same object, and comparing chunks
+    is a pointer comparison.
+    """
+
+    __slots__ = ('data', '_blocks', '__weakref__')
+
+    def __init__(self, data: str):
+        self.data = data
+        self._blocks = None
+
+    def __len__(self):
+        return len(self.data)
+
+    def blocks(self) -> Tuple["Chunk", ...]:
+        """
+        :return: The chunks of every CHUNK_SIZE bytes of the data, as files
+        store it. They are interned once, so filling many files with one
+        large chunk does not hash the data again.
+        """
+        if len(self.data) <= CHUNK_SIZE:
+            return (self,)
+        if self._blocks is None:
+            self._blocks = tuple(intern(self.data[i:i + CHUNK_SIZE])
+                                 for i in range(0, len(self.data), CHUNK_SIZE))
+        return self._blocks
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return intern, (self.data,)
+
+
+class ChunkTable:
+    """
+    Process-wide table of the live chunks, addressed by their content. Every
+    file of every server in the process that holds the same data in a block
+    shares one chunk, e.g. the same "121212" written by thousands of
+    different schedules. Files store at most CHUNK_SIZE bytes per chunk, so
+    interning the data of a write hashes at most a block for every block it
+    touches. The table only holds weak references, so a chunk is dropped
+    as soon as the last file pointing at it is changed or freed.
+    """
+
+    def __init__(self):
+        self._chunks = WeakValueDictionary()  # data -> Chunk
+        self._lock = Lock()
+
+        # Statistics
+        self.hits = 0    # Interned data that was already live
+        self.misses = 0  # Interned data that created a new chunk
+
+    def intern(self, data: str) -> Chunk:
+        """
+        :return: The live chunk holding data, created if there is none
+        """
+        with self._lock:
+            chunk = self._chunks.get(data)
+            if chunk is not None:
+                self.hits += 1
+                return chunk
+            self.misses += 1
+            chunk = Chunk(data)
+            self._chunks[data] = chunk
+            return chunk
+
+    def stats(self) -> dict:
+        return {'live': len(self._chunks), 'hits': self.hits,
+                'misses': self.misses}
+
+    def __len__(self):
+        return len(self._chunks)
+
+
+CHUNKS = ChunkTable()  # Shared by every server in the process
+
+
+def intern(data: str) -> Chunk:
+    return CHUNKS.intern(data)
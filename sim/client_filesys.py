@@ -1,12 +1,14 @@
 from collections import deque
-from typing import Generator, Tuple, Optional, Union
+from functools import lru_cache
+from typing import Generator, List, Tuple, Optional, Union, Any, Callable
 
 from NFS.proc import NFSPROC
 from NFS.fattr import FileAttribute
 from NFS.fhandle import FileHandle
 from NFS.stat import Stat
 from .server import Server
-from .request import Request
+from .request import Request, Await
+from .dnlc import NameCache
 
 
 class ClientFileSystem:
@@ -23,6 +25,7 @@ class ClientFileSystem:
     """
 
     MAX_FILES = 100  # Maximum number of files
+    READDIR_COUNT = 4096  # Maximum size of each READDIR reply in bytes
 
     class File:
         """
@@ -36,12 +39,42 @@ class ClientFileSystem:
             self.fhandle = fhandle
             self.fname = fname
 
-    def __init__(self, server: Server):
+    def __init__(self, server: Server, client_id=None, dnlc_size: int = 0,
+                 dnlc_timeout: int = 16, tracer=None):
+        """
+        :param server: Server the client sends its requests to, or a
+        ShardedServer (see sim.shard) to route each request to its shard
+        :param client_id: Id of the client in duplicate request cache keys,
+        or None to take the next id of the server (see Server.new_client_id)
+        :param dnlc_size: Capacity of the name lookup cache (see NameCache),
+        or 0 to look up every open on the server
+        :param dnlc_timeout: Number of requests this client sends before a
+        cached name expires. The cache runs on this logical clock so that
+        the client stays deterministic under simulation.
+        :param tracer: Tracer (see sim.metrics) that records every request of
+        this client as it is served
+        """
         self.server = server
         self.file_descriptors = {}
         self.available_fds = deque(range(ClientFileSystem.MAX_FILES))
         self.attribute_cache = {}
 
+        if client_id is None:
+            client_id = server.new_client_id()
+        self.client_id = client_id
+        self.xid = 0  # Transaction id of the last request sent
+        self.tracer = tracer
+
+        # Requests sent by read_async and write_async that were not waited
+        # for, by token: (request, function that completes the operation)
+        self.outstanding = {}
+        self._next_token = 0
+
+        self.dnlc = None
+        if dnlc_size > 0:
+            self.dnlc = NameCache(dnlc_size, dnlc_timeout,
+                                  clock=lambda: self.xid)
+
     def open(self, path: str) -> Generator[
             Request, NFSPROC.LOOKUP_RET_TYPE, int]:
         """
@@ -49,19 +82,46 @@ class ClientFileSystem:
         :param path: "/" delimited absolute path to the file to be opened
         :return: -1 if the filename is not found, otherwise a file descriptor
         """
-        parts = path.strip().split('/')
-        fname = parts[-1]
-
-        fhandle = FileHandle(parts[1:-1])  # Absolute paths start with /
-        req = Request(Request.Type.LOOKUP, self.server.lookup, fhandle, fname)
+        parent, fname = ClientFileSystem.__split(path)
+
+        if self.dnlc is not None:
+            cached = self.dnlc.get(parent, fname)
+            if cached is NameCache.NEGATIVE:
+                return -1
+            if cached is not None:
+                return self.__local_create_fd(*cached, fname)
+
+        fhandle = FileHandle(list(parent))  # Absolute paths start with /
+        req = self.__request(Request.Type.LOOKUP,
+                             self.server.route([*parent, fname]).lookup,
+                             fhandle, fname)
         resp = yield req
 
         if len(resp) == 1:  # The file is not found
+            if self.dnlc is not None and resp[0] == Stat.NFSERR_NOENT:
+                self.dnlc.put_negative(parent, fname)
             return -1  # Invalid file descriptor
 
         _, fhandle, fattr = resp
+        if self.dnlc is not None:
+            self.dnlc.put(parent, fname, fhandle, fattr)
         return self.__local_create_fd(fhandle, fattr, fname)
 
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def __split(path: str) -> Tuple[Tuple[str, ...], str]:
+        """
+        :return: The path of the parent directory and the last name of a "/"
+        delimited absolute path
+        """
+        parts = path.strip().split('/')
+        return tuple(parts[1:-1]), parts[-1]
+
+    def __request(self, type: Request.Type, func, *args) -> Request:
+        self.xid += 1
+        return Request(type, func, *args, client=self.client_id, xid=self.xid,
+                       tracer=self.tracer)
+
     def __local_create_fd(self, fhandle: FileHandle, fattr: FileAttribute,
                           fname: str) -> int:
         if not len(self.available_fds):
@@ -106,7 +166,9 @@ class ClientFileSystem:
         fhandle = file.fhandle
         offset = file.offset
 
-        req = Request(Request.Type.READ, self.server.read, fhandle, offset, count)
+        req = self.__request(Request.Type.READ,
+                             self.server.route(file.fhandle.path).read,
+                             fhandle, offset, count)
         resp = yield req
 
         if len(resp) == 1:
@@ -133,7 +195,9 @@ class ClientFileSystem:
         fhandle = file.fhandle
         offset = file.offset
 
-        req = Request(Request.Type.WRITE, self.server.write, fhandle, offset, s)
+        req = self.__request(Request.Type.WRITE,
+                             self.server.route(file.fhandle.path).write,
+                             fhandle, offset, s)
         resp = yield req
 
         if len(resp) == 1:
@@ -146,6 +210,147 @@ class ClientFileSystem:
 
         return True
 
+    def readv(self, fd: int, segments: List[Tuple[int, int]]) -> Generator[
+            Request, NFSPROC.READV_RET_TYPE, List[str]]:
+        """
+        Reads several ranges of the file given by fd with a single request.
+        The last accessed position of the file is neither used nor changed.
+        :param fd: File descriptor of the file to be read from
+        :param segments: (offset, count) of every range to read
+        :return: The content of every range, in order. If the read is
+        invalid, returns an empty list
+        """
+        if fd not in self.file_descriptors:
+            return []
+
+        file = self.file_descriptors[fd]
+        req = self.__request(Request.Type.READV,
+                             self.server.route(file.fhandle.path).readv,
+                             file.fhandle, [tuple(s) for s in segments])
+        resp = yield req
+
+        if len(resp) == 1:
+            return []
+
+        _, fattr, contents = resp
+        self.attribute_cache[fd] = fattr
+        return contents
+
+    def writev(self, fd: int, segments: List[Tuple[int, str]]) -> Generator[
+            Request, NFSPROC.WRITEV_RET_TYPE, bool]:
+        """
+        Writes several ranges of the file given by fd with a single request,
+        in order. The last accessed position of the file is neither used nor
+        changed.
+        :param fd: File descriptor of the file to be written
+        :param segments: (offset, data) of every range to write
+        :return: True if the write is successful, and false otherwise
+        """
+        if fd not in self.file_descriptors:
+            return False
+
+        file = self.file_descriptors[fd]
+        req = self.__request(Request.Type.WRITEV,
+                             self.server.route(file.fhandle.path).writev,
+                             file.fhandle, [tuple(s) for s in segments])
+        resp = yield req
+
+        if len(resp) == 1:
+            return False
+
+        _, fattr = resp
+        self.attribute_cache[fd] = fattr
+        return True
+
+    def write_async(self, fd: int, s: str) -> Generator[Await, Any, int]:
+        """
+        Sends a write to the file given by fd without waiting for its reply,
+        so that several writes (and reads) of this client are in flight at
+        once and the server may serve them in any order. The last accessed
+        position is advanced immediately, so consecutive writes go one after
+        the other as with write.
+        :param fd: File descriptor of the file to be written
+        :param s: String representation of the write content
+        :return: Token to pass to wait, which then gives True if the write
+        is successful and False otherwise, or -1 if fd is invalid
+        """
+        if fd not in self.file_descriptors:
+            return -1
+
+        file = self.file_descriptors[fd]
+        req = self.__request(Request.Type.WRITE,
+                             self.server.route(file.fhandle.path).write,
+                             file.fhandle, file.offset, s)
+        file.offset += len(s)
+
+        def finish(resp: NFSPROC.WRITE_RET_TYPE) -> bool:
+            if len(resp) == 1:
+                return False
+            if fd in self.attribute_cache:
+                self.attribute_cache[fd] = resp[1]
+            return True
+
+        yield Await([req])
+        return self.__track(req, finish)
+
+    def read_async(self, fd: int, count: int) -> Generator[Await, Any, int]:
+        """
+        Sends a read of count bytes from the last accessed position of the
+        file given by fd without waiting for its reply (see write_async).
+        The position is advanced by count, so consecutive reads fetch
+        consecutive ranges.
+        :return: Token to pass to wait, which then gives the content read,
+        or an empty string if the read is invalid, or -1 if fd is invalid
+        """
+        if fd not in self.file_descriptors:
+            return -1
+
+        file = self.file_descriptors[fd]
+        req = self.__request(Request.Type.READ,
+                             self.server.route(file.fhandle.path).read,
+                             file.fhandle, file.offset, count)
+        file.offset += count
+
+        def finish(resp: NFSPROC.READ_RET_TYPE) -> str:
+            if len(resp) == 1:
+                return ''
+            if fd in self.attribute_cache:
+                self.attribute_cache[fd] = resp[1]
+            return resp[2]
+
+        yield Await([req])
+        return self.__track(req, finish)
+
+    def wait(self, tokens: List[int]) -> Generator[Await, Any, list]:
+        """
+        Blocks until the requests of the given tokens are served. Blocks
+        only if some of them are still in flight.
+        :param tokens: Tokens returned by read_async and write_async
+        :return: The result of the operation of every token, in order, or
+        None for a token that is invalid or was waited for before
+        """
+        tokens = list(tokens)
+        unserved = [self.outstanding[t][0] for t in tokens
+                    if t in self.outstanding and
+                    self.outstanding[t][0].ready]
+        if unserved:
+            yield Await([], unserved)
+
+        results = []
+        for token in tokens:
+            if token not in self.outstanding:
+                results.append(None)
+                continue
+            req, finish = self.outstanding.pop(token)
+            results.append(finish(req.resp))
+        return results
+
+    def __track(self, req: Request, finish: Callable) -> int:
+        token = self._next_token
+        self._next_token += 1
+        self.outstanding[token] = req, finish
+        return token
+
     def append(self, fd: int, s: str) -> Generator[
         Request,
         Union[NFSPROC.GETATTR_RET_TYPE, NFSPROC.WRITE_RET_TYPE],
@@ -170,17 +375,20 @@ class ClientFileSystem:
 
     def create(self, path: str) -> Generator[
             Request, NFSPROC.CREATE_RET_TYPE, int]:
-        parts = path.strip().split('/')
-        fhandle = FileHandle(parts[1:-1])
-        fname = parts[-1]
+        parent, fname = ClientFileSystem.__split(path)
+        fhandle = FileHandle(list(parent))
 
-        req = Request(Request.Type.CREATE, self.server.create, fhandle, fname)
+        req = self.__request(Request.Type.CREATE,
+                             self.server.route([*parent, fname]).create,
+                             fhandle, fname)
         resp = yield req
 
         if len(resp) == 1:
             return -1
 
         _, fhandle, fattr = resp
+        if self.dnlc is not None:
+            self.dnlc.put(parent, fname, fhandle, fattr)
         return self.__local_create_fd(fhandle, fattr, fname)
 
     def remove(self, fd: int) -> Generator[
@@ -195,35 +403,87 @@ class ClientFileSystem:
         fhandle = FileHandle([*file.fhandle.path[:-1]])
         fname = file.fname
 
-        req = Request(Request.Type.REMOVE, self.server.remove, fhandle, fname)
+        req = self.__request(Request.Type.REMOVE,
+                             self.server.route(file.fhandle.path).remove,
+                             fhandle, fname)
         resp = yield req
 
         if resp != Stat.NFS_OK:
             return False
 
+        if self.dnlc is not None:
+            self.dnlc.put_negative(tuple(fhandle.path), fname)
         return self.close(fd)
 
     def mkdir(self, path: str) -> Generator[
             Request, NFSPROC.MKDIR_RET_TYPE, bool]:
-        parts = path.strip().split('/')
-        fhandle = FileHandle(parts[1:-1])
-        dirname = parts[-1]
+        parent, dirname = ClientFileSystem.__split(path)
+        fhandle = FileHandle(list(parent))
 
-        req = Request(Request.Type.MKDIR, self.server.mkdir, fhandle, dirname)
+        req = self.__request(Request.Type.MKDIR,
+                             self.server.route([*parent, dirname]).mkdir,
+                             fhandle, dirname)
         resp = yield req
 
-        return len(resp) == 3
+        if len(resp) != 3:
+            return False
+
+        if self.dnlc is not None:
+            self.dnlc.invalidate(parent, dirname)
+            self.dnlc.put(parent, dirname, *resp[1:])
+        return True
 
     def rmdir(self, path: str) -> Generator[
             Request, NFSPROC.RMDIR_RET_TYPE, bool]:
-        parts = path.strip().split('/')
-        fhandle = FileHandle(parts[1:-1])
-        dirname = parts[-1]
+        parent, dirname = ClientFileSystem.__split(path)
+        fhandle = FileHandle(list(parent))
 
-        req = Request(Request.Type.RMDIR, self.server.rmdir, fhandle, dirname)
+        req = self.__request(Request.Type.RMDIR,
+                             self.server.route([*parent, dirname]).rmdir,
+                             fhandle, dirname)
         resp = yield req
 
-        return resp == Stat.NFS_OK
+        if resp != Stat.NFS_OK:
+            return False
+
+        if self.dnlc is not None:
+            self.dnlc.invalidate(parent, dirname)
+            self.dnlc.put_negative(parent, dirname)
+        return True
+
+    def listdir(self, path: str) -> Generator[
+            Request, NFSPROC.READDIR_RET_TYPE, Optional[List[str]]]:
+        """
+        Lists the names in a directory, issuing READDIR requests page by page
+        until the server reports the end of the directory.
+        :param path: "/" delimited absolute path to the directory
+        :return: Sorted names in the directory, or None if an error occurred
+        """
+        parts = path.strip().split('/')
+        fhandle = FileHandle([p for p in parts[1:] if p])
+
+        # The root of a sharded namespace is spread over every shard
+        servers = [self.server.route(fhandle.path)]
+        if not fhandle.path:
+            servers = getattr(self.server, 'shards', servers)
+
+        names = []
+        for server in servers:
+            cookie = ''  # The empty cookie starts from the beginning
+            while True:
+                req = self.__request(Request.Type.READDIR, server.readdir,
+                                     fhandle, cookie, self.READDIR_COUNT)
+                resp = yield req
+
+                if len(resp) == 1:
+                    return None
+
+                _, entries, eof = resp
+                names.extend(name for name, _ in entries)
+                if eof or not entries:
+                    break
+                cookie = entries[-1][1]
+        return sorted(names)
 
     def size(self, fd: int) -> Generator[
             Request, NFSPROC.GETATTR_RET_TYPE, int]:
@@ -240,7 +500,9 @@ class ClientFileSystem:
         # stale cache, in that upon every operation that involves the attribute
         # of the file, we will do a new GETATTR instead of using the cached
         # attributes of the file.
-        req = Request(Request.Type.GETATTR, self.server.getattr, file.fhandle)
+        req = self.__request(Request.Type.GETATTR,
+                             self.server.route(file.fhandle.path).getattr,
+                             file.fhandle)
         resp = yield req
 
         if len(resp) == 1:
@@ -0,0 +1,45 @@
+from typing import Tuple
+
+
+def encode_varint(n: int) -> bytes:
+    """
+    Encodes a non-negative integer as a LEB128 varint: 7 bits per byte, least
+    significant group first, with the high bit set on all but the last byte.
+    """
+    assert(n >= 0)
+    out = bytearray()
+    while n >= 0x80:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def decode_varint(buf, pos: int) -> Tuple[int, int]:
+    """
+    Decodes a varint written by encode_varint
+    :param buf: bytes-like object holding the varint
+    :param pos: Position of the first byte of the varint
+    :return: The decoded integer and the position just past it
+    """
+    n = 0
+    shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7f) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def zigzag(n: int) -> int:
+    """
+    Maps signed integers to non-negative ones (0, -1, 1, -2, ... to 0, 1, 2,
+    3, ...) so that small negative numbers also get short varints
+    """
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def unzigzag(n: int) -> int:
+    return n // 2 if not n & 1 else -(n + 1) // 2
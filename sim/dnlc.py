@@ -0,0 +1,112 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+
+from NFS.fattr import FileAttribute
+from NFS.fhandle import FileHandle
+
+
+class NameCache:
+    """
+    Client-side directory name lookup cache (DNLC). Maps a (parent directory
+    path, name) pair to the file handle and attributes a LOOKUP returned, or
+    to a negative entry if the name did not exist, so that repeated opens of
+    the same path need no LOOKUP.
+
+    Entries are trusted for timeout units of the clock after they were
+    filled, like the attribute cache timeouts of real NFS clients, and then
+    looked up again. Within that window the cache may be stale: a name
+    another client removed still resolves, and one it created still misses.
+    Memory is bounded by evicting the least recently used entry once the
+    cache holds capacity entries.
+    """
+
+    NEGATIVE = object()  # Cached answer for a name that does not exist
+
+    def __init__(self, capacity: int = 128, timeout: float = 3.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param capacity: Maximum number of cached names
+        :param timeout: Units of the clock after which an entry expires
+        :param clock: Source of the current time. A client in a simulation
+        passes a logical clock so that its behaviour is deterministic.
+        """
+        self.capacity = capacity
+        self.timeout = timeout
+        self.clock = clock
+
+        self._entries = OrderedDict()  # key -> (fill time, value)
+
+        # Statistics
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, parent: Tuple[str, ...], name: str):
+        """
+        :return: (file handle, attributes) of a cached name, NEGATIVE if the
+        name is cached as missing, or None on a miss
+        """
+        key = parent, name
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        filled, value = entry
+        if self.clock() - filled > self.timeout:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        if value is NameCache.NEGATIVE:
+            self.negative_hits += 1
+            return value
+
+        self.hits += 1
+        fhandle, fattr = value
+        return FileHandle(list(fhandle)), NameCache.__copy_attr(fattr)
+
+    def put(self, parent: Tuple[str, ...], name: str,
+            fhandle: FileHandle, fattr: FileAttribute):
+        value = tuple(fhandle.path), NameCache.__copy_attr(fattr)
+        self.__insert((parent, name), value)
+
+    def put_negative(self, parent: Tuple[str, ...], name: str):
+        self.__insert((parent, name), NameCache.NEGATIVE)
+
+    def invalidate(self, parent: Tuple[str, ...], name: str):
+        """
+        Drops a name and, if it is a directory, every name below it
+        """
+        self._entries.pop((parent, name), None)
+        prefix = (*parent, name)
+        for key in [k for k in self._entries
+                    if k[0][:len(prefix)] == prefix]:
+            del self._entries[key]
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'negative_hits': self.negative_hits,
+                'misses': self.misses, 'evictions': self.evictions,
+                'expirations': self.expirations, 'size': len(self._entries)}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __insert(self, key: Hashable, value):
+        self._entries[key] = (self.clock(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    @staticmethod
+    def __copy_attr(fattr: Optional[FileAttribute]) -> FileAttribute:
+        copy = FileAttribute()
+        if fattr is not None:
+            copy.__dict__.update(vars(fattr))
+        return copy
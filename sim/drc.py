@@ -0,0 +1,140 @@
+import time
+from collections import OrderedDict
+from threading import Condition
+from typing import Any, Callable, Hashable, Tuple
+
+
+class DuplicateRequestCache:
+    """
+    Server-side duplicate request cache (DRC) for the non-idempotent
+    procedures. Real NFS clients retransmit requests whose reply got lost,
+    and executing a CREATE/REMOVE/MKDIR/RMDIR a second time turns a success
+    into NFSERR_EXIST or NFSERR_NOENT. The cache remembers the reply of each
+    such request, keyed by (client id, xid, procedure), and replays it to a
+    retransmission without touching the directory tree.
+
+    Memory is bounded by evicting the least recently used entry once the
+    cache holds capacity entries, and by dropping entries older than max_age
+    seconds. A retransmission that arrives while the original is still being
+    executed waits for its reply instead of executing again. Entries being
+    executed are therefore never evicted, and the cache may briefly exceed
+    capacity by the number of requests in progress.
+
+    Only requests that carry a client id and an xid can be recognized when
+    retransmitted. Request.serve executes requests without them directly,
+    bypassing the cache, as for requests built by hand outside a
+    ClientFileSystem.
+    """
+
+    _IN_PROGRESS = object()  # Placeholder reply of a request being executed
+
+    def __init__(self, capacity: int = 1024, max_age: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param capacity: Maximum number of cached replies
+        :param max_age: Seconds after which a cached reply is dropped
+        :param clock: Source of the current time, replaceable for testing
+        """
+        self.capacity = capacity
+        self.max_age = max_age
+        self.clock = clock
+
+        self._entries = OrderedDict()  # key -> (insertion time, reply)
+        self._cond = Condition()
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def serve(self, key: Hashable, func: Callable, args: Tuple) -> Any:
+        """
+        Executes a procedure unless its reply is cached
+        :param key: (client id, xid, procedure) of the request
+        :param func: NFS procedure to execute on a miss
+        :param args: Arguments of the procedure
+        :return: The reply of the procedure
+        """
+        with self._cond:
+            while True:
+                entry = self.__lookup(key)
+                if entry is None:
+                    break
+                if entry[1] is not DuplicateRequestCache._IN_PROGRESS:
+                    self.hits += 1
+                    return entry[1]
+                self._cond.wait()
+
+            self.misses += 1
+            self.__insert(key, DuplicateRequestCache._IN_PROGRESS)
+
+        try:
+            resp = func(*args)
+        except BaseException:
+            with self._cond:
+                self._entries.pop(key, None)
+                self._cond.notify_all()
+            raise
+
+        with self._cond:
+            self.__insert(key, resp)
+            self._cond.notify_all()
+        return resp
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'size': len(self._entries)}
+
+    def __lookup(self, key: Hashable):
+        """
+        Finds a live entry and marks it as recently used. Called with _cond
+        held.
+        """
+        self.__expire()
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if entry[1] is not DuplicateRequestCache._IN_PROGRESS and \
+                self.clock() - entry[0] > self.max_age:
+            del self._entries[key]
+            self.evictions += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    def __insert(self, key: Hashable, resp: Any):
+        """
+        Called with _cond held
+        """
+        self._entries[key] = (self.clock(), resp)
+        self._entries.move_to_end(key)
+
+        # Evict from the least recently used end, skipping the requests in
+        # progress that retransmissions may be waiting on
+        excess = len(self._entries) - self.capacity
+        victims = []
+        for old, (_, old_resp) in self._entries.items():
+            if len(victims) >= excess:
+                break
+            if old_resp is not DuplicateRequestCache._IN_PROGRESS:
+                victims.append(old)
+        for old in victims:
+            del self._entries[old]
+            self.evictions += 1
+
+    def __expire(self):
+        """
+        Drops expired entries from the least recently used end. Entries
+        further in are checked individually when looked up.
+        """
+        now = self.clock()
+        while self._entries:
+            key, (inserted, resp) = next(iter(self._entries.items()))
+            if resp is DuplicateRequestCache._IN_PROGRESS or \
+                    now - inserted <= self.max_age:
+                break
+            del self._entries[key]
+            self.evictions += 1
@@ -0,0 +1,206 @@
+import json
+import mmap
+from typing import Any, Iterator, List
+
+from .codec import encode_varint, decode_varint, zigzag, unzigzag
+
+
+class Exporter:
+    """
+    Interface of a sink that receives each unique result as soon as Sim
+    finds it. Every method does nothing by default.
+    """
+
+    def write(self, result):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def result_record(result) -> dict:
+    """
+    :param result: A Sim.Result
+    :return: The record exported for the result: the responses of every
+    process, the final server state and the history that produced it
+    """
+    return {
+        'responses': result.responses,
+        'server': json.loads(result.server_json),
+        'hist': result.hist,
+    }
+
+
+class JSONLExporter(Exporter):
+    """
+    Writes one JSON object per line for every unique result
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, 'w')
+
+    def write(self, result):
+        self.file.write(json.dumps(result_record(result)) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class BinaryExporter(Exporter):
+    """
+    Writes unique results in a compact, length-prefixed binary format.
+
+    The file starts with MAGIC and is followed by records, each made of a tag
+    byte, the varint length of the payload and the payload. Every string
+    (Stat names, file names and file contents) is interned: a STRING record
+    defines it once, and later values refer to it by its index in order of
+    definition. A RESULT record holds the encoded result record, whose
+    strings are always defined by earlier STRING records.
+
+    Values are a tag byte followed by the value: NONE, FALSE, TRUE, INT (a
+    zigzag varint), STR (a varint string index), SEQ (a varint length and the
+    items) or MAP (a varint length and pairs of string index and value).
+    """
+
+    MAGIC = b'NFSR\x01'
+
+    # Record tags
+    STRING = 1
+    RESULT = 2
+
+    # Value tags
+    NONE, FALSE, TRUE, INT, STR, SEQ, MAP = range(7)
+
+    def __init__(self, path: str):
+        self.file = open(path, 'wb')
+        self.file.write(BinaryExporter.MAGIC)
+        self.strings = {}  # Interned string -> index
+
+    def write(self, result):
+        payload = bytearray()
+        new_strings = []
+        self.__encode(result_record(result), payload, new_strings)
+
+        for s in new_strings:
+            self.__write_record(BinaryExporter.STRING, s.encode('utf-8'))
+        self.__write_record(BinaryExporter.RESULT, payload)
+
+    def close(self):
+        self.file.close()
+
+    def __write_record(self, tag: int, payload):
+        self.file.write(bytes([tag]))
+        self.file.write(encode_varint(len(payload)))
+        self.file.write(payload)
+
+    def __intern(self, s: str, new_strings: List[str]) -> int:
+        if s not in self.strings:
+            self.strings[s] = len(self.strings)
+            new_strings.append(s)
+        return self.strings[s]
+
+    def __encode(self, value: Any, out: bytearray, new_strings: List[str]):
+        if value is None:
+            out.append(BinaryExporter.NONE)
+        elif isinstance(value, bool):
+            out.append(BinaryExporter.TRUE if value else BinaryExporter.FALSE)
+        elif isinstance(value, int):
+            out.append(BinaryExporter.INT)
+            out += encode_varint(zigzag(value))
+        elif isinstance(value, str):
+            out.append(BinaryExporter.STR)
+            out += encode_varint(self.__intern(value, new_strings))
+        elif isinstance(value, (list, tuple)):
+            out.append(BinaryExporter.SEQ)
+            out += encode_varint(len(value))
+            for v in value:
+                self.__encode(v, out, new_strings)
+        elif isinstance(value, dict):
+            out.append(BinaryExporter.MAP)
+            out += encode_varint(len(value))
+            for k, v in value.items():
+                out += encode_varint(self.__intern(k, new_strings))
+                self.__encode(v, out, new_strings)
+        else:
+            raise TypeError(f'Cannot export value of type {type(value)}')
+
+
+class BinaryReader:
+    """
+    Lazily iterates over the records of a file written by BinaryExporter.
+    The file is memory-mapped, and each record is only decoded when the
+    iteration reaches it. Sequences decode as tuples.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(BinaryExporter.MAGIC)] != BinaryExporter.MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not a binary result file')
+
+    def __iter__(self) -> Iterator[dict]:
+        strings = []
+        pos = len(BinaryExporter.MAGIC)
+        while pos < len(self.mm):
+            tag = self.mm[pos]
+            length, pos = decode_varint(self.mm, pos + 1)
+            end = pos + length
+
+            if tag == BinaryExporter.STRING:
+                strings.append(str(self.mm[pos:end], 'utf-8'))
+            elif tag == BinaryExporter.RESULT:
+                record, _ = BinaryReader.__decode(self.mm, pos, strings)
+                yield record
+            pos = end  # Unknown records are skipped
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def __decode(buf, pos: int, strings: List[str]):
+        tag = buf[pos]
+        pos += 1
+
+        if tag == BinaryExporter.NONE:
+            return None, pos
+        elif tag == BinaryExporter.FALSE:
+            return False, pos
+        elif tag == BinaryExporter.TRUE:
+            return True, pos
+        elif tag == BinaryExporter.INT:
+            n, pos = decode_varint(buf, pos)
+            return unzigzag(n), pos
+        elif tag == BinaryExporter.STR:
+            i, pos = decode_varint(buf, pos)
+            return strings[i], pos
+        elif tag == BinaryExporter.SEQ:
+            n, pos = decode_varint(buf, pos)
+            items = []
+            for _ in range(n):
+                item, pos = BinaryReader.__decode(buf, pos, strings)
+                items.append(item)
+            return tuple(items), pos
+        elif tag == BinaryExporter.MAP:
+            n, pos = decode_varint(buf, pos)
+            mapping = {}
+            for _ in range(n):
+                i, pos = decode_varint(buf, pos)
+                mapping[strings[i]], pos = BinaryReader.__decode(
+                    buf, pos, strings)
+            return mapping, pos
+        else:
+            raise ValueError(f'Unknown value tag {tag}')
@@ -0,0 +1,102 @@
+from xml.sax.saxutils import escape, quoteattr
+
+
+class GraphWriter:
+    """
+    Interface of a sink that receives the interleaving graph explored by Sim
+    as it is expanded. Nodes are searched histories, where histories merged
+    by the memo of Sim share one node, and edges are served requests. Every
+    node is written once, before its outgoing edges, and nothing is kept in
+    memory, so arbitrarily large graphs can be streamed to disk. Every method
+    does nothing by default.
+    """
+
+    def node(self, node_id: str, label: str, terminal: bool):
+        """
+        :param node_id: Unique id of the node
+        :param label: Schedule of the first history that reached the node
+        :param terminal: Whether every process has finished
+        """
+        pass
+
+    def edge(self, src: str, dst: str, pid: int, label: str):
+        """
+        :param pid: Process whose request was served
+        :param label: Procedure and arguments of the request
+        """
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DOTWriter(GraphWriter):
+    """
+    Streams the graph in the DOT language of Graphviz
+    """
+
+    def __init__(self, path: str, name: str = 'interleavings'):
+        self.file = open(path, 'w')
+        self.file.write(f'digraph {DOTWriter.__quote(name)} {{\n')
+        self.file.write('  node [shape=circle];\n')
+
+    def node(self, node_id: str, label: str, terminal: bool):
+        shape = ' shape=doublecircle' if terminal else ''
+        self.file.write(f'  {DOTWriter.__quote(node_id)} '
+                        f'[label={DOTWriter.__quote(label)}{shape}];\n')
+
+    def edge(self, src: str, dst: str, pid: int, label: str):
+        self.file.write(f'  {DOTWriter.__quote(src)} -> '
+                        f'{DOTWriter.__quote(dst)} '
+                        f'[label={DOTWriter.__quote(f"p{pid} {label}")}];\n')
+
+    def close(self):
+        self.file.write('}\n')
+        self.file.close()
+
+    @staticmethod
+    def __quote(s: str) -> str:
+        return '"' + s.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class GraphMLWriter(GraphWriter):
+    """
+    Streams the graph as GraphML, with the label and terminal flag of each
+    node and the process and label of each edge as data keys
+    """
+
+    HEADER = '''<?xml version="1.0" encoding="UTF-8"?>
+<graphml xmlns="http://graphml.graphdrawing.org/xmlns">
+  <key id="label" for="all" attr.name="label" attr.type="string"/>
+  <key id="terminal" for="node" attr.name="terminal" attr.type="boolean"/>
+  <key id="pid" for="edge" attr.name="pid" attr.type="int"/>
+  <graph id="interleavings" edgedefault="directed">
+'''
+
+    def __init__(self, path: str):
+        self.file = open(path, 'w')
+        self.file.write(GraphMLWriter.HEADER)
+        self.edges = 0
+
+    def node(self, node_id: str, label: str, terminal: bool):
+        self.file.write(
+            f'    <node id={quoteattr(node_id)}>'
+            f'<data key="label">{escape(label)}</data>'
+            f'<data key="terminal">{str(terminal).lower()}</data></node>\n')
+
+    def edge(self, src: str, dst: str, pid: int, label: str):
+        self.file.write(
+            f'    <edge id="e{self.edges}" source={quoteattr(src)} '
+            f'target={quoteattr(dst)}><data key="pid">{pid}</data>'
+            f'<data key="label">{escape(label)}</data></edge>\n')
+        self.edges += 1
+
+    def close(self):
+        self.file.write('  </graph>\n</graphml>\n')
+        self.file.close()
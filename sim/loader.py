@@ -0,0 +1,174 @@
+import json
+import os
+from typing import Callable, Iterable
+
+from .chunks import intern
+from .server import Server, Directory
+
+
+class NamespaceLoader:
+    """
+    Builds the initial namespace of servers in bulk. The namespace is parsed
+    once into a template tree, from a manifest, a dict or a local directory,
+    and every call to populate then creates the Directory and RawFile nodes
+    of a server directly, without going through the NFS procedures. Equal
+    file contents share one interned chunk (see sim.chunks), both within
+    the template and across all the servers populated from it, so
+    populating a server only allocates the nodes.
+
+    Manifests are either JSON, holding the nested form produced by
+    Server.to_json, or JSONL, with one entry per line such as
+    {"path": "/d/a.txt", "data": "abc"} or {"path": "/d", "type": "dir"}.
+    JSONL manifests are read line by line, so they may be larger than
+    memory allows as a single JSON document. Missing parent directories are
+    created.
+
+    To give every execution of a Sim the same initial state, pass factory()
+    as its server_factory.
+    """
+
+    def __init__(self):
+        self.tree = {}  # Name -> nested dict for a directory, Chunk for a file
+
+    def add_dir(self, path: str):
+        self.__walk(name for name in path.split('/') if name)
+
+    def add_file(self, path: str, data: str):
+        parent, name = self.__split(path)
+        directory = self.__walk(parent)
+        if isinstance(directory.get(name), dict):
+            raise ValueError(f'{path} is a directory')
+        directory[name] = intern(data)
+
+    @staticmethod
+    def from_dict(flat: dict) -> "NamespaceLoader":
+        """
+        :param flat: Nested dict as produced by Directory.flatten
+        """
+        loader = NamespaceLoader()
+        loader.tree = NamespaceLoader.__template(flat)
+        return loader
+
+    @staticmethod
+    def from_manifest(path: str) -> "NamespaceLoader":
+        """
+        :param path: JSON manifest, or JSONL manifest if the name ends in
+        .jsonl. A JSON manifest is parsed as a whole, so the file and its
+        parsed form must fit in memory; only JSONL manifests are streamed.
+        """
+        with open(path, encoding='utf-8') as f:
+            if not path.endswith('.jsonl'):
+                return NamespaceLoader.from_dict(json.load(f))
+            return NamespaceLoader.from_entries(
+                json.loads(line) for line in f if line.strip())
+
+    @staticmethod
+    def from_entries(entries: Iterable[dict]) -> "NamespaceLoader":
+        """
+        :param entries: Entries of a JSONL manifest, in any order
+        """
+        loader = NamespaceLoader()
+        for entry in entries:
+            if entry.get('type', 'file') == 'dir':
+                loader.add_dir(entry['path'])
+            else:
+                loader.add_file(entry['path'], entry.get('data', ''))
+        return loader
+
+    @staticmethod
+    def from_directory(root: str) -> "NamespaceLoader":
+        """
+        Walks a local directory. File contents are decoded as latin-1, which
+        maps every byte to one character.
+        """
+        loader = NamespaceLoader()
+        for dirpath, dirnames, filenames in os.walk(root):
+            rel = os.path.relpath(dirpath, root)
+            parts = [] if rel == os.curdir else rel.split(os.sep)
+            directory = loader.__walk(parts)
+            for name in dirnames:
+                directory.setdefault(name, {})
+            for name in filenames:
+                with open(os.path.join(dirpath, name), 'rb') as f:
+                    directory[name] = intern(f.read().decode('latin-1'))
+        return loader
+
+    def populate(self, server: Server) -> Server:
+        """
+        Replaces the whole directory tree of a server with the namespace,
+        unless the server loaded an existing image from its storage backend,
+        which is kept as is. Sync the server to keep the namespace in the
+        image.
+        :return: The server
+        :raise ValueError: If the server has a write-ahead log, which
+        replays onto the default files of a Server (see sim.wal) and would
+        not reproduce the namespace
+        """
+        if server.wal is not None:
+            raise ValueError('Cannot populate a server with a write-ahead log')
+        if not server.loaded:
+            server.root = NamespaceLoader.__build(server, self.tree)
+        return server
+
+    def factory(self, **server_kwargs) -> Callable[[], Server]:
+        """
+        :param server_kwargs: Arguments of every Server created
+        :return: A server factory for Sim that creates a fresh server holding
+        the namespace for every execution
+        """
+        return lambda: self.populate(Server(**server_kwargs))
+
+    def stats(self) -> dict:
+        files, dirs, size, chunks = 0, 0, 0, set()
+        stack = [self.tree]
+        while stack:
+            for node in stack.pop().values():
+                if isinstance(node, dict):
+                    dirs += 1
+                    stack.append(node)
+                else:
+                    files += 1
+                    size += len(node)
+                    chunks.add(id(node))
+        return {'files': files, 'dirs': dirs, 'bytes': size,
+                'unique_contents': len(chunks)}
+
+    def __walk(self, parts: Iterable[str]) -> dict:
+        """
+        :return: The template of a directory, created along with its
+        missing parents
+        """
+        directory = self.tree
+        for name in parts:
+            child = directory.setdefault(name, {})
+            if not isinstance(child, dict):
+                raise ValueError(f'{name} is a file')
+            directory = child
+        return directory
+
+    @staticmethod
+    def __split(path: str):
+        parts = [name for name in path.split('/') if name]
+        if not parts:
+            raise ValueError(f'{path} names no file')
+        return parts[:-1], parts[-1]
+
+    @staticmethod
+    def __template(flat: dict) -> dict:
+        return {name: NamespaceLoader.__template(node)
+                if isinstance(node, dict) else intern(node)
+                for name, node in flat.items()}
+
+    @staticmethod
+    def __build(server: Server, tree: dict) -> Directory:
+        directory = server._new_dir()
+        files = {}
+        for name, node in tree.items():
+            if isinstance(node, dict):
+                files[name] = NamespaceLoader.__build(server, node)
+            else:
+                file = server._new_file()
+                file.fill(node)
+                files[name] = file
+        directory.link_all(files)
+        return directory
@@ -0,0 +1,102 @@
+from contextlib import contextmanager
+from threading import Condition, Lock
+
+
+class RWLock:
+    """
+    Reader-writer lock used by the server in concurrent mode. Any number of
+    readers may hold the lock at once, while a writer holds it exclusively.
+    Waiting writers block new readers so that a steady stream of reads cannot
+    starve a mutation.
+    """
+
+    def __init__(self):
+        self._cond = Condition(Lock())
+        self._readers = 0         # Number of readers holding the lock
+        self._writer = False      # Whether a writer holds the lock
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    def acquire(self, write: bool):
+        if write:
+            self.acquire_write()
+        else:
+            self.acquire_read()
+
+    def release(self, write: bool):
+        if write:
+            self.release_write()
+        else:
+            self.release_read()
+
+    @contextmanager
+    def locked(self, write: bool = False):
+        self.acquire(write)
+        try:
+            yield
+        finally:
+            self.release(write)
+
+    def __deepcopy__(self, memo):
+        # A copied node is a new node, so it gets a fresh, unheld lock
+        return RWLock()
+
+
+class NullLock:
+    """
+    Lock with the same interface as RWLock that does nothing. Used when the
+    server is driven by a single thread (e.g. by Sim), so that the default mode
+    pays no synchronization cost.
+    """
+
+    def acquire_read(self):
+        pass
+
+    def release_read(self):
+        pass
+
+    def acquire_write(self):
+        pass
+
+    def release_write(self):
+        pass
+
+    def acquire(self, write: bool):
+        pass
+
+    def release(self, write: bool):
+        pass
+
+    @contextmanager
+    def locked(self, write: bool = False):
+        yield
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+NULL_LOCK = NullLock()
@@ -0,0 +1,296 @@
+import functools
+import math
+import os
+import time
+import types
+from collections import Counter
+from threading import Lock
+from typing import Iterator, Optional, Tuple
+
+from NFS.stat import Stat
+
+
+class LatencyHistogram:
+    """
+    Histogram of non-negative integer values (latencies in nanoseconds) in
+    fixed memory, with log-linear buckets as in HdrHistogram. Values below
+    2^PRECISION get a bucket each; above, every power of two is split into
+    2^(PRECISION-1) equal buckets, so a value is known to within about 3%
+    regardless of its magnitude. Values beyond 2^MAX_BITS go to the last
+    bucket.
+    """
+
+    PRECISION = 5
+    MAX_BITS = 40  # About 18 minutes in nanoseconds
+
+    SUB = 1 << PRECISION
+    HALF = SUB >> 1
+    SIZE = SUB + (MAX_BITS - PRECISION + 1) * HALF
+
+    def __init__(self):
+        self.counts = [0] * LatencyHistogram.SIZE
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    @staticmethod
+    def index(value: int) -> int:
+        """
+        :return: Bucket of a value
+        """
+        if value < LatencyHistogram.SUB:
+            return max(value, 0)
+        shift = value.bit_length() - LatencyHistogram.PRECISION
+        index = LatencyHistogram.SUB + (shift - 1) * LatencyHistogram.HALF + \
+            (value >> shift) - LatencyHistogram.HALF
+        return min(index, LatencyHistogram.SIZE - 1)
+
+    @staticmethod
+    def upper_bound(index: int) -> int:
+        """
+        :return: Smallest value above the bucket with the given index
+        """
+        if index < LatencyHistogram.SUB:
+            return index + 1
+        shift, sub = divmod(index - LatencyHistogram.SUB, LatencyHistogram.HALF)
+        return (LatencyHistogram.HALF + sub + 1) << (shift + 1)
+
+    def record(self, value: int):
+        self.counts[LatencyHistogram.index(value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram"):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.sum += other.sum
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q: float) -> Optional[int]:
+        """
+        :param q: Fraction of the values, from 0 to 1
+        :return: A value that at least a fraction q of the recorded values do
+        not exceed, up to the bucket width, or None if nothing was recorded
+        """
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(LatencyHistogram.upper_bound(i) - 1, self.max)
+        return self.max
+
+    def buckets(self) -> Iterator[Tuple[int, int]]:
+        """
+        :return: (upper bound, cumulative count) of every non-empty bucket
+        """
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n:
+                seen += n
+                yield LatencyHistogram.upper_bound(i), seen
+
+
+class ProcedureStats:
+    """
+    Counters of one NFS procedure
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = Counter()  # Stat name -> count
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.latency = LatencyHistogram()
+
+    def to_dict(self) -> dict:
+        hist = self.latency
+        return {
+            'calls': self.calls, 'errors': dict(self.errors),
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'latency_ns': {
+                'count': hist.count, 'sum': hist.sum,
+                'min': hist.min, 'max': hist.max,
+                'p50': hist.percentile(0.5), 'p90': hist.percentile(0.9),
+                'p99': hist.percentile(0.99),
+            },
+        }
+
+
+class Tracer:
+    """
+    Per-procedure RPC statistics: calls, errors by Stat, bytes read and
+    written, and a latency histogram.
+
+    A tracer observes a server, by wrapping the NFS procedures of the
+    instance (see instrument), which times the work of the server alone, or
+    a client (see the tracer parameter of ClientFileSystem), which times
+    every Request.serve including the duplicate request cache. Use one
+    tracer for each side to tell them apart.
+
+    Only one call in every sample_every is recorded, and all counters count
+    recorded calls. Setting enabled to False at runtime stops recording at
+    the cost of one attribute check per call; uninstrument removes the
+    wrappers altogether.
+    """
+
+    PROCS = ['getattr', 'lookup', 'read', 'write', 'create', 'remove',
+             'mkdir', 'rmdir', 'readdir', 'readv', 'writev']
+
+    def __init__(self, name: str = 'nfs', sample_every: int = 1,
+                 enabled: bool = True):
+        """
+        :param name: Prefix of the exported metric names
+        :param sample_every: Record one in every this many calls
+        :param enabled: Whether to record calls
+        """
+        assert(sample_every >= 1)
+        self.name = name
+        self.sample_every = sample_every
+        self.enabled = enabled
+        self.procs = {}  # Procedure name -> ProcedureStats
+        self._ticks = 0
+        self._lock = Lock()
+
+    def sampled(self) -> bool:
+        """
+        :return: Whether the current call is to be recorded
+        """
+        if not self.enabled:
+            return False
+        if self.sample_every == 1:
+            return True
+        with self._lock:
+            self._ticks += 1
+            return self._ticks % self.sample_every == 0
+
+    def record(self, proc: str, args: tuple, resp, elapsed_ns: int):
+        """
+        Records a call of a procedure
+        :param args: Arguments of the procedure
+        :param resp: Reply of the procedure
+        """
+        status = resp if isinstance(resp, Stat) else resp[0]
+        ok = status == Stat.NFS_OK
+        with self._lock:
+            stats = self.procs.get(proc)
+            if stats is None:
+                stats = self.procs[proc] = ProcedureStats()
+            stats.calls += 1
+            stats.latency.record(elapsed_ns)
+            if not ok:
+                stats.errors[status.name] += 1
+            elif proc == 'read':
+                stats.bytes_read += len(resp[2])
+            elif proc == 'readv':
+                stats.bytes_read += sum(map(len, resp[2]))
+            elif proc == 'write':
+                stats.bytes_written += len(args[2])
+            elif proc == 'writev':
+                stats.bytes_written += sum(len(d) for _, d in args[1])
+
+    def instrument(self, server) -> None:
+        """
+        Wraps the NFS procedures of a server instance. The wrappers stay
+        bound to the server, so requests still tell servers apart (see
+        Request.commutes_with) and go through its duplicate request cache.
+        """
+        for proc in Tracer.PROCS:
+            method = getattr(server, proc)
+            setattr(server, proc,
+                    types.MethodType(self.__wrap(proc, method), server))
+
+    @staticmethod
+    def uninstrument(server) -> None:
+        for proc in Tracer.PROCS:
+            server.__dict__.pop(proc, None)
+
+    def reset(self):
+        with self._lock:
+            self.procs = {}
+            self._ticks = 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {'sample_every': self.sample_every,
+                    'enabled': self.enabled,
+                    'procs': {proc: stats.to_dict()
+                              for proc, stats in sorted(self.procs.items())}}
+
+    def to_prometheus(self) -> str:
+        """
+        :return: The statistics in the Prometheus text exposition format.
+        Latencies are in seconds, with a histogram bucket for every
+        non-empty bucket of the LatencyHistogram.
+        """
+        n = self.name
+        lines = []
+
+        def family(metric: str, kind: str, doc: str):
+            lines.append(f'# HELP {n}_{metric} {doc}')
+            lines.append(f'# TYPE {n}_{metric} {kind}')
+
+        with self._lock:
+            procs = sorted(self.procs.items())
+            family('calls_total', 'counter', 'Recorded calls per procedure')
+            for proc, stats in procs:
+                lines.append(f'{n}_calls_total{{proc="{proc}"}} {stats.calls}')
+            family('errors_total', 'counter',
+                   'Recorded failed calls per procedure and status')
+            for proc, stats in procs:
+                for stat, count in sorted(stats.errors.items()):
+                    lines.append(f'{n}_errors_total{{proc="{proc}",'
+                                 f'stat="{stat}"}} {count}')
+            for metric in ['bytes_read', 'bytes_written']:
+                family(f'{metric}_total', 'counter',
+                       f'Recorded {metric.replace("_", " ")} per procedure')
+                for proc, stats in procs:
+                    lines.append(f'{n}_{metric}_total{{proc="{proc}"}} '
+                                 f'{getattr(stats, metric)}')
+            family('latency_seconds', 'histogram',
+                   'Latency of recorded calls per procedure')
+            for proc, stats in procs:
+                hist = stats.latency
+                for bound, seen in hist.buckets():
+                    lines.append(f'{n}_latency_seconds_bucket{{proc="{proc}",'
+                                 f'le="{bound / 1e9:.9g}"}} {seen}')
+                lines.append(f'{n}_latency_seconds_bucket{{proc="{proc}",'
+                             f'le="+Inf"}} {hist.count}')
+                lines.append(f'{n}_latency_seconds_sum{{proc="{proc}"}} '
+                             f'{hist.sum / 1e9:.9g}')
+                lines.append(f'{n}_latency_seconds_count{{proc="{proc}"}} '
+                             f'{hist.count}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str):
+        """
+        Writes to_prometheus to a file, e.g. for the textfile collector of
+        the node exporter. The file is replaced atomically.
+        """
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def __wrap(self, proc: str, method):
+        @functools.wraps(method)
+        def traced(server, *args):
+            if not self.sampled():
+                return method(*args)
+            start = time.perf_counter_ns()
+            resp = method(*args)
+            self.record(proc, args, resp, time.perf_counter_ns() - start)
+            return resp
+        return traced
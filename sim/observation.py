@@ -0,0 +1,94 @@
+import json
+from typing import Hashable, Iterable, Optional, Tuple
+
+from .server import Server
+
+
+class Observation:
+    """
+    Projection of an execution onto the parts the caller observes, which
+    defines when two executions count as the same result. By default
+    everything is observed: every response of every process and the whole
+    server, as in Sim.Result.
+
+    A projection can keep only some processes, only some fields of each
+    summarized response (e.g. field 0, the status), and only some server
+    paths. Responses are projected one at a time as they are served, and the
+    server once per complete execution, so Sim.Result holds the projection
+    and dedupes on it.
+
+    Pruning uses the projection as well (see state): once a process has
+    terminated, only the projection of its responses can still tell results
+    apart, so executions that differ only in unobserved responses of
+    terminated processes are searched once.
+    """
+
+    def __init__(self, processes: Optional[Iterable[int]] = None,
+                 fields: Optional[Iterable[int]] = None,
+                 paths: Optional[Iterable[str]] = None):
+        """
+        :param processes: Processes whose responses are observed, or None
+        for all of them
+        :param fields: Fields of each summarized response that are observed
+        (see Request.summarize), or None for all of them
+        :param paths: Absolute paths of the server files and directories
+        that are observed, or None for the whole server
+        """
+        self.processes = None if processes is None else frozenset(processes)
+        self.fields = None if fields is None else tuple(fields)
+        self.paths = None if paths is None else list(paths)
+
+    def is_identity(self) -> bool:
+        return self.processes is None and self.fields is None and \
+            self.paths is None
+
+    def response(self, pid: int, summary: Tuple) -> Optional[Tuple]:
+        """
+        :param summary: Summarized response served to process pid
+        :return: The observed part of the response, or None if the process
+        is not observed
+        """
+        if self.processes is not None and pid not in self.processes:
+            return None
+        if self.fields is None:
+            return summary
+        return tuple(summary[f] for f in self.fields if f < len(summary))
+
+    def server(self, server: Server) -> str:
+        """
+        :return: JSON of the observed part of the server. A missing path is
+        observed as null.
+        """
+        if self.paths is None:
+            return server.to_json()
+        return json.dumps({path: Observation.__flatten(server, path)
+                           for path in self.paths})
+
+    def state(self, execution) -> Hashable:
+        """
+        :param execution: A Sim.Execution
+        :return: Key of the execution under which histories are pruned. Two
+        executions with the same key produce the same set of observed
+        results under every continuation: alive processes are identified by
+        their full responses, which determine their next steps, and the
+        requests they have in flight, and terminated ones only by their
+        observed responses.
+        """
+        processes = []
+        for pid, alive in enumerate(execution.alive):
+            if alive:
+                processes.append((True, tuple(execution.replies[pid]), tuple(
+                    req.digest() for req in execution.inflight[pid])))
+            else:
+                processes.append((False, tuple(
+                    self.response(pid, s) for s in execution.responses[pid])))
+        return execution.server.to_json(), tuple(processes)
+
+    @staticmethod
+    def __flatten(server: Server, path: str):
+        node = server.root
+        for name in filter(None, path.split('/')):
+            if node.is_raw_file() or name not in node.files:
+                return None
+            node = node.files[name]
+        return node.flatten()
@@ -0,0 +1,145 @@
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .request import Request
+from .server import Server
+from .sim import Sim
+
+
+class Race:
+    """
+    A pair of conflicting requests from different processes that are not
+    ordered by happens-before, and may therefore be served in either order
+    """
+
+    def __init__(self, first: "RaceDetector.Event",
+                 second: "RaceDetector.Event"):
+        self.first = first
+        self.second = second
+
+    def key(self) -> Tuple:
+        """
+        :return: Key under which races are de-duplicated: the process, the
+        procedure and the source location of both requests
+        """
+        a, b = sorted([self.first, self.second], key=lambda e: e.pid)
+        return a.pid, a.req.type, a.location, b.pid, b.req.type, b.location
+
+    def __str__(self):
+        return f'{self.first} <-> {self.second}'
+
+
+class RaceDetector:
+    """
+    Reports which request pairs race, using vector clocks over the requests
+    served in an execution. Happens-before is program order within each
+    process, plus the order in which conflicting requests (those that do not
+    commute, see Request.commutes_with) were served. Two conflicting requests
+    of different processes race if the earlier one does not happen-before the
+    later one through other requests.
+
+    The detector can observe every execution of a Sim exploration (pass it to
+    Sim.explore), or predict races from a single execution without
+    enumerating alternatives (see predict), which makes a cheap screening
+    pass before a full exploration.
+    """
+
+    class Event:
+        """
+        A served request, with the process that issued it, the source
+        location of the process main where it was issued, and its vector
+        clock
+        """
+
+        def __init__(self, pid: int, req: Request, location: Tuple):
+            self.pid = pid
+            self.req = req
+            self.location = location  # (file name, line number, function)
+            self.clock = []
+
+        def __str__(self):
+            filename, lineno, func = self.location
+            return f'p{self.pid} {self.req.describe()} ' \
+                   f'({os.path.basename(filename)}:{lineno} in {func})'
+
+    def __init__(self, proc_mains: List[Callable[[Server], Any]],
+                 server_factory: Callable[[], Any] = Server):
+        """
+        :param proc_mains: Entry function of every process
+        :param server_factory: Creates the server of every execution, which
+        must be the server_factory of the Sim the detector observes
+        """
+        self.proc_mains = proc_mains
+        self.server_factory = server_factory
+        self.n = len(proc_mains)
+        self.races: Dict[Tuple, Race] = {}  # Unique races found so far
+        self.executions = 0
+
+    def observe(self, hist: List[int]) -> List[Race]:
+        """
+        Re-executes a history and records the races in it
+        :param hist: Request served at each step (see Sim.Execution.step)
+        :return: The races of this execution not reported before
+        """
+        execution = Sim.Execution(self.proc_mains, self.server_factory)
+        events = []
+        for choice in hist:
+            location = execution.location(choice)
+            events.append(RaceDetector.Event(choice % self.n,
+                                             execution.step(choice), location))
+        return self.__analyze(events)
+
+    def predict(self, schedule: Optional[List[int]] = None) -> List[Race]:
+        """
+        Single-schedule mode: executes one schedule and reports every race
+        in it. Each race names a pair that another interleaving could
+        reorder, without exploring that interleaving.
+        :param schedule: History to execute. Defaults to a round-robin
+        schedule over the processes until all of them finish.
+        :return: The races of this execution not reported before
+        """
+        if schedule is not None:
+            return self.observe(schedule)
+
+        execution = Sim.Execution(self.proc_mains, self.server_factory)
+        events = []
+        pid = 0
+        while not execution.done():
+            if execution.alive[pid]:
+                location = execution.location(pid)
+                events.append(RaceDetector.Event(pid, execution.step(pid),
+                                                 location))
+            pid = (pid + 1) % self.n
+        return self.__analyze(events)
+
+    def report(self) -> str:
+        lines = [f'Found {len(self.races)} racing pairs in '
+                 f'{self.executions} executions.']
+        lines.extend(str(race) for race in self.races.values())
+        return '\n'.join(lines)
+
+    def __analyze(self, events: List["RaceDetector.Event"]) -> List[Race]:
+        self.executions += 1
+        clocks = [[0] * self.n for _ in range(self.n)]
+        new_races = []
+
+        for i, e in enumerate(events):
+            clock = clocks[e.pid].copy()
+            clock[e.pid] += 1  # Program order
+
+            # Walk back from the latest request so that a request ordered
+            # before e through a later conflicting one is not a race
+            for prior in reversed(events[:i]):
+                if prior.pid == e.pid or e.req.commutes_with(prior.req):
+                    continue
+                if prior.clock[prior.pid] > clock[prior.pid]:
+                    race = Race(prior, e)
+                    if race.key() not in self.races:
+                        self.races[race.key()] = race
+                        new_races.append(race)
+                clock = [max(a, b) for a, b in zip(clock, prior.clock)]
+
+            e.clock = clock
+            clocks[e.pid] = clock
+
+        return new_races
@@ -1,6 +1,11 @@
+import hashlib
+import json
+import time
 from enum import Enum
+from typing import List, Optional, Tuple
 
 from NFS.fhandle import FileHandle
+from NFS.stat import Stat
 
 
 class Request:
@@ -23,14 +28,30 @@ class Request:
         REMOVE = 5
         MKDIR = 6
         RMDIR = 7
+        READDIR = 8
+        READV = 9
+        WRITEV = 10
 
-    def __init__(self, type: Type, func, *args):
+    # Procedures whose re-execution on a retransmission changes the reply,
+    # and which therefore go through the server's duplicate request cache
+    NON_IDEMPOTENT = {Type.CREATE, Type.REMOVE, Type.MKDIR, Type.RMDIR}
+
+    def __init__(self, type: Type, func, *args, client=None, xid=None,
+                 tracer=None):
         self.type = type
         self.func = func
         self.args = args
         self.ready = True
         self.resp = None
 
+        # RPC transaction id and the id of the issuing client. Together with
+        # the procedure they identify a request across retransmissions.
+        self.client = client
+        self.xid = xid
+
+        # Tracer (see sim.metrics) that records the latency of serve
+        self.tracer = tracer
+
     def summarize(self):
         if self.ready:  # Hasn't executed yet
             raise Exception
@@ -41,19 +62,81 @@ class Request:
             # return (self.resp[0].name,
             #         *[t.summarize() for t in self.resp[1:]])
             return self.resp[0].name, self.resp[-1]
+        elif self.type == Request.Type.READV and len(self.resp) > 1:
+            return self.resp[0].name, tuple(self.resp[2])
+        elif self.type == Request.Type.READDIR and len(self.resp) > 1:
+            return self.resp[0].name, tuple(name for name, _ in self.resp[1])
         else:
             return self.resp[0].name,
 
     def serve(self):
         if self.ready:
             self.ready = False
-            self.resp = self.func(*self.args)
+            tracer = self.tracer
+            start = None
+            if tracer is not None and tracer.sampled():
+                start = time.perf_counter_ns()
+
+            # Route non-idempotent procedures through the duplicate request
+            # cache of the server, if it has one. Requests without a client
+            # id and xid cannot be told apart from new ones and bypass it.
+            drc = getattr(getattr(self.func, '__self__', None), 'drc', None)
+            if drc is not None and self.client is not None and \
+                    self.xid is not None and \
+                    self.type in Request.NON_IDEMPOTENT:
+                self.resp = drc.serve(self.key(), self.func, self.args)
+            else:
+                self.resp = self.func(*self.args)
+
+            if start is not None:
+                tracer.record(self.type.name.lower(), self.args, self.resp,
+                              time.perf_counter_ns() - start)
             return self.resp
 
+    def digest(self) -> int:
+        """
+        :return: A 32-bit digest of the procedure and its arguments that is
+        stable across runs. Used by schedule traces to check that a replayed
+        process issues the same requests as when the trace was recorded.
+        """
+        args = [a.path if isinstance(a, FileHandle) else a for a in self.args]
+        body = json.dumps([self.type.name, *args]).encode('utf-8')
+        return int.from_bytes(
+            hashlib.blake2b(body, digest_size=4).digest(), 'little')
+
+    def describe(self) -> str:
+        """
+        :return: Human readable form of the request, e.g. "WRITE /foo.txt 0
+        'abc'"
+        """
+        fhandle, *rest = self.args
+        path = fhandle.path
+        if self.type in {Request.Type.LOOKUP, Request.Type.CREATE,
+                         Request.Type.REMOVE, Request.Type.MKDIR,
+                         Request.Type.RMDIR}:
+            path = [*path, rest.pop(0)]
+        return ' '.join([self.type.name, '/' + '/'.join(path),
+                         *map(repr, rest)])
+
+    def key(self):
+        """
+        :return: (client id, xid, procedure) identifying this request
+        """
+        return self.client, self.xid, self.type
+
+    def retransmit(self) -> "Request":
+        """
+        :return: A fresh copy of this request carrying the same xid, as a
+        client would send when the reply to this request was lost
+        """
+        return Request(self.type, self.func, *self.args,
+                       client=self.client, xid=self.xid, tracer=self.tracer)
+
     def is_file_op(self):
         return self.type in {
             self.Type.GETATTR, self.Type.READ, self.Type.WRITE,
-            self.type.CREATE, self.type.REMOVE, self.Type.LOOKUP
+            self.type.CREATE, self.type.REMOVE, self.Type.LOOKUP,
+            self.Type.READV, self.Type.WRITEV
         }
 
     def _commutes_with(self, r: "Request"):
@@ -69,6 +152,14 @@ class Request:
         """
         s = self  # Alias for self to save some typing ;)
 
+        # Requests served by different shards (see sim.shard) touch disjoint
+        # state
+        if Request.__server(s) is not Request.__server(r):
+            return True
+
+        if s.type == Request.Type.READDIR or r.type == Request.Type.READDIR:
+            return Request.__readdir_commutes(s, r)
+
         if s.is_file_op() and r.is_file_op():
             # Both r and s are file operations.
             if Request.__get_file(s) != Request.__get_file(r):
@@ -76,8 +167,14 @@ class Request:
                 return True
             else:
                 commuting_group = {Request.Type.GETATTR, Request.Type.LOOKUP,
-                                   Request.Type.READ}
-                return s.type in commuting_group and r.type in commuting_group
+                                   Request.Type.READ, Request.Type.READV}
+                if s.type in commuting_group and r.type in commuting_group:
+                    return True
+                data_group = {*commuting_group, Request.Type.WRITE,
+                              Request.Type.WRITEV}
+                if s.type in data_group and r.type in data_group:
+                    return Request.__data_commutes(s, r)
+                return False
 
         # From this point onwards, at least one of r and s is not a
         # file operation.
@@ -105,6 +202,137 @@ class Request:
             r_name = Request.__get_dir(r)
             return s_name != r_name  # Commute iff operate on different dirs
 
+    @staticmethod
+    def __data_commutes(s: "Request", r: "Request") -> bool:
+        """
+        Tests if two requests on the same file commute, where both are one of
+        GETATTR, LOOKUP, READ(V) and WRITE(V), and at least one writes.
+
+        Every one of these replies with the size of the file, and READ clips
+        its content to it, so they can only commute if no WRITE changes the
+        size, i.e. every WRITE ends within the file. Beyond that, two WRITEs
+        commute if their ranges are disjoint or agree where they overlap, and
+        a READ and a WRITE commute if their ranges are disjoint. A vectored
+        request is checked segment by segment (see __footprint).
+
+        The size of the file before the pair is recovered from the reply of a
+        request that has already been served, as Sim does when it checks the
+        request it is about to serve against the one served just before. If
+        neither has been served, the size is unknown and the requests are
+        assumed not to commute.
+        """
+        sizes = set()
+        for q in (s, r):
+            if q.ready:
+                continue
+            if q.resp[0] != Stat.NFS_OK:
+                # The file cannot be read or written, so neither request
+                # changes the server and both fail regardless of order
+                return True
+            size = Request.__size_before(q)
+            if size is not None:
+                sizes.add(size)
+
+        if len(sizes) != 1:
+            return False  # Unknown, or changed by one of the requests
+        size = sizes.pop()
+
+        footprints = []
+        for q in (s, r):
+            footprint = Request.__footprint(q, size)
+            if any(data is not None and hi > size
+                   for _, hi, data in footprint):
+                return False  # Changes the size of the file
+            footprints.append(footprint)
+
+        for lo1, hi1, data1 in footprints[0]:
+            for lo2, hi2, data2 in footprints[1]:
+                lo, hi = max(lo1, lo2), min(hi1, hi2)
+                if lo >= hi:
+                    continue  # Disjoint ranges
+                if data1 is None or data2 is None:
+                    return False  # A READ overlapping a WRITE
+                if data1[lo-lo1:hi-lo1] != data2[lo-lo2:hi-lo2]:
+                    return False
+        # Also covers a GETATTR or LOOKUP, which have an empty footprint,
+        # against a size-preserving WRITE
+        return True
+
+    @staticmethod
+    def __footprint(r: "Request", size: int) -> List[Tuple]:
+        """
+        :param size: Size of the file before the request
+        :return: The (start, end, data) byte ranges of the file a request
+        reads or writes, where data is None for a read and the written
+        string for a write. Reads are clipped to the size.
+        """
+        if r.type == Request.Type.WRITE:
+            _, offset, data = r.args
+            return [(offset, offset + len(data), data)]
+        if r.type == Request.Type.WRITEV:
+            return [(offset, offset + len(data), data)
+                    for offset, data in r.args[1]]
+        if r.type == Request.Type.READ:
+            _, offset, count = r.args
+            return [(offset, min(offset + count, size), None)]
+        if r.type == Request.Type.READV:
+            return [(offset, min(offset + count, size), None)
+                    for offset, count in r.args[1]]
+        return []
+
+    @staticmethod
+    def __size_before(r: "Request") -> Optional[int]:
+        """
+        Recovers the size of the file before a request was served from its
+        successful reply
+        :return: The size, or None if it cannot be told from the reply
+        """
+        if r.type == Request.Type.WRITE:
+            _, offset, data = r.args
+            size = r.resp[1].size
+            # A WRITE ending exactly at the size may or may not have grown it
+            return size if offset + len(data) < size else None
+        elif r.type == Request.Type.WRITEV:
+            size = r.resp[1].size
+            end = max((offset + len(data) for offset, data in r.args[1]),
+                      default=0)
+            return size if end < size else None
+        elif r.type == Request.Type.LOOKUP:
+            return r.resp[2].size
+        # GETATTR and READ(V) carry the attributes second. None changes the
+        # size of the file.
+        return r.resp[1].size
+
+    @staticmethod
+    def __readdir_commutes(s: "Request", r: "Request") -> bool:
+        """
+        Tests if two requests commute, where at least one is a READDIR. A
+        listing only depends on the names in the directory, so it conflicts
+        exactly with the namespace operations that add or remove an entry of
+        the directory, or that remove or create the directory itself or one of
+        its ancestors.
+        """
+        if r.type == Request.Type.READDIR:
+            s, r = r, s
+        if r.type == Request.Type.READDIR:
+            return True  # Listings never change the namespace
+
+        listed = s.args[0].path
+        if r.type in {Request.Type.CREATE, Request.Type.REMOVE,
+                      Request.Type.MKDIR, Request.Type.RMDIR}:
+            fhandle, name = r.args
+            target = [*fhandle.path, name]
+            if target[:-1] == listed or listed[:len(target)] == target:
+                return False
+        return True
+
+    @staticmethod
+    def __server(r: "Request"):
+        """
+        :return: The server whose procedure serves request r, if any
+        """
+        return getattr(r.func, '__self__', None)
+
     @staticmethod
     def __get_file(r: "Request") -> str:
         """
@@ -147,3 +375,25 @@ class Request:
             return '/' + '/'.join(fhandle.path) + '/' + dirname
         else:
             return '/' + dirname
+
+
+class Await:
+    """
+    Yielded by a process main in place of a single Request to keep several
+    requests in flight, as a pipelining client does. The issued requests are
+    sent without blocking, and the process is resumed with the list of
+    responses of the awaited requests once every one of them is served.
+    Requests in flight are served in any order, and independently of the
+    process, which may issue more requests or terminate meanwhile.
+
+    Yielding a Request r is the same as yielding Await([r], [r]), except
+    that the process is resumed with the response itself.
+    """
+
+    def __init__(self, issued=(), awaited=()):
+        """
+        :param issued: Requests to send
+        :param awaited: Requests, issued now or earlier, to wait for
+        """
+        self.issued = list(issued)
+        self.awaited = list(awaited)
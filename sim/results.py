@@ -0,0 +1,139 @@
+import hashlib
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterator, List
+
+
+class ResultStore:
+    """
+    Set of unique results that keeps, for every result, only a fingerprint of
+    its responses and server state and the shortest history that produced
+    it (its witness). The responses and server JSON are materialized on
+    demand by replaying the witness, and the most recently materialized
+    results are cached.
+
+    Memory is then proportional to the number of results times the length
+    of their witnesses, rather than times the size of the server state,
+    which matters when an exploration finds a very large number of results.
+    Every access to a result that is not cached costs one execution.
+
+    The store is a drop-in for the results set of Sim (see the result_cache
+    parameter): it supports add, membership, iteration, len and equality
+    with another store or set of results.
+    """
+
+    def __init__(self, replay: Callable[[List[int]], object],
+                 capacity: int = 256):
+        """
+        :param replay: Executes a history and returns its Sim.Result
+        :param capacity: Number of materialized results to cache
+        """
+        self.replay = replay
+        self.capacity = capacity
+        self._witnesses: Dict[bytes, array] = {}  # fingerprint -> history
+        self._cache = OrderedDict()  # fingerprint -> materialized result
+
+        # Statistics
+        self.hits = 0
+        self.replays = 0
+
+    @staticmethod
+    def fingerprint(res) -> bytes:
+        """
+        :return: 128-bit digest of the responses and server state of a
+        result, which tells results apart like Sim.Result equality does
+        """
+        body = repr((res.n, [tuple(r) for r in res.responses],
+                     res.server_json)).encode('utf-8')
+        return hashlib.blake2b(body, digest_size=16).digest()
+
+    def add(self, res):
+        """
+        Adds a result, or replaces its witness if res was produced by a
+        shorter history
+        """
+        fp = ResultStore.fingerprint(res)
+        witness = self._witnesses.get(fp)
+        if witness is None or len(res.hist) < len(witness):
+            self._witnesses[fp] = array('I', res.hist)
+            self._cache.pop(fp, None)
+
+    def witness(self, res) -> List[int]:
+        """
+        :return: The shortest history known to produce a result
+        :raise KeyError: If the result is not in the store
+        """
+        return list(self._witnesses[ResultStore.fingerprint(res)])
+
+    def materialize(self, fp: bytes):
+        """
+        :return: The result with the given fingerprint, replayed from its
+        witness unless it is cached
+        """
+        if fp in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(fp)
+            return self._cache[fp]
+
+        self.replays += 1
+        res = self.replay(list(self._witnesses[fp]))
+        assert(ResultStore.fingerprint(res) == fp)
+        if self.capacity > 0:
+            self._cache[fp] = res
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+        return res
+
+    def __contains__(self, res) -> bool:
+        return ResultStore.fingerprint(res) in self._witnesses
+
+    def __iter__(self) -> Iterator:
+        for fp in list(self._witnesses):
+            yield self.materialize(fp)
+
+    def __len__(self):
+        return len(self._witnesses)
+
+    def __eq__(self, other):
+        if isinstance(other, ResultStore):
+            return self._witnesses.keys() == other._witnesses.keys()
+        if isinstance(other, (set, frozenset)):
+            return len(other) == len(self) and all(r in self for r in other)
+        return NotImplemented
+
+    def stats(self) -> dict:
+        return {'results': len(self._witnesses), 'cached': len(self._cache),
+                'hits': self.hits, 'replays': self.replays,
+                'witness_steps': sum(map(len, self._witnesses.values()))}
+
+
+class ResultCounts(Mapping):
+    """
+    Number of schedules that produce each result of a ResultStore (see
+    Sim.count). Only the fingerprint and count of every result are kept; the
+    store holds its witness, and iterating materializes the results.
+    """
+
+    def __init__(self, store: ResultStore, counts: Dict[bytes, int]):
+        """
+        :param counts: Count of the result with each fingerprint
+        """
+        self.store = store
+        self._counts = counts
+
+    def __getitem__(self, res) -> int:
+        return self._counts[ResultStore.fingerprint(res)]
+
+    def __contains__(self, res) -> bool:
+        return ResultStore.fingerprint(res) in self._counts
+
+    def __iter__(self) -> Iterator:
+        for fp in list(self._counts):
+            yield self.store.materialize(fp)
+
+    def __len__(self):
+        return len(self._counts)
+
+    def values(self):
+        return self._counts.values()
@@ -1,10 +1,14 @@
-from typing import Union
+from typing import List, Optional, Tuple, Union
 
 from NFS.proc import NFSPROC
 from NFS.fattr import FileAttribute
 from NFS.fhandle import FileHandle
 from NFS.stat import Stat
+from .lock import RWLock, NullLock, NULL_LOCK
+from .chunks import CHUNK_SIZE, Chunk, intern
 import json
+from itertools import count
+from bisect import bisect_left, bisect_right, insort
 
 
 class File:
@@ -17,25 +21,199 @@ class File:
 
 class RawFile(File):
     """
-    Models a simple non-directory file. Contains only raw bytes.
+    Models a simple non-directory file. The file may be sparse: its content
+    is kept as a sorted map of extents, i.e. runs of written bytes, and the
+    ranges between them are holes that read as null characters without
+    being stored. Writing far past the end of the file therefore only stores
+    the written bytes.
+
+    Extents never cross a multiple of EXTENT_SIZE, so a write only merges
+    with the extents of the blocks it touches, and appending costs the same
+    however large the file grows.
+
+    The content of every extent is an interned Chunk (see sim.chunks), so
+    files with equal extents share their data, also across servers.
     """
-    def __init__(self):
-        self.bytes = []
+    EXTENT_SIZE = CHUNK_SIZE
+
+    def __init__(self, lock=NULL_LOCK):
+        self.starts = []    # Sorted start offsets of the extents
+        self.extents = []   # Chunk of the extent starting at each offset
+        self.length = 0     # Size of the file, including trailing holes
+        self.lock = lock
 
     def is_raw_file(self) -> bool:
         return True
 
+    @property
+    def bytes(self) -> List[str]:
+        return list(self.flatten())
+
     def flatten(self):
-        return ''.join(self.bytes)
+        return self.read(0, self.length)
+
+    def size(self) -> int:
+        return self.length
+
+    def read(self, offset: int, count: int) -> str:
+        end = min(offset + count, self.length)
+        if end <= offset:
+            return ''
+
+        parts = []
+        pos = offset
+        # Start from the last extent beginning at or before offset
+        i = max(bisect_right(self.starts, offset) - 1, 0)
+        while i < len(self.starts) and self.starts[i] < end:
+            start, data = self.starts[i], self.extents[i].data
+            if start + len(data) > pos:
+                if start > pos:
+                    parts.append('\0' * (start - pos))  # Hole
+                    pos = start
+                parts.append(data[pos - start:end - start])
+                pos = min(start + len(data), end)
+            i += 1
+        if pos < end:
+            parts.append('\0' * (end - pos))
+        return ''.join(parts)
+
+    def write(self, offset: int, data: str):
+        end = offset + len(data)
+        self.length = max(self.length, end)
+
+        pos = offset
+        while pos < end:  # One block at a time
+            stop = min(end, (pos // RawFile.EXTENT_SIZE + 1) *
+                       RawFile.EXTENT_SIZE)
+            self.__write_block(pos, data[pos - offset:stop - offset])
+            pos = stop
+
+    def __write_block(self, offset: int, data: str):
+        """
+        Writes data that lies within one block
+        """
+        end = offset + len(data)
+        block = offset - offset % RawFile.EXTENT_SIZE
+
+        # Merge the new bytes with every extent of the block they overlap or
+        # touch
+        lo = bisect_left(self.starts, offset)
+        if lo and self.starts[lo-1] >= block and \
+                self.starts[lo-1] + len(self.extents[lo-1]) >= offset:
+            lo -= 1
+        if end == block + RawFile.EXTENT_SIZE:
+            hi = bisect_left(self.starts, end)  # The next block starts at end
+        else:
+            hi = bisect_right(self.starts, end)
+
+        start = offset
+        if lo < hi and self.starts[lo] < offset:
+            start = self.starts[lo]
+            data = self.extents[lo].data[:offset - start] + data
+        if lo < hi:
+            last_start, last = self.starts[hi-1], self.extents[hi-1].data
+            if last_start + len(last) > end:
+                data += last[end - last_start:]
+
+        self.starts[lo:hi] = [start]
+        self.extents[lo:hi] = [intern(data)]
+
+    def fill(self, chunk: Chunk):
+        """
+        Sets the content of an empty file to a chunk, without copying it
+        """
+        assert(self.length == 0)
+        if len(chunk):
+            self.starts = list(range(0, len(chunk), RawFile.EXTENT_SIZE))
+            self.extents = list(chunk.blocks())
+        self.length = len(chunk)
+
+    def punch_hole(self, offset: int, count: int):
+        """
+        Deallocates count bytes from offset, which then read as null
+        characters. The size of the file does not change.
+        """
+        if count <= 0:
+            return
+        end = offset + count
+        lo = max(bisect_right(self.starts, offset) - 1, 0)
+        hi = bisect_left(self.starts, end)
+
+        starts, extents = [], []
+        for start, chunk in zip(self.starts[lo:hi], self.extents[lo:hi]):
+            data = chunk.data
+            if start < offset:
+                starts.append(start)
+                extents.append(intern(data[:offset - start]))
+            if start + len(data) > end:
+                starts.append(end)
+                extents.append(intern(data[end - start:]))
+        self.starts[lo:hi] = starts
+        self.extents[lo:hi] = extents
+
+    def allocated(self) -> int:
+        """
+        :return: Number of bytes stored, i.e. the size without the holes
+        """
+        return sum(map(len, self.extents))
+
+    def readv(self, segments: List[Tuple[int, int]]) -> List[str]:
+        return [self.read(offset, count) for offset, count in segments]
+
+    def writev(self, segments: List[Tuple[int, str]]):
+        """
+        Writes every (offset, data) segment in order
+        """
+        for offset, data in segments:
+            self.write(offset, data)
+
+    def free(self):
+        """
+        Called once the file is unlinked, so that a storage backend can
+        reclaim the space held by its data
+        """
+        pass
 
 
 class Directory(File):
     """
     Models a directory on the server. Implements a nested directory tree.
+
+    Besides the name -> file mapping, a directory keeps its names in a sorted
+    index so that READDIR can resume from a cookie with a binary search. Add
+    and remove entries through link and unlink to keep both in sync.
+
+    The index is kept sorted on every change, so READDIR never sorts. A
+    name is inserted with a binary search and one move of the names after
+    it, which is a single memmove of pointers and cheap next to the rest of
+    a CREATE; names that sort last, as when files are created in order, are
+    simply appended.
     """
-    def __init__(self):
+    def __init__(self, lock=NULL_LOCK):
         self.files = {}
+        self.index = []  # Sorted names of the files in this directory
         self.empty = True
+        self.lock = lock
+
+    def link(self, name: str, file: File):
+        if name not in self.files:
+            if not self.index or self.index[-1] < name:
+                self.index.append(name)
+            else:
+                insort(self.index, name)
+        self.files[name] = file
+
+    def link_all(self, files: dict):
+        """
+        Adds many entries at once, sorting the index once instead of
+        inserting every name into it
+        """
+        self.files.update(files)
+        self.index = sorted(self.files)
+
+    def unlink(self, name: str):
+        del self.files[name]
+        del self.index[bisect_left(self.index, name)]
 
     def is_raw_file(self) -> bool:
         return False
@@ -51,176 +229,439 @@ class Server(NFSPROC):
     """
     The NFS file server in our simulation. It holds information of its files
     in memory as char arrays and also implements the server-side NFS protocol.
+
+    File data lives in Python objects unless a storage backend (see
+    sim.storage) is supplied, in which case new files are allocated by the
+    backend and an existing image is mapped at startup instead of populating
+    the default files.
+
+    With a write-ahead log (see sim.wal), every successful mutation is
+    appended to the log while the nodes it touched are still locked, and is
+    made durable before the procedure replies. The log is replayed into the
+    server at construction time.
+
+    With a duplicate request cache (see sim.drc), retransmitted
+    non-idempotent requests are answered from the cache by Request.serve.
+
+    By default the server is only safe to use from a single thread, which is
+    how Sim drives it. With concurrent=True, every directory and raw file
+    carries its own reader-writer lock. Paths are resolved with lock coupling
+    (a parent is released only once the child is locked), and each procedure
+    only locks the nodes it touches, so operations on different files can
+    proceed in parallel.
     """
 
-    def __init__(self):
-        self.root = Directory()
-        self.root.files['foo.txt'] = RawFile()  # Populate a foo.txt in root dir
-        self.root.files['bar.txt'] = RawFile()  # Populate a bar.txt in root dir
+    READDIR_REPLY_SIZE = 12  # XDR size of a READDIR reply without entries
+
+    def __init__(self, concurrent: bool = False, storage=None, wal=None,
+                 drc=None):
+        self.concurrent = concurrent
+        self.storage = storage
+        self.drc = drc
+        self.wal = None  # Attached after recovery so replay is not re-logged
+        self._client_ids = count()  # Ids handed to new clients
+
+        root = None
+        if storage is not None:
+            root = storage.load(self._new_lock)
+        # Whether the namespace was loaded from the image of the backend
+        self.loaded = root is not None
+
+        if root is None:
+            root = self._new_dir()
+            root.link('foo.txt', self._new_file())  # Populate a foo.txt
+            root.link('bar.txt', self._new_file())  # Populate a bar.txt
+        self.root = root
+
+        if wal is not None:
+            wal.recover(self)
+            self.wal = wal
+
+    def route(self, path: List[str]) -> "Server":
+        """
+        :param path: Names from the root to a file or directory
+        :return: The server owning the path, which for a single server is
+        always itself (see sim.shard for a partitioned namespace)
+        """
+        return self
+
+    def new_client_id(self) -> int:
+        """
+        :return: An id for a new client, unique among the clients of this
+        server. Ids are handed out in order starting from 0, so the clients
+        created by an execution of Sim get the same ids on every replay.
+        """
+        return next(self._client_ids)
+
+    def _new_lock(self) -> Union[RWLock, NullLock]:
+        return RWLock() if self.concurrent else NULL_LOCK
+
+    def _new_file(self) -> RawFile:
+        if self.storage is not None:
+            return self.storage.new_file(self._new_lock())
+        return RawFile(self._new_lock())
+
+    def _new_dir(self) -> Directory:
+        return Directory(self._new_lock())
 
     def getattr(self, fhandle: FileHandle) -> NFSPROC.GETATTR_RET_TYPE:
         try:
-            file = self.__parse_fhandle(fhandle)
+            file = self.__acquire(fhandle)
         except FileNotFoundError:
             return Stat.NFSERR_NOENT,
 
-        if not file.is_raw_file():
-            return Stat.NFS_OK, FileAttribute()  # Return a dummy value
-        assert(isinstance(file, RawFile))
-
-        fattr = FileAttribute()
-        fattr.size = len(file.bytes)
-        return Stat.NFS_OK, fattr
+        try:
+            return Stat.NFS_OK, self.__fattr(file)
+        finally:
+            file.lock.release_read()
 
     def lookup(self, fhandle: FileHandle, filename: str) \
             -> NFSPROC.LOOKUP_RET_TYPE:
         try:
-            file = self.__parse_fhandle(fhandle)
+            file = self.__acquire(fhandle)
         except FileNotFoundError:
             return Stat.NFSERR_NOENT,
 
-        if file.is_raw_file():
-            return Stat.NFSERR_NOTDIR,
-        assert(isinstance(file, Directory))
+        try:
+            if file.is_raw_file():
+                return Stat.NFSERR_NOTDIR,
+            assert(isinstance(file, Directory))
 
-        if filename not in file.files:
-            return Stat.NFSERR_NOENT,
+            if filename not in file.files:
+                return Stat.NFSERR_NOENT,
+
+            child = file.files[filename]
+            with child.lock.locked():
+                fattr = self.__fattr(child)
+        finally:
+            file.lock.release_read()
 
         fhandle = FileHandle([*fhandle.path, filename])
-        return Stat.NFS_OK, fhandle, self.getattr(fhandle)[1]
+        return Stat.NFS_OK, fhandle, fattr
 
     def read(self, fhandle: FileHandle, offset: int, count: int) \
             -> NFSPROC.READ_RET_TYPE:
         try:
-            file = self.__parse_fhandle(fhandle)
+            file = self.__acquire(fhandle)
         except FileNotFoundError:
             return Stat.NFSERR_NOENT,
 
-        if not file.is_raw_file():
-            return Stat.NFSERR_ISDIR,
-        assert(isinstance(file, RawFile))
+        try:
+            if not file.is_raw_file():
+                return Stat.NFSERR_ISDIR,
+            assert(isinstance(file, RawFile))
+
+            content = file.read(offset, count)
+            return Stat.NFS_OK, self.__fattr(file), content
+        finally:
+            file.lock.release_read()
+
+    def readv(self, fhandle: FileHandle, segments: List[Tuple[int, int]]) \
+            -> NFSPROC.READV_RET_TYPE:
+        try:
+            file = self.__acquire(fhandle)
+        except FileNotFoundError:
+            return Stat.NFSERR_NOENT,
+
+        try:
+            if not file.is_raw_file():
+                return Stat.NFSERR_ISDIR,
+            assert(isinstance(file, RawFile))
 
-        content = ''.join(
-            file.bytes[offset:min(offset + count, len(file.bytes))])
+            contents = file.readv(segments)
+            return Stat.NFS_OK, self.__fattr(file), contents
+        finally:
+            file.lock.release_read()
 
-        return Stat.NFS_OK, self.getattr(fhandle)[1], content
+    def readdir(self, fhandle: FileHandle, cookie: str, count: int) \
+            -> NFSPROC.READDIR_RET_TYPE:
+        try:
+            file = self.__acquire(fhandle)
+        except FileNotFoundError:
+            return Stat.NFSERR_NOENT,
+
+        try:
+            if file.is_raw_file():
+                return Stat.NFSERR_NOTDIR,
+            assert(isinstance(file, Directory))
+
+            # The cookie of an entry is its name, so resuming is a binary
+            # search in the index. Entries removed since the last call are
+            # simply skipped, and no entry is returned twice.
+            entries = []
+            size = Server.READDIR_REPLY_SIZE
+            index = file.index
+            i = bisect_right(index, cookie)
+            while i < len(index):
+                name = index[i]
+                size += Server.__entry_size(name)
+                if size > count and entries:
+                    break  # Always return at least one entry
+                entries.append((name, name))
+                i += 1
+
+            return Stat.NFS_OK, entries, i == len(index)
+        finally:
+            file.lock.release_read()
 
     def write(self, fhandle: FileHandle, offset: int, data: str) \
             -> NFSPROC.WRITE_RET_TYPE:
         try:
-            file = self.__parse_fhandle(fhandle)
+            file = self.__acquire(fhandle, write=True)
         except FileNotFoundError:
             return Stat.NFSERR_NOENT,
 
-        if not file.is_raw_file():
-            return Stat.NFSERR_ISDIR,
-        assert (isinstance(file, RawFile))
-
-        # Keep appending the null character to the file until the file is large
-        # enough to fit all the write
-        while len(file.bytes) < offset + len(data):
-            file.bytes.append('\0')
+        try:
+            if not file.is_raw_file():
+                return Stat.NFSERR_ISDIR,
+            assert (isinstance(file, RawFile))
+
+            try:
+                file.write(offset, data)
+            except ValueError:  # Data the storage backend cannot hold
+                return Stat.NFSERR_IO,
+            fattr = self.__fattr(file)
+            seq = self.__log('write', fhandle, offset, data)
+        finally:
+            file.lock.release_write()
+
+        self.__commit(seq)
+        return Stat.NFS_OK, fattr
 
-        for i in range(len(data)):
-            file.bytes[i+offset] = data[i]
+    def writev(self, fhandle: FileHandle, segments: List[Tuple[int, str]]) \
+            -> NFSPROC.WRITEV_RET_TYPE:
+        try:
+            file = self.__acquire(fhandle, write=True)
+        except FileNotFoundError:
+            return Stat.NFSERR_NOENT,
 
-        return Stat.NFS_OK, self.getattr(fhandle)[1]
+        try:
+            if not file.is_raw_file():
+                return Stat.NFSERR_ISDIR,
+            assert(isinstance(file, RawFile))
+
+            try:
+                file.writev(segments)
+            except ValueError:  # Data the storage backend cannot hold
+                return Stat.NFSERR_IO,
+            fattr = self.__fattr(file)
+            seq = self.__log('writev', fhandle, [list(s) for s in segments])
+        finally:
+            file.lock.release_write()
+
+        self.__commit(seq)
+        return Stat.NFS_OK, fattr
 
     def create(self, fhandle: FileHandle, name: str) -> NFSPROC.CREATE_RET_TYPE:
         try:
-            fptr = self.__parse_fhandle(fhandle)
+            fptr = self.__acquire(fhandle, write=True)
         except FileNotFoundError:
             return Stat.NFSERR_NOENT,
 
-        if fptr.is_raw_file():  # Check if the file is a directory
-            return Stat.NFSERR_NOTDIR,
+        try:
+            if fptr.is_raw_file():  # Check if the file is a directory
+                return Stat.NFSERR_NOTDIR,
 
-        assert(isinstance(fptr, Directory))
+            assert(isinstance(fptr, Directory))
 
-        if name in fptr.files:  # Check if the raw file already exists
-            return Stat.NFSERR_EXIST,
+            if name in fptr.files:  # Check if the raw file already exists
+                return Stat.NFSERR_EXIST,
 
-        fptr.files[name] = RawFile()
-        fhandle = FileHandle([*fhandle.path, name])
-        fattr = self.getattr(fhandle)[1]
+            file = self._new_file()
+            fptr.link(name, file)
+            fattr = self.__fattr(file)
+            seq = self.__log('create', fhandle, name)
+        finally:
+            fptr.lock.release_write()
 
+        self.__commit(seq)
+        fhandle = FileHandle([*fhandle.path, name])
         return Stat.NFS_OK, fhandle, fattr
 
     def remove(self, fhandle: FileHandle, name: str) -> NFSPROC.REMOVE_RET_TYPE:
         try:
-            fptr = self.__parse_fhandle(fhandle)
+            fptr = self.__acquire(fhandle, write=True)
         except FileNotFoundError:
             return Stat.NFSERR_NOENT
 
-        if fptr.is_raw_file():  # Check if the file is a directory
-            return Stat.NFSERR_NOTDIR
-
-        assert(isinstance(fptr, Directory))
-
-        if name not in fptr.files:
-            return Stat.NFSERR_NOENT
-        elif not fptr.files[name].is_raw_file():
-            return Stat.NFSERR_ISDIR
-
-        del fptr.files[name]
+        try:
+            if fptr.is_raw_file():  # Check if the file is a directory
+                return Stat.NFSERR_NOTDIR
+
+            assert(isinstance(fptr, Directory))
+
+            if name not in fptr.files:
+                return Stat.NFSERR_NOENT
+            elif not fptr.files[name].is_raw_file():
+                return Stat.NFSERR_ISDIR
+
+            # Wait out any operation still holding the file before unlinking
+            file = fptr.files[name]
+            with file.lock.locked(write=True):
+                fptr.unlink(name)
+                file.free()
+            seq = self.__log('remove', fhandle, name)
+        finally:
+            fptr.lock.release_write()
+
+        self.__commit(seq)
         return Stat.NFS_OK
 
     def mkdir(self, fhandle: FileHandle, name: str) -> NFSPROC.MKDIR_RET_TYPE:
         try:
-            fptr = self.__parse_fhandle(fhandle)
+            fptr = self.__acquire(fhandle, write=True)
         except FileNotFoundError:
             return Stat.NFSERR_NOENT,
 
-        if fptr.is_raw_file():  # Check if the file is a directory
-            return Stat.NFSERR_NOTDIR,
+        try:
+            if fptr.is_raw_file():  # Check if the file is a directory
+                return Stat.NFSERR_NOTDIR,
+
+            assert(isinstance(fptr, Directory))
 
-        assert(isinstance(fptr, Directory))
+            if name in fptr.files:
+                return Stat.NFSERR_EXIST,
 
-        if name in fptr.files:
-            return Stat.NFSERR_EXIST,
+            directory = self._new_dir()
+            fptr.link(name, directory)
+            fattr = self.__fattr(directory)
+            seq = self.__log('mkdir', fhandle, name)
+        finally:
+            fptr.lock.release_write()
 
-        fptr.files[name] = Directory()
+        self.__commit(seq)
         fhandle = FileHandle([*fhandle.path, name])
-        fattr = self.getattr(fhandle)[1]
-
         return Stat.NFS_OK, fhandle, fattr
 
     def rmdir(self, fhandle: FileHandle, name: str) -> NFSPROC.RMDIR_RET_TYPE:
         try:
-            fptr = self.__parse_fhandle(fhandle)
+            fptr = self.__acquire(fhandle, write=True)
         except FileNotFoundError:
             return Stat.NFSERR_NOENT
 
-        if fptr.is_raw_file():  # Check if the file is a directory
-            return Stat.NFSERR_NOTDIR
-
-        assert(isinstance(fptr, Directory))
-
-        if name not in fptr.files:
-            return Stat.NFSERR_NOENT
-        elif fptr.files[name].is_raw_file():
-            return Stat.NFSERR_NOTDIR
-        elif len(fptr.files[name].files):
-            return Stat.NFSERR_NOTEMPTY
-
-        del fptr.files[name]
+        try:
+            if fptr.is_raw_file():  # Check if the file is a directory
+                return Stat.NFSERR_NOTDIR
+
+            assert(isinstance(fptr, Directory))
+
+            if name not in fptr.files:
+                return Stat.NFSERR_NOENT
+            elif fptr.files[name].is_raw_file():
+                return Stat.NFSERR_NOTDIR
+
+            # Hold the child exclusively so that no create can slip into it
+            # between the emptiness check and the unlink
+            with fptr.files[name].lock.locked(write=True):
+                if len(fptr.files[name].files):
+                    return Stat.NFSERR_NOTEMPTY
+                fptr.unlink(name)
+            seq = self.__log('rmdir', fhandle, name)
+        finally:
+            fptr.lock.release_write()
+
+        self.__commit(seq)
         return Stat.NFS_OK
 
-    def __parse_fhandle(self, fhandle: FileHandle) -> File:
+    def __acquire(self, fhandle: FileHandle, write: bool = False) -> File:
+        """
+        Resolves a file handle by walking down from the root with lock
+        coupling: a directory is only released once the next node on the path
+        is locked. Intermediate directories are read-locked, and the final
+        node is locked in read or write mode. Locks are always taken top-down,
+        so concurrent callers cannot deadlock.
+        :param fhandle: File handle to resolve
+        :param write: Whether to write-lock the final node
+        :return: The final node, whose lock the caller must release
+        :raise FileNotFoundError: If the path does not resolve. No lock is
+        held in this case.
+        """
+        path = fhandle.path
         fptr = self.root
-        for p in fhandle.path:
-            if fptr.is_raw_file():
-                # Is a raw file but we need to traverse
+        fptr.lock.acquire(write and not path)
+
+        for i, p in enumerate(path):
+            if fptr.is_raw_file() or p not in fptr.files:
+                # Either a raw file we need to traverse, or the file is not
+                # found. Only intermediate nodes get here, and they are
+                # always read-locked.
+                fptr.lock.release_read()
                 raise FileNotFoundError
 
-            if p in fptr.files:
-                fptr = fptr.files[p]
-            else:
-                # The file is not found
-                raise FileNotFoundError
+            child = fptr.files[p]
+            child.lock.acquire(write and i == len(path) - 1)
+            fptr.lock.release_read()
+            fptr = child
 
         return fptr
 
+    def __log(self, proc: str, fhandle: FileHandle, *args) -> Optional[int]:
+        """
+        Appends a mutation to the write-ahead log, if there is one. Must be
+        called while the mutated nodes are still locked, so that conflicting
+        mutations reach the log in the order they were applied.
+        :return: Sequence number to pass to __commit
+        """
+        if self.wal is None:
+            return None
+        return self.wal.append(proc, fhandle.path, *args)
+
+    def __commit(self, seq: Optional[int]):
+        """
+        Blocks until a logged mutation is durable. Called after the locks are
+        released, so that concurrent mutations can share one fsync.
+        """
+        if seq is not None:
+            self.wal.commit(seq)
+
+    @staticmethod
+    def __entry_size(name: str) -> int:
+        """
+        :return: XDR-encoded size of a READDIR entry: the value-follows flag,
+        file id, name (padded to 4 bytes) and cookie
+        """
+        return 16 + (len(name.encode('utf-8')) + 3) // 4 * 4
+
+    @staticmethod
+    def __fattr(file: File) -> FileAttribute:
+        """
+        Builds the attributes of a file whose lock is held by the caller
+        """
+        if not file.is_raw_file():
+            return FileAttribute()  # Return a dummy value
+        assert(isinstance(file, RawFile))
+
+        fattr = FileAttribute()
+        fattr.size = file.size()
+        return fattr
+
+    def sync(self):
+        """
+        Flushes file data and directory metadata to the storage backend, if
+        there is one. Not thread-safe with concurrent mutations.
+        """
+        if self.storage is not None:
+            self.storage.sync(self.root)
+
+    def load_json(self, s: str):
+        """
+        Inverse of to_json. Replaces the whole directory tree with the one
+        serialized in s.
+        :param s: JSON string as produced by to_json
+        """
+        def build(flat: dict) -> Directory:
+            directory = self._new_dir()
+            for name, node in flat.items():
+                if isinstance(node, dict):
+                    directory.link(name, build(node))
+                else:
+                    file = self._new_file()
+                    file.write(0, node)
+                    directory.link(name, file)
+            return directory
+
+        self.root = build(json.loads(s))
+
     def to_json(self) -> str:
         """
         To be called by the simulation class. Serialize the directory structure
@@ -0,0 +1,113 @@
+import hashlib
+import json
+from bisect import bisect_left
+from itertools import count
+from typing import Callable, Dict, Optional, Sequence
+
+from .server import Server, Directory
+
+
+class ShardedServer:
+    """
+    A namespace partitioned across several independent servers (shards). The
+    mount table assigns every top-level name, i.e. every entry of the root
+    directory, to one shard, which holds that entry and everything below it.
+    Each shard's root only contains the entries it owns.
+
+    A ClientFileSystem given a ShardedServer sends each request to the shard
+    that owns its path (see route). Since shards share no state, requests to
+    different shards always commute (see Request.commutes_with).
+
+    Top-level names are assigned either through an explicit mount table, with
+    names missing from it going to shard 0, or by consistent hashing of the
+    name onto a ring of virtual nodes, so that adding a shard only moves the
+    names that land on its virtual nodes.
+    """
+
+    VIRTUAL_NODES = 64  # Ring points per shard under consistent hashing
+
+    def __init__(self, shards: int = 2,
+                 mounts: Optional[Dict[str, int]] = None,
+                 server_factory: Callable[[], Server] = Server):
+        """
+        :param shards: Number of shards
+        :param mounts: Shard of each top-level name, or None to place names
+        by consistent hashing
+        :param server_factory: Creates the server of each shard
+        """
+        assert(shards > 0)
+        self.mounts = mounts
+        self._client_ids = count()  # Ids handed to new clients
+        self.ring = []  # Sorted (point, shard)
+        if mounts is None:
+            self.ring = sorted(
+                (ShardedServer.__hash(f'{shard}#{v}'), shard)
+                for shard in range(shards)
+                for v in range(ShardedServer.VIRTUAL_NODES))
+
+        self.shards = [server_factory() for _ in range(shards)]
+        for i, shard in enumerate(self.shards):
+            # Every shard starts from the same namespace; keep only the
+            # entries this one owns
+            for name in list(shard.root.files):
+                if self.owner(name) != i:
+                    shard.root.unlink(name)
+
+    def owner(self, name: str) -> int:
+        """
+        :return: Index of the shard owning a top-level name
+        """
+        if self.mounts is not None:
+            return self.mounts.get(name, 0)
+        i = bisect_left(self.ring, (ShardedServer.__hash(name), -1))
+        return self.ring[i % len(self.ring)][1]
+
+    def route(self, path: Sequence[str]) -> Server:
+        """
+        :param path: Names from the root to a file or directory. The empty
+        path (the root itself) is served by shard 0.
+        :return: The shard owning the path
+        """
+        if not path:
+            return self.shards[0]
+        return self.shards[self.owner(path[0])]
+
+    def new_client_id(self) -> int:
+        """
+        :return: An id for a new client, unique across all shards
+        """
+        return next(self._client_ids)
+
+    @property
+    def root(self) -> Directory:
+        """
+        Read-only merged view of the root directories of all shards
+        """
+        root = Directory()
+        for shard in self.shards:
+            for name, file in shard.root.files.items():
+                root.link(name, file)
+        return root
+
+    def to_json(self) -> str:
+        flat = {}
+        for shard in self.shards:
+            flat.update(shard.root.flatten())
+        return json.dumps(flat)
+
+    @staticmethod
+    def __hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(
+            key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    @staticmethod
+    def factory(shards: int = 2, mounts: Optional[Dict[str, int]] = None,
+                server_factory: Callable[[], Server] = Server) \
+            -> Callable[[], "ShardedServer"]:
+        """
+        :param server_factory: Creates the server of each shard, e.g.
+        NamespaceLoader.factory() to shard a loaded namespace
+        :return: A server factory for Sim that creates a fresh sharded
+        namespace for every execution
+        """
+        return lambda: ShardedServer(shards, mounts, server_factory)
@@ -1,8 +1,17 @@
-from copy import deepcopy
-from typing import List, Callable, Any
+import time
+from bisect import bisect_right
+from collections import Counter
+from enum import Enum
+from typing import List, Callable, Any, Iterable, Optional, Tuple, Dict, \
+    Hashable, Mapping
 
 from .server import Server
-from .request import Request
+from .request import Request, Await
+from .export import Exporter
+from .graph import GraphWriter
+from .observation import Observation
+from .results import ResultStore, ResultCounts
+from .strategy import Strategy
 
 
 class Sim:
@@ -34,6 +43,8 @@ class Sim:
             self.n = n
             self.responses = [[] for _ in range(n)]
             self.server_json = ''
+            self.hist = []     # Witness history that produced this result
+            self.digests = []  # Digest of the request served at each step
 
         def add_response(self, i, resp):
             self.responses[i].append(resp)
@@ -62,55 +73,553 @@ class Sim:
 
             return self.server_json == other.server_json
 
-    def __init__(self, proc_mains: List[Callable[[Server], Any]]):
+    class Counterexample(Result):
+        """
+        Witness of a property violation found by Sim.search
+        """
+
+        def __init__(self, n: int, kind: str, preemptions: int):
+            super().__init__(n)
+            self.kind = kind  # 'invariant' or 'predicate'
+            self.preemptions = preemptions
+
+    class Execution:
+        """
+        A single run of the process mains against a fresh server, advanced
+        one served request at a time.
+
+        A process may have several requests in flight (see Await), so each
+        step chooses a request rather than a process: choice pid + n * k
+        serves the k-th request in flight of process pid, in order of
+        issue. A process with one request in flight, which is all a process
+        yielding plain Requests ever has, is chosen by its pid.
+        """
+
+        def __init__(self, proc_mains: List[Callable[[Server], Any]],
+                     server_factory: Callable[[], Any] = Server):
+            self.n = len(proc_mains)
+            self.server = server_factory()
+            self.processes = [p(self.server) for p in proc_mains]
+            self.inflight = [[] for _ in proc_mains]  # Requests not served
+            # Issue sequence number of every request in flight, which unlike
+            # its position in inflight identifies it for the whole execution
+            self.seqs = [[] for _ in proc_mains]
+            self.issued = [0] * self.n  # Number of requests each process sent
+            # Source location at which each request in flight was issued, as
+            # (file name, line number, function), which is still known once
+            # the process main has returned
+            self.locations = [[] for _ in proc_mains]
+            # Requests each process is blocked on, and whether it yielded a
+            # single Request rather than an Await
+            self.waiting = [None for _ in proc_mains]
+            self.hist = []
+            self.last: Optional[Request] = None  # Request served last
+            # Summarized responses of each process, as in Result, in the
+            # order the process issued the requests. Serving commuting
+            # requests of one process in another order then gives the same
+            # responses.
+            self.responses = [[] for _ in proc_mains]
+            # Full responses of each process, which determine its next steps
+            self.replies = [[] for _ in proc_mains]
+            self.served = [[] for _ in proc_mains]  # Sorted seqs served
+
+            for pid in range(self.n):  # Prime the generators
+                self.__advance(pid, None)
+
+        @property
+        def alive(self) -> List[bool]:
+            """
+            Whether each process still has a request to serve
+            """
+            return [bool(requests) for requests in self.inflight]
+
+        @property
+        def requests(self) -> List[Optional[Request]]:
+            """
+            Oldest request in flight of each process
+            """
+            return [requests[0] if requests else None
+                    for requests in self.inflight]
+
+        def choices(self) -> List[int]:
+            """
+            :return: Every request that can be served next (see step)
+            """
+            return [pid + self.n * k for pid in range(self.n)
+                    for k in range(len(self.inflight[pid]))]
+
+        def pending(self, choice: int) -> Request:
+            pid, k = choice % self.n, choice // self.n
+            return self.inflight[pid][k]
+
+        def identity(self, choice: int) -> Tuple[int, int]:
+            """
+            :return: (pid, issue sequence number) of a request in flight. The
+            choice of a request changes as requests issued before it are
+            served, but its identity does not.
+            """
+            pid, k = choice % self.n, choice // self.n
+            return pid, self.seqs[pid][k]
+
+        def location(self, choice: int) -> Tuple[str, int, str]:
+            """
+            :return: Source location of the process main at which a request
+            in flight was issued
+            """
+            pid, k = choice % self.n, choice // self.n
+            return self.locations[pid][k]
+
+        def step(self, choice: int) -> Request:
+            """
+            Serves a request in flight and, once every request its process is
+            blocked on is served, advances the process to its next yield
+            :param choice: Request to serve, see choices
+            :return: The request that was served
+            """
+            pid, k = choice % self.n, choice // self.n
+            assert(k < len(self.inflight[pid]))
+            req = self.inflight[pid].pop(k)
+            seq = self.seqs[pid].pop(k)
+            self.locations[pid].pop(k)
+            resp = req.serve()
+            i = bisect_right(self.served[pid], seq)
+            self.served[pid].insert(i, seq)
+            self.responses[pid].insert(i, req.summarize())
+            self.replies[pid].insert(i, Sim.Execution.__freeze(resp))
+            self.last = req
+            self.hist.append(choice)
+
+            if self.waiting[pid] is not None:
+                awaited, single = self.waiting[pid]
+                if not any(r.ready for r in awaited):
+                    self.waiting[pid] = None
+                    self.__advance(pid, awaited[0].resp if single else
+                                   [r.resp for r in awaited])
+            return req
+
+        def done(self) -> bool:
+            return not any(self.inflight)
+
+        def __advance(self, pid: int, value):
+            """
+            Resumes a process until it blocks on a request that has not been
+            served, or terminates
+            """
+            process = self.processes[pid]
+            while True:
+                try:
+                    # Sending None starts a generator like next does
+                    yielded = process.send(value)
+                except StopIteration:
+                    return
+
+                if isinstance(yielded, Await):
+                    issued, awaited = yielded.issued, yielded.awaited
+                    single = False
+                else:
+                    issued, awaited = [yielded], [yielded]
+                    single = True
+                self.inflight[pid].extend(issued)
+                frame = process.gi_frame
+                location = frame.f_code.co_filename, frame.f_lineno, \
+                    frame.f_code.co_name
+                for _ in issued:
+                    self.seqs[pid].append(self.issued[pid])
+                    self.locations[pid].append(location)
+                    self.issued[pid] += 1
+
+                if any(r.ready for r in awaited):
+                    assert(all(r in self.inflight[pid]
+                               for r in awaited if r.ready))
+                    self.waiting[pid] = awaited, single
+                    return
+                value = awaited[0].resp if single else \
+                    [r.resp for r in awaited]
+
+        @staticmethod
+        def __freeze(value) -> Hashable:
+            if isinstance(value, Enum):
+                return value.name
+            if isinstance(value, (list, tuple)):
+                return tuple(Sim.Execution.__freeze(v) for v in value)
+            if hasattr(value, '__dict__'):  # FileHandle, FileAttribute
+                return type(value).__name__, tuple(
+                    (k, Sim.Execution.__freeze(v))
+                    for k, v in sorted(vars(value).items()))
+            return value
+
+    def __init__(self, proc_mains: List[Callable[[Server], Any]],
+                 exporters: Iterable[Exporter] = (), memo=None,
+                 observation: Optional[Observation] = None,
+                 server_factory: Callable[[], Any] = Server,
+                 result_cache: Optional[int] = None):
+        """
+        :param proc_mains: Entry function of every process
+        :param exporters: Sinks that receive each unique result as soon as
+        it is found (see sim.export)
+        :param memo: Set of searched canonical histories to prune against,
+        which may be shared between simulations of the same mains, e.g. a
+        SharedVisitedTable (see sim.visited) shared by worker processes
+        :param observation: Parts of an execution that tell results apart
+        (see sim.observation). Defaults to all responses and the whole
+        server.
+        :param server_factory: Creates the server of every execution, e.g.
+        ShardedServer.factory (see sim.shard) for a partitioned namespace
+        :param result_cache: If given, results are kept in a ResultStore
+        (see sim.results) as fingerprints and witness histories, and replayed
+        on access with this many of them cached. By default every result is
+        kept in full.
+        """
         self.n = len(proc_mains)
         self.proc_mains = proc_mains  # Pointers to entry functions
-        self.results = set()  # Stores unique results
+        self.server_factory = server_factory
+        self.result_cache = result_cache
+        self.results = self.__new_results()  # Stores unique results
+        self.exporters = list(exporters)
 
         # Used in our depth-first search
-        self._steps = [True] * self.n  # Whether some process has any step left
         self._hist = []
-        self._result = Sim.Result(self.n)
+        self._digests = []  # Digests of the requests served along _hist
+        self._race_detector = None
 
         # Memoization that helps us skip subspaces that are equivalent to what
         # we have already searched. Simply store a set of history strings
         # sorted in "canonical" form to represent searched subtrees
-        self._memo = set()
-
-    def explore(self, verbose=False, prune=True):
+        self._memo = memo if memo is not None else set()
+
+        self.observation = observation if observation is not None \
+            else Observation()
+        # Observation states of searched subtrees (see Observation.state),
+        # which only prune beyond _memo under a coarser observation
+        self._states = {}  # State -> its graph node, if writing a graph
+        # Graph node of the histories merged into another state's node
+        self._aliases: Dict[str, str] = {}
+
+        # Number of schedules that produce each unique result (see count),
+        # a ResultCounts with result_cache
+        self.counts: Mapping["Sim.Result", int] = {}
+
+        # Seconds from the start of explore until each unique result was
+        # found, in order of discovery
+        self.discovery_times: List[float] = []
+        self._strategy = Strategy()
+        self._start = 0.0
+        self._graph = None
+        self._node_ids = []  # Graph node of each history along _hist
+
+    def explore(self, verbose=False, prune=True, race_detector=None,
+                strategy: Optional[Strategy] = None,
+                graph: Optional[GraphWriter] = None):
+        """
+        :param verbose: Whether or not to print the currently explored history
+        :param prune: Whether to skip histories equivalent to explored ones
+        :param race_detector: Optional RaceDetector (see sim.race) that
+        observes every complete execution of the exploration
+        :param strategy: Order in which processes are explored (see
+        sim.strategy). Defaults to process 0 first, then 1, and so on.
+        :param graph: Optional sink (see sim.graph) that receives the
+        explored interleaving graph as it is expanded. With pruning, the
+        histories merged by the memo or by their observation state (see
+        Observation.state) share one node.
+        """
         if not self.proc_mains:
             raise Exception("No main functions supplied")
+        self._race_detector = race_detector
+        self._graph = graph
+        self._strategy = strategy if strategy is not None else Strategy()
+        self._start = time.perf_counter()
+        for _ in range(self._strategy.restarts):
+            self._dive()
         self._dfs(verbose=verbose, prune=prune)
 
-    def _exec_hist(self):
-        server = Server()
-        processes = [p(server) for p in self.proc_mains]
-        requests = [next(p) for p in processes]  # Prime the generators
+    def time_to(self, k: int) -> Optional[float]:
+        """
+        :return: Seconds explore took to find k unique results, or None if
+        it found fewer
+        """
+        if k > len(self.discovery_times):
+            return None
+        return self.discovery_times[k-1] if k > 0 else 0.0
+
+    def count(self, prune=True) -> Mapping["Sim.Result", int]:
+        """
+        Counts how many schedules (raw interleavings) produce each unique
+        result, without enumerating the schedules.
+
+        Schedules that reorder commuting requests reach the same execution
+        state (see Observation.state), so the counts of a state's subtree are
+        computed once and added to the count of every schedule prefix that
+        reaches it. The counts are exact; the canonical histories used by
+        explore are not used here, since they may merge histories with
+        different outcomes when more than two processes interleave.
+        :param prune: Whether to reuse the counts of states seen before.
+        Without it, every schedule is enumerated.
+        :return: Number of schedules per unique result, also stored in
+        counts and results. With result_cache, the counts only keep the
+        fingerprint of every result (see ResultCounts).
+        """
+        if not self.proc_mains:
+            raise Exception("No main functions supplied")
 
-        canonical_str = ''
-        canonical_part = ''
+        self.results = self.__new_results()
+        counts = self._count([], {} if prune else None)
+        if isinstance(self.results, ResultStore):
+            self.counts = ResultCounts(self.results, dict(counts))
+        else:
+            self.counts = dict(counts)
+            self.results.update(counts)
+        return self.counts
 
-        for idx, pid in enumerate(self._hist):
-            if len(canonical_part) == 0:
-                canonical_part += str(pid)
+    def _count(self, hist: List[int], memo: Optional[dict]) -> Counter:
+        """
+        :param memo: Counts of the subtree of every state seen so far, or
+        None to enumerate every schedule
+        :return: Number of schedules below hist that produce each result,
+        by fingerprint if results is a ResultStore, which then holds the
+        witness of every result
+        """
+        execution = Sim.Execution(self.proc_mains, self.server_factory)
+        for choice in hist:
+            execution.step(choice)
+
+        if execution.done():
+            res = self._observe(execution)
+            res.hist = hist.copy()
+            if isinstance(self.results, ResultStore):
+                self.results.add(res)
+                return Counter({ResultStore.fingerprint(res): 1})
+            return Counter({res: 1})
+
+        key = self.observation.state(execution)
+        if memo is not None and key in memo:
+            return memo[key]
+
+        counts = Counter()
+        for choice in execution.choices():
+            hist.append(choice)
+            counts.update(self._count(hist, memo))
+            hist.pop()
+
+        if memo is not None:
+            memo[key] = counts
+        return counts
+
+    def search(self, predicate: Optional[Callable] = None,
+               invariant: Optional[Callable] = None,
+               minimize: Optional[str] = 'preemptions',
+               prune=True) -> Optional["Sim.Counterexample"]:
+        """
+        Searches for an interleaving that violates a property, and stops at
+        the first violation instead of enumerating every interleaving.
+
+        Both properties are called as f(server, responses), where responses
+        holds the summarized responses of every process so far (as in
+        Result), and return True when the property holds. The predicate is
+        checked on every complete execution, and the invariant after every
+        served request.
+
+        Once a violation is found, it is minimized by searching again with a
+        bound on the number of preemptions (switching away from a process
+        that could still run) or on the number of steps, raising the bound
+        from zero until a violation is found.
+        :param predicate: Property of the final server state and responses
+        :param invariant: Property of every intermediate state
+        :param minimize: 'preemptions', 'length' or None to return the first
+        violation found
+        :param prune: Whether to skip histories equivalent to searched ones
+        :return: The witness of the violation, or None if both properties
+        hold in every interleaving
+        """
+        if not self.proc_mains:
+            raise Exception("No main functions supplied")
+        assert(minimize in {'preemptions', 'length', None})
+
+        metric = minimize or 'preemptions'
+        found = self._search([], 0, None, predicate, invariant, metric,
+                             {} if prune else None)
+        if found is not None and minimize is not None:
+            # Raise the bound until a violation appears. The one found above
+            # guarantees that this stops below its own cost.
+            for bound in range(self.__cost(found[0], metric)):
+                smaller = self._search([], 0, bound, predicate, invariant,
+                                       metric, {} if prune else None)
+                if smaller is not None:
+                    found = smaller
+                    break
+
+        if found is None:
+            return None
+
+        hist, kind = found
+        execution = Sim.Execution(self.proc_mains, self.server_factory)
+        res = Sim.Counterexample(self.n, kind,
+                                 self.__cost(hist, 'preemptions'))
+        res.digests = [execution.step(c).digest() for c in hist]
+        res.responses = execution.responses
+        res.server_json = execution.server.to_json()
+        res.hist = hist
+        return res
+
+    def _search(self, hist: List[int], cost: int, bound: Optional[int],
+                predicate, invariant, metric: str, memo: Optional[dict]):
+        """
+        Depth-first search for a property violation below a history
+        :param cost: Preemptions or steps taken by hist, depending on metric
+        :param bound: Maximum cost of the histories to search, if any
+        :param memo: Lowest cost at which each equivalent history has been
+        searched, or None to disable pruning. With preemptions, the next
+        step's cost depends on the last process, which is part of the key.
+        :return: The violating history and the kind of violation, or None
+        """
+        execution, canonical_str = self._replay(hist)
+        server, responses = execution.server, execution.responses
+
+        if hist and invariant is not None and not invariant(server, responses):
+            return hist.copy(), 'invariant'
+        if execution.done():
+            if predicate is not None and not predicate(server, responses):
+                return hist.copy(), 'predicate'
+            return None
+
+        if memo is not None:
+            last = hist[-1] if hist and metric == 'preemptions' else None
+            key = canonical_str, last
+            if key in memo and memo[key] <= cost:
+                return None
+            memo[key] = cost
+
+        for choice in execution.choices():
+            if metric == 'length':
+                step_cost = cost + 1
             else:
-                prev_pid = self._hist[idx-1]
-                if requests[pid].commutes_with(requests[prev_pid]):
-                    canonical_part += str(pid)
-                else:
-                    canonical_str += ''.join(sorted(canonical_part)) + '*'
-                    canonical_part = str(pid)
+                preempts = hist and \
+                    self.__preempts(execution, hist[-1], choice)
+                step_cost = cost + 1 if preempts else cost
+            if bound is not None and step_cost > bound:
+                continue
+
+            hist.append(choice)
+            found = self._search(hist, step_cost, bound, predicate,
+                                 invariant, metric, memo)
+            hist.pop()
+            if found is not None:
+                return found
+
+        return None
+
+    def __cost(self, hist: List[int], metric: str) -> int:
+        if metric == 'length':
+            return len(hist)
+
+        execution = Sim.Execution(self.proc_mains, self.server_factory)
+        preemptions = 0
+        for i, choice in enumerate(hist):
+            if i and self.__preempts(execution, hist[i-1], choice):
+                preemptions += 1
+            execution.step(choice)
+        return preemptions
+
+    def __preempts(self, execution: "Sim.Execution", prev: int,
+                   choice: int) -> bool:
+        """
+        :return: Whether serving choice after prev switches away from a
+        process that could still run
+        """
+        prev_pid = prev % self.n
+        return choice % self.n != prev_pid and execution.alive[prev_pid]
 
-            try:
-                resp = requests[pid].serve()
-                requests[pid] = processes[pid].send(resp)
-            except StopIteration:
-                # This process has already terminated. No need to change
-                # self._steps since this must have been handled in _dfs.
-                pass
+    def _replay(self, hist: List[int]) -> Tuple["Sim.Execution", str]:
+        """
+        Executes a history from scratch
+        :param hist: Request served at each step (see Execution.step)
+        :return: The execution, and the history in "canonical" form
+        """
+        execution = Sim.Execution(self.proc_mains, self.server_factory)
+
+        blocks = []  # Runs of commuting requests, by identity
+        prev_req = None  # The request served at the previous step
+
+        for idx, choice in enumerate(hist):
+            # Requests are named by their identity rather than their choice,
+            # which shifts as earlier requests in flight are served
+            identity = execution.identity(choice)
+            # Compare against the request that was actually served, since
+            # its reply tells commutes_with about the state of the server
+            if blocks and execution.pending(choice).commutes_with(prev_req):
+                blocks[-1].append(identity)
+            else:
+                blocks.append([identity])
+
+            # A terminated process is never scheduled again, since this must
+            # have been handled by the caller
+            prev_req = execution.step(choice)
+
+        canonical_str = '*'.join(
+            ','.join(f'{pid}.{seq}' for pid, seq in sorted(block))
+            for block in blocks)
+        return execution, canonical_str
 
-        canonical_str += ''.join(sorted(canonical_part))
-        return server, processes, requests, canonical_str
+    def _dive(self):
+        """
+        Executes a single schedule, serving the first request in the order
+        of the strategy at every step
+        """
+        execution = Sim.Execution(self.proc_mains, self.server_factory)
+        digests = []
+        while not execution.done():
+            choice = self._strategy.order(execution.hist, execution)[0]
+            digests.append(execution.step(choice).digest())
+
+        res = self._observe(execution)
+        res.hist = execution.hist
+        res.digests = digests
+        self._record(res)
+
+    def witness(self, hist: List[int]) -> "Sim.Result":
+        """
+        Executes a complete history from scratch
+        :param hist: Request served at each step (see Execution.step)
+        :return: The observed result of the history, with hist as witness
+        """
+        execution = Sim.Execution(self.proc_mains, self.server_factory)
+        digests = [execution.step(choice).digest() for choice in hist]
+        assert(execution.done())
+        res = self._observe(execution)
+        res.hist = list(hist)
+        res.digests = digests
+        return res
+
+    def __new_results(self):
+        if self.result_cache is None:
+            return set()
+        return ResultStore(self.witness, self.result_cache)
+
+    def _observe(self, execution: "Sim.Execution") -> "Sim.Result":
+        """
+        :return: The observed result of a complete execution
+        """
+        res = Sim.Result(self.n)
+        for pid, summaries in enumerate(execution.responses):
+            for summary in summaries:
+                observed = self.observation.response(pid, summary)
+                if observed is not None:
+                    res.add_response(pid, observed)
+        res.server_json = self.observation.server(execution.server)
+        return res
+
+    def _record(self, res: "Sim.Result"):
+        """
+        Records the result of a complete execution
+        """
+        new = res not in self.results
+        # A ResultStore keeps the shortest witness of a known result
+        self.results.add(res)
+        if new:
+            self.discovery_times.append(time.perf_counter() - self._start)
+            for exporter in self.exporters:
+                exporter.write(res)
+        if self._race_detector is not None:
+            self._race_detector.observe(res.hist)
 
     def _dfs(self, verbose, prune):
         """
@@ -123,53 +632,68 @@ class Sim:
             s = ''.join(map(lambda x: str(x), self._hist))
             print(s, end='\r', flush=True)
 
-        server, processes, requests, canonical_str = self._exec_hist()
+        execution, canonical_str = self._replay(self._hist)
+
+        hist_str = ','.join(map(str, self._hist))  # Choices may exceed 9
+        node_id = 's' + (canonical_str if prune else hist_str)
 
         if prune:
             if canonical_str in self._memo:
+                self.__graph_edge(execution,
+                                  self._aliases.get(canonical_str, node_id))
                 return
-
-        end = True  # Whether all threads have finished
-        for i in range(self.n):
+            if not self.observation.is_identity():
+                state = self.observation.state(execution)
+                if state in self._states:
+                    # Later equivalent histories only need the memo, and
+                    # lead to the node of the state
+                    self._memo.add(canonical_str)
+                    if self._graph is not None:
+                        self._aliases[canonical_str] = self._states[state]
+                        self.__graph_edge(execution, self._states[state])
+                    return
+                self._states[state] = node_id \
+                    if self._graph is not None else None
+
+        self.__graph_edge(execution, node_id)
+        if self._graph is not None:
+            self._graph.node(node_id, hist_str or 'root', execution.done())
+        self._node_ids.append(node_id)
+
+        choices = self._strategy.order(self._hist, execution)
+        for k, i in enumerate(choices):
             # Computing the history again because the requests hold references
             # to servers, and the servers were operated on in the exploration.
             # Doing this will create fresh copies of requests that hold
             # references to the correct state of the server.
-            server, processes, requests, canonical_str = self._exec_hist()
+            if k:
+                execution, _ = self._replay(self._hist)
 
-            changed_steps = False
-            added_result = False
-
-            if not self._steps[i]:
-                continue  # Cannot schedule this thread to do more
-
-            end = False
-            try:
-                req = requests[i]
-                resp = req.serve()
-                self._result.add_response(i, req.summarize())
-                added_result = True
-
-                requests[i] = processes[i].send(resp)
-            except StopIteration:
-                self._steps[i] = False  # No more steps for this process
-                changed_steps = True
+            self._digests.append(execution.step(i).digest())
 
             self._hist.append(i)
             self._dfs(verbose, prune)
             self._hist.pop()   # Restore _hist
-            if changed_steps:  # Restore _steps
-                self._steps[i] = True
-            if added_result:   # Restore _result
-                self._result.responses[i].pop()
+            self._digests.pop()
 
         if prune:
             self._memo.add(canonical_str)
+        self._node_ids.pop()
 
-        if end:
-            res = deepcopy(self._result)
-            res.server_json = server.to_json()
-            self.results.add(res)
+        if not choices:  # All threads have finished
+            res = self._observe(execution)
+            res.hist = self._hist.copy()
+            res.digests = self._digests.copy()
+            self._record(res)
+
+    def __graph_edge(self, execution: "Sim.Execution", node_id: str):
+        """
+        Writes the edge of the last step of _hist to the graph, if any
+        """
+        if self._graph is not None and self._hist:
+            self._graph.edge(self._node_ids[-1], node_id,
+                             self._hist[-1] % self.n,
+                             execution.last.describe())
 
     def summarize(self):
         """
@@ -188,4 +712,8 @@ class Sim:
                 if m:
                     print(f'p{p}: {str(m)}')
             print(f'File: {res.server_json}')
+            if res in self.counts:
+                total = sum(self.counts.values())
+                print(f'Schedules: {self.counts[res]} of {total} '
+                      f'({100 * self.counts[res] / total:.1f}%)')
             print('-' * 50)
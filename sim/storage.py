@@ -0,0 +1,374 @@
+import mmap
+import os
+import struct
+from bisect import bisect_left, insort
+from threading import Lock
+from typing import Callable, List, Optional, Tuple
+
+from .chunks import Chunk
+from .lock import RWLock, NULL_LOCK
+from .server import RawFile, Directory
+
+
+class Storage:
+    """
+    Interface for a pluggable storage backend of the server. A backend
+    allocates the raw files of the server, and may persist the namespace so
+    that a later server can start from it. A backend must implement
+    new_file; by default it has no image to load, sync or close.
+    """
+
+    def new_file(self, lock) -> RawFile:
+        pass
+
+    def load(self, new_lock: Callable) -> Optional[Directory]:
+        """
+        Rebuilds the directory tree of an existing image
+        :param new_lock: Factory for the lock of every loaded node
+        :return: The root directory, or None if there is no image yet
+        """
+        pass
+
+    def sync(self, root: Directory):
+        pass
+
+    def close(self):
+        pass
+
+
+class ExtentAllocator:
+    """
+    First-fit allocator of contiguous extents in the data file. Free extents
+    are kept sorted by offset so that neighbours coalesce when freed. The
+    allocator does not touch the file itself; when no free extent is large
+    enough it grows the address space at the end and reports the new end.
+    """
+
+    def __init__(self, end: int = 0):
+        self.end = end   # Offset just past the last allocated byte
+        self.free = []   # Sorted list of (offset, length)
+
+    def allocate(self, length: int) -> int:
+        for i, (offset, size) in enumerate(self.free):
+            if size >= length:
+                if size == length:
+                    del self.free[i]
+                else:
+                    self.free[i] = (offset + length, size - length)
+                return offset
+
+        # Extend the last free extent if it touches the end of the file
+        if self.free and sum(self.free[-1]) == self.end:
+            offset, _ = self.free.pop()
+        else:
+            offset = self.end
+        self.end = offset + length
+        return offset
+
+    def release(self, offset: int, length: int):
+        if not length:
+            return
+
+        i = bisect_left(self.free, (offset, length))
+        # Coalesce with the following and the preceding free extent
+        if i < len(self.free) and offset + length == self.free[i][0]:
+            length += self.free[i][1]
+            del self.free[i]
+        if i > 0 and sum(self.free[i-1]) == offset:
+            offset = self.free[i-1][0]
+            length += self.free[i-1][1]
+            del self.free[i-1]
+        insort(self.free, (offset, length))
+
+    @staticmethod
+    def from_used(used: List[Tuple[int, int]]) -> "ExtentAllocator":
+        """
+        Rebuilds the allocator of an existing image from its used extents
+        """
+        allocator = ExtentAllocator()
+        for offset, length in sorted(used):
+            if offset > allocator.end:
+                allocator.free.append((allocator.end, offset - allocator.end))
+            allocator.end = max(allocator.end, offset + length)
+        return allocator
+
+
+class MappedFile(RawFile):
+    """
+    A raw file whose data lives in a single extent of the memory-mapped data
+    file of an MmapStorage. The extent is at least as large as the file, and
+    is reallocated with geometric growth when a write does not fit.
+
+    Unlike RawFile, a MappedFile is not sparse: a write past the end of the
+    file allocates and zero-fills the whole gap in the data file, and a
+    punched hole is zeroed in place rather than released. allocated() thus
+    always equals size().
+    """
+
+    MIN_EXTENT = 64
+
+    def __init__(self, storage: "MmapStorage", lock=NULL_LOCK,
+                 offset: int = 0, capacity: int = 0, size: int = 0):
+        super().__init__(lock)
+        self.storage = storage
+        self.offset = offset      # Offset of the extent in the data file
+        self.capacity = capacity  # Length of the extent
+        self.length = size        # Length of the file
+
+    @property
+    def bytes(self) -> List[str]:
+        return list(self.flatten())
+
+    def flatten(self):
+        return self.read(0, self.length)
+
+    def size(self) -> int:
+        return self.length
+
+    def read(self, offset: int, count: int) -> str:
+        end = min(offset + count, self.length)
+        if end <= offset:
+            return ''
+        return self.storage.read(self.offset + offset, end - offset)
+
+    def write(self, offset: int, data: str):
+        """
+        :raise ValueError: If data holds characters beyond latin-1, before
+        the file is changed
+        """
+        self.__write_raw(offset, data.encode('latin-1'))
+
+    def writev(self, segments: List[Tuple[int, str]]):
+        """
+        :raise ValueError: If any segment holds characters beyond latin-1,
+        before the file is changed
+        """
+        raw = [(offset, data.encode('latin-1')) for offset, data in segments]
+        # Grow the extent once for all segments rather than once per write
+        end = max((offset + len(data) for offset, data in raw), default=0)
+        if end > self.capacity:
+            self.__grow(max(end, 2 * self.capacity, MappedFile.MIN_EXTENT))
+        for offset, data in raw:
+            self.__write_raw(offset, data)
+
+    def fill(self, chunk: Chunk):
+        self.write(0, chunk.data)
+
+    def punch_hole(self, offset: int, count: int):
+        # The extent is contiguous, so the range is zeroed in place
+        end = min(offset + count, self.length)
+        if end > offset:
+            self.storage.zero(self.offset + offset, end - offset)
+
+    def allocated(self) -> int:
+        return self.length
+
+    def free(self):
+        self.storage.release(self.offset, self.capacity)
+        self.offset = self.capacity = self.length = 0
+
+    def __write_raw(self, offset: int, data: bytes):
+        end = offset + len(data)
+        if end > self.capacity:
+            self.__grow(max(end, 2 * self.capacity, MappedFile.MIN_EXTENT))
+
+        if offset > self.length:
+            # The gap may hold stale data of a freed extent
+            self.storage.zero(self.offset + self.length, offset - self.length)
+        self.storage.write(self.offset + offset, data)
+        self.length = max(self.length, end)
+
+    def __grow(self, capacity: int):
+        offset = self.storage.allocate(capacity)
+        if self.length:
+            self.storage.move(offset, self.offset, self.length)
+        self.storage.release(self.offset, self.capacity)
+        self.offset, self.capacity = offset, capacity
+
+
+class MmapStorage(Storage):
+    """
+    Storage backend that keeps all file data in one memory-mapped data file,
+    carved into extents by an ExtentAllocator, and the directory tree in a
+    compact metadata table next to it. Loading an image only reads the
+    metadata table; file data stays in the mapping and is paged in on demand.
+
+    Data is stored one byte per character (latin-1), since NFS file data is an
+    opaque byte sequence.
+
+    Extents freed since the last sync are not reused until the next sync has
+    written a metadata table that no longer points at them, since the image
+    on disk may still hold them. A crash between syncs thus loses the
+    changes since the last sync, but never hands the data of one file to
+    another. Without syncs, the data file grows by every freed extent.
+
+    Metadata table layout: a header (magic, version, record count) followed by
+    one record per node in pre-order, each holding the node and parent ids,
+    the node kind, the extent and file length, and the name.
+    """
+
+    DATA_FILE = 'data.img'
+    META_FILE = 'meta.tbl'
+
+    MAGIC = b'NFSM'
+    VERSION = 1
+    HEADER = struct.Struct('<4sII')
+    RECORD = struct.Struct('<IIBQQQH')  # id, parent, kind, offset, cap, len, n
+
+    KIND_DIR = 0
+    KIND_FILE = 1
+
+    def __init__(self, path: str, initial_size: int = 1 << 20):
+        """
+        :param path: Directory holding the image. Created if missing.
+        :param initial_size: Initial size of the data file in bytes, at
+        least one page since an empty file cannot be mapped
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.allocator = ExtentAllocator()
+        self._alloc_lock = Lock()  # Guards the allocator and _pending
+        # Extents freed since the last sync, released to the allocator once
+        # the image no longer points at them
+        self._pending: List[Tuple[int, int]] = []
+        self._map_lock = RWLock()  # Held exclusively while remapping
+
+        data_path = os.path.join(path, MmapStorage.DATA_FILE)
+        self._fd = os.open(data_path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(self._fd).st_size
+        initial_size = max(initial_size, mmap.PAGESIZE)
+        if size < initial_size:
+            os.ftruncate(self._fd, initial_size)
+            size = initial_size
+        self._mm = mmap.mmap(self._fd, size)
+
+    def new_file(self, lock) -> RawFile:
+        return MappedFile(self, lock)
+
+    def load(self, new_lock: Callable) -> Optional[Directory]:
+        """
+        Rebuilds the whole directory tree from the metadata table at once.
+        File data is not read, but every node is allocated, so memory grows
+        with the number of nodes in the image.
+        """
+        meta_path = os.path.join(self.path, MmapStorage.META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+
+        with open(meta_path, 'rb') as f:
+            table = f.read()
+
+        magic, version, count = MmapStorage.HEADER.unpack_from(table)
+        if magic != MmapStorage.MAGIC or version != MmapStorage.VERSION:
+            raise ValueError(f'{meta_path} is not a metadata table')
+
+        root = Directory(new_lock())
+        nodes = {0: root}
+        used = []
+        pos = MmapStorage.HEADER.size
+        for _ in range(count):
+            node_id, parent, kind, offset, capacity, length, n = \
+                MmapStorage.RECORD.unpack_from(table, pos)
+            pos += MmapStorage.RECORD.size
+            name = table[pos:pos + n].decode('utf-8')
+            pos += n
+
+            if kind == MmapStorage.KIND_DIR:
+                node = Directory(new_lock())
+            else:
+                node = MappedFile(self, new_lock(), offset, capacity, length)
+                used.append((offset, capacity))
+            nodes[parent].link(name, node)
+            nodes[node_id] = node
+
+        self.allocator = ExtentAllocator.from_used(used)
+        return root
+
+    def sync(self, root: Directory):
+        # Extents freed from here on may still be in the table written below
+        with self._alloc_lock:
+            freed, self._pending = self._pending, []
+
+        records = []
+        stack = [(0, root)]
+        next_id = 1
+        while stack:
+            parent, directory = stack.pop()
+            for name, node in directory.files.items():
+                node_id = next_id
+                next_id += 1
+                encoded = name.encode('utf-8')
+                if node.is_raw_file():
+                    assert(isinstance(node, MappedFile))
+                    records.append(MmapStorage.RECORD.pack(
+                        node_id, parent, MmapStorage.KIND_FILE, node.offset,
+                        node.capacity, node.length, len(encoded)) + encoded)
+                else:
+                    records.append(MmapStorage.RECORD.pack(
+                        node_id, parent, MmapStorage.KIND_DIR, 0, 0, 0,
+                        len(encoded)) + encoded)
+                    stack.append((node_id, node))
+
+        with self._map_lock.locked():
+            self._mm.flush()
+
+        # Write the table atomically so a crash never leaves a torn image
+        meta_path = os.path.join(self.path, MmapStorage.META_FILE)
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(MmapStorage.HEADER.pack(
+                MmapStorage.MAGIC, MmapStorage.VERSION, len(records)))
+            f.write(b''.join(records))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, meta_path)
+
+        with self._alloc_lock:
+            for offset, length in freed:
+                self.allocator.release(offset, length)
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
+
+    def allocate(self, length: int) -> int:
+        with self._alloc_lock:
+            offset = self.allocator.allocate(length)
+            end = self.allocator.end
+
+        if end > len(self._mm):
+            with self._map_lock.locked(write=True):
+                if end > len(self._mm):
+                    self.__remap(max(end, 2 * len(self._mm)))
+        return offset
+
+    def release(self, offset: int, length: int):
+        """
+        Frees an extent, which becomes available after the next sync
+        """
+        if length:
+            with self._alloc_lock:
+                self._pending.append((offset, length))
+
+    def read(self, offset: int, count: int) -> str:
+        with self._map_lock.locked():
+            with memoryview(self._mm) as view:
+                return str(view[offset:offset + count], 'latin-1')
+
+    def write(self, offset: int, data: bytes):
+        with self._map_lock.locked():
+            self._mm[offset:offset + len(data)] = data
+
+    def zero(self, offset: int, count: int):
+        with self._map_lock.locked():
+            self._mm[offset:offset + count] = bytes(count)
+
+    def move(self, dest: int, src: int, count: int):
+        with self._map_lock.locked():
+            self._mm.move(dest, src, count)
+
+    def __remap(self, size: int):
+        self._mm.flush()
+        self._mm.close()
+        os.ftruncate(self._fd, size)
+        self._mm = mmap.mmap(self._fd, size)
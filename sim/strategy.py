@@ -0,0 +1,76 @@
+import random
+from collections import defaultdict
+from typing import List, Optional
+
+
+class Strategy:
+    """
+    Interface of a scheduling strategy, which decides in which order Sim
+    explores the requests that can be served after a history, identified by
+    the choices of Sim.Execution (the pid, for a process with a single
+    request in flight). The order does not change which results are found,
+    only how early they are found. The base class is the default strategy
+    of Sim, which keeps the order of Sim.Execution.choices.
+    """
+
+    restarts = 0  # Random dives to a complete execution before the search
+
+    def order(self, hist: List[int], execution) -> List[int]:
+        """
+        :param hist: Request served at each step so far
+        :param execution: The Sim.Execution of hist
+        :return: The choices to explore after hist, first to last, which
+        must be a permutation of execution.choices()
+        """
+        return execution.choices()
+
+
+class ConflictFirst(Strategy):
+    """
+    Explores first the pending requests that do not commute with the request
+    served last, so that histories with many conflicting adjacent pairs,
+    which are the ones most likely to differ in outcome, come early
+    """
+
+    def order(self, hist: List[int], execution) -> List[int]:
+        choices = execution.choices()
+        if execution.last is None:
+            return choices
+        # Stable sort keeps the pid order among equally conflicting ones
+        return sorted(choices, key=lambda c: execution.pending(c)
+                      .commutes_with(execution.last))
+
+
+class FewestExplored(Strategy):
+    """
+    Explores first the request that has been served the fewest times at the
+    current depth so far, which spreads the early executions over different
+    prefixes instead of varying only the last steps
+    """
+
+    def __init__(self):
+        self.visits = defaultdict(int)  # (depth, choice) -> times served
+
+    def order(self, hist: List[int], execution) -> List[int]:
+        depth = len(hist)
+        if hist:
+            self.visits[depth - 1, hist[-1]] += 1
+        return sorted(execution.choices(),
+                      key=lambda c: self.visits[depth, c])
+
+
+class RandomRestart(Strategy):
+    """
+    Makes a number of random dives to complete executions before the search,
+    and then explores in a random order. Each dive samples one schedule, so
+    outcomes that are common among the schedules show up right away.
+    """
+
+    def __init__(self, restarts: int = 16, seed: Optional[int] = None):
+        self.restarts = restarts
+        self.rng = random.Random(seed)
+
+    def order(self, hist: List[int], execution) -> List[int]:
+        choices = execution.choices()
+        self.rng.shuffle(choices)
+        return choices
@@ -0,0 +1,201 @@
+import argparse
+import importlib
+import time
+from typing import Any, Callable, Iterator, List
+
+from .codec import encode_varint, decode_varint
+from .export import Exporter
+from .server import Server
+from .sim import Sim
+
+
+class TraceMismatch(Exception):
+    """
+    Raised when a replayed process issues a request whose digest differs from
+    the recorded one, which means its main function is nondeterministic or
+    has changed since the trace was recorded
+    """
+
+    def __init__(self, step: int, pid: int):
+        super().__init__(f'Request of process {pid} at step {step} does not '
+                         f'match the trace')
+        self.step = step
+        self.pid = pid
+
+
+class Trace:
+    """
+    Compact schedule trace: the process scheduled at each step, and the
+    digest of the request it issued (see Request.digest).
+
+    Encoded as the varint number of steps followed by a varint pid and a
+    varint digest per step.
+    """
+
+    def __init__(self, pids: List[int], digests: List[int]):
+        assert(len(pids) == len(digests))
+        self.pids = pids
+        self.digests = digests
+
+    def encode(self) -> bytes:
+        out = bytearray(encode_varint(len(self.pids)))
+        for pid, digest in zip(self.pids, self.digests):
+            out += encode_varint(pid)
+            out += encode_varint(digest)
+        return bytes(out)
+
+    @staticmethod
+    def decode(buf, pos: int = 0) -> "Trace":
+        n, pos = decode_varint(buf, pos)
+        pids = []
+        digests = []
+        for _ in range(n):
+            pid, pos = decode_varint(buf, pos)
+            digest, pos = decode_varint(buf, pos)
+            pids.append(pid)
+            digests.append(digest)
+        return Trace(pids, digests)
+
+    def __len__(self):
+        return len(self.pids)
+
+
+class TraceExporter(Exporter):
+    """
+    Writes the schedule trace of every unique result. The file starts with
+    MAGIC and is followed by traces, each prefixed with its varint length.
+    """
+
+    MAGIC = b'NFST\x01'
+
+    def __init__(self, path: str):
+        self.file = open(path, 'wb')
+        self.file.write(TraceExporter.MAGIC)
+
+    def write(self, result: Sim.Result):
+        payload = Trace(result.hist, result.digests).encode()
+        self.file.write(encode_varint(len(payload)))
+        self.file.write(payload)
+
+    def close(self):
+        self.file.close()
+
+
+def read_traces(path: str) -> Iterator[Trace]:
+    with open(path, 'rb') as f:
+        buf = f.read()
+
+    if buf[:len(TraceExporter.MAGIC)] != TraceExporter.MAGIC:
+        raise ValueError(f'{path} is not a trace file')
+
+    pos = len(TraceExporter.MAGIC)
+    while pos < len(buf):
+        length, pos = decode_varint(buf, pos)
+        yield Trace.decode(buf, pos)
+        pos += length
+
+
+def replay(proc_mains: List[Callable[[Server], Any]], trace: Trace,
+           verify: bool = True,
+           server_factory: Callable[[], Any] = Server) -> Sim.Result:
+    """
+    Executes exactly one schedule against fresh process mains, in time
+    linear in the length of the trace
+    :param proc_mains: Entry functions the trace was recorded with
+    :param trace: Schedule to execute
+    :param verify: Whether to check every request against its digest
+    :param server_factory: Server factory the trace was recorded with
+    :return: The result of the execution, with the trace as its history
+    :raise TraceMismatch: If verify is set and a request does not match
+    """
+    execution = Sim.Execution(proc_mains, server_factory)
+    result = Sim.Result(len(proc_mains))
+
+    for step, (choice, digest) in enumerate(zip(trace.pids, trace.digests)):
+        pid = choice % execution.n
+        if verify and execution.pending(choice).digest() != digest:
+            raise TraceMismatch(step, pid)
+        execution.step(choice)
+
+    result.responses = execution.responses
+    result.server_json = execution.server.to_json()
+    result.hist = list(trace.pids)
+    result.digests = list(trace.digests)
+    return result
+
+
+def bench(proc_mains: List[Callable[[Server], Any]], path: str,
+          repeat: int = 1, verify: bool = True,
+          server_factory: Callable[[], Any] = Server) -> dict:
+    """
+    Replays every trace of a trace file in a tight loop, as a regression
+    benchmark of the simulator and server
+    :param server_factory: Server factory the traces were recorded with
+    :return: Number of traces and steps replayed, elapsed seconds, and
+    steps per second
+    """
+    traces = list(read_traces(path))
+
+    steps = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for trace in traces:
+            replay(proc_mains, trace, verify, server_factory)
+            steps += len(trace)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'traces': len(traces) * repeat,
+        'steps': steps,
+        'seconds': elapsed,
+        'steps_per_sec': steps / elapsed if elapsed else float('inf'),
+    }
+
+
+def _load_mains(spec: str) -> List[Callable[[Server], Any]]:
+    """
+    :param spec: Comma separated "module:function" names of the mains
+    """
+    mains = []
+    for name in spec.split(','):
+        module, _, func = name.partition(':')
+        mains.append(getattr(importlib.import_module(module), func))
+    return mains
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Replay schedule traces recorded by TraceExporter')
+    parser.add_argument('command', choices=['replay', 'bench'])
+    parser.add_argument('mains', help='comma separated module:function '
+                                      'names of the process mains')
+    parser.add_argument('traces', help='trace file')
+    parser.add_argument('--index', type=int, default=None,
+                        help='only replay the trace with this index')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='number of passes over the file in bench mode')
+    parser.add_argument('--no-verify', action='store_true',
+                        help='skip checking requests against their digests')
+    args = parser.parse_args()
+
+    mains = _load_mains(args.mains)
+    if args.command == 'bench':
+        stats = bench(mains, args.traces, args.repeat, not args.no_verify)
+        print(f"Replayed {stats['traces']} traces ({stats['steps']} steps) "
+              f"in {stats['seconds']:.3f}s: "
+              f"{stats['steps_per_sec']:.0f} steps/s")
+        return
+
+    for i, trace in enumerate(read_traces(args.traces)):
+        if args.index is not None and i != args.index:
+            continue
+        res = replay(mains, trace, not args.no_verify)
+        print(f'Trace #{i}: {"".join(map(str, res.hist))}')
+        for p, m in enumerate(res.responses):
+            if m:
+                print(f'p{p}: {str(m)}')
+        print(f'File: {res.server_json}')
+
+
+if __name__ == '__main__':
+    main()
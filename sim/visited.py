@@ -0,0 +1,160 @@
+import hashlib
+from multiprocessing import shared_memory
+from typing import Optional
+
+
+class SharedVisitedTable:
+    """
+    Fixed-capacity set of 64-bit fingerprints of canonical histories, kept
+    in shared memory so that every worker process exploring a Sim on the same
+    machine prunes against one memo (see Sim._memo). Workers attach to the
+    table by name; lookups and inserts touch only the shared buffer, with no
+    locks, pickling or IPC.
+
+    The table uses open addressing with linear probing over aligned 64-bit
+    slots, where 0 marks an empty slot. An insert claims an empty slot with a
+    single store and reads it back. Without a compare-and-swap two workers
+    may claim the same slot at once, in which case the loser sees the
+    winner's fingerprint and keeps probing, or, if the stores interleave with
+    the read-backs, one insert is lost. A lost insert only means a subtree is
+    explored twice, which is the same outcome as a fingerprint that never
+    made it into the table, so the memo stays sound: it may miss a visited
+    history, but never reports an unvisited one (up to 64-bit fingerprint
+    collisions).
+
+    Workers should be started through multiprocessing by the process that
+    created the table, so that they share its resource tracker and the
+    segment is freed exactly once, when the creator closes the table.
+    """
+
+    SLOT_SIZE = 8
+    SCAN_SLOTS = 1 << 12  # Slots copied at a time when counting the table
+
+    def __init__(self, capacity: int = 1 << 20, name: Optional[str] = None):
+        """
+        :param capacity: Number of slots, rounded up to a power of two. Only
+        used when creating a table.
+        :param name: Name of an existing table to attach to, or None to
+        create a new one
+        """
+        self.owner = name is None
+        if self.owner:
+            capacity = 1 << max(capacity - 1, 1).bit_length()
+            self.shm = shared_memory.SharedMemory(
+                create=True, size=capacity * SharedVisitedTable.SLOT_SIZE)
+            self.shm.buf[:] = bytes(len(self.shm.buf))
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.slots = self.shm.buf.cast('Q')
+        self.capacity = len(self.slots)
+        self.mask = self.capacity - 1
+
+        # Statistics of this process
+        self.inserts = 0     # Fingerprints added by this process
+        self.probes = 0      # Slots examined by this process
+        self.collisions = 0  # Slots found holding another fingerprint
+        self.overflows = 0   # Inserts dropped because the table was full
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @staticmethod
+    def fingerprint(key: str) -> int:
+        """
+        :return: Non-zero 64-bit fingerprint of a canonical history string
+        """
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') or 1
+
+    def insert(self, fp: int) -> bool:
+        """
+        Inserts a fingerprint unless it is already present
+        :param fp: Non-zero fingerprint
+        :return: True if the fingerprint was absent. Also True when the
+        table is full, so that a full table never prunes.
+        """
+        assert(fp != 0)
+        i = fp & self.mask
+        for _ in range(self.capacity):
+            self.probes += 1
+            slot = self.slots[i]
+            if slot == fp:
+                return False
+            if slot == 0:
+                self.slots[i] = fp
+                if self.slots[i] == fp:
+                    self.inserts += 1
+                    return True
+                slot = self.slots[i]  # Lost the slot to another worker
+                if slot == fp:
+                    return False
+            self.collisions += 1
+            i = (i + 1) & self.mask
+
+        self.overflows += 1
+        return True
+
+    def contains(self, fp: int) -> bool:
+        i = fp & self.mask
+        for _ in range(self.capacity):
+            self.probes += 1
+            slot = self.slots[i]
+            if slot == fp:
+                return True
+            if slot == 0:
+                return False
+            i = (i + 1) & self.mask
+        return False
+
+    # Set interface over canonical history strings, so that the table can
+    # stand in for the memo of Sim
+    def add(self, key: str):
+        self.insert(SharedVisitedTable.fingerprint(key))
+
+    def __contains__(self, key: str) -> bool:
+        return self.contains(SharedVisitedTable.fingerprint(key))
+
+    def __len__(self) -> int:
+        # Counted by scanning the slots a window at a time, so the table is
+        # never copied as a whole. A shared counter would need an atomic
+        # increment, which the workers do not have.
+        empty = 0
+        for i in range(0, self.capacity, SharedVisitedTable.SCAN_SLOTS):
+            window = self.slots[i:i + SharedVisitedTable.SCAN_SLOTS]
+            empty += window.tolist().count(0)
+            window.release()
+        return self.capacity - empty
+
+    def stats(self) -> dict:
+        """
+        :return: Fill ratio of the shared table, and the probe statistics of
+        this process
+        """
+        size = len(self)
+        return {'capacity': self.capacity, 'size': size,
+                'fill_ratio': size / self.capacity, 'inserts': self.inserts,
+                'probes': self.probes, 'collisions': self.collisions,
+                'overflows': self.overflows}
+
+    def close(self):
+        """
+        Detaches this process from the table. The creator also frees it.
+        """
+        self.slots.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getstate__(self):
+        # Worker processes attach to the same segment instead of copying it
+        return {'name': self.name}
+
+    def __setstate__(self, state):
+        self.__init__(name=state['name'])
@@ -0,0 +1,279 @@
+import json
+import os
+import re
+import time
+import zlib
+from threading import Condition, Thread
+from typing import List, Optional
+
+from NFS.fhandle import FileHandle
+from .server import Server
+
+
+class WriteAheadLog:
+    """
+    Append-only write-ahead log of the mutating NFS procedures (WRITE, WRITEV,
+    CREATE, REMOVE, MKDIR, RMDIR), so that a server can make every mutation
+    stable before replying as NFSv2 requires.
+
+    Durability uses group commit. Mutations are first appended to an
+    in-memory buffer. The first caller to commit becomes the leader: it waits
+    for the group window, writes out everything buffered by then and issues a
+    single fsync, while the other callers wait for it. Concurrent mutations
+    therefore share one fsync instead of paying for one each.
+
+    On disk, the log is a sequence of numbered segments plus a snapshot of the
+    tree. Each record is one line holding a CRC32 and the JSON encoding of the
+    procedure and its arguments; a torn record at the end of a segment is
+    ignored on replay. Once the active segment grows past compact_bytes, a
+    background thread rotates it and folds all closed segments into a new
+    snapshot, without touching the live server.
+
+    Replay assumes the server starts from the default Server() state, so the
+    log should not be combined with a storage backend that has its own image.
+    """
+
+    SNAPSHOT = 'snapshot.json'
+    SEGMENT = 'wal.{:08d}.log'
+    SEGMENT_RE = re.compile(r'^wal\.(\d{8})\.log$')
+
+    PROCS = {'write', 'writev', 'create', 'remove', 'mkdir', 'rmdir'}
+
+    def __init__(self, path: str, window: float = 0.001,
+                 compact_bytes: int = 1 << 20):
+        """
+        :param path: Directory holding the log. Created if missing.
+        :param window: Seconds a commit leader waits for more mutations to
+        join its group before issuing the fsync
+        :param compact_bytes: Size of the active segment that triggers a
+        background compaction
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.window = window
+        self.compact_bytes = compact_bytes
+
+        self._cond = Condition()
+        self._buf = []           # Encoded records not yet written
+        self._seq = 0            # Sequence number of the last appended record
+        self._durable = 0        # Sequence number of the last durable record
+        self._flushing = False   # Whether a leader is writing out a group
+        self._compactor = None   # Background compaction thread, if running
+
+        # Statistics
+        self.records = 0
+        self.fsyncs = 0
+        self.compactions = 0
+
+        # Never append to a segment left by a previous run, as it may end in a
+        # torn record. Start a new one after everything that exists.
+        snapshot_gen = self.__read_snapshot()[0]
+        self._gen = max([snapshot_gen, *self.__segments()]) + 1
+        self._file = open(self.__segment_path(self._gen), 'ab')
+
+    def append(self, proc: str, path: List[str], *args) -> int:
+        """
+        Buffers a mutation. It is not durable until commit is called with the
+        returned sequence number.
+        :param proc: Name of the procedure, e.g. 'write'
+        :param path: Path of the file handle the procedure was called with
+        :param args: Remaining arguments of the procedure
+        :return: Sequence number of the record
+        """
+        assert(proc in WriteAheadLog.PROCS)
+        body = json.dumps([proc, path, *args]).encode('utf-8')
+        line = b'%08x %s\n' % (zlib.crc32(body), body)
+
+        with self._cond:
+            self._buf.append(line)
+            self._seq += 1
+            self.records += 1
+            return self._seq
+
+    def commit(self, seq: int):
+        """
+        Blocks until the record with sequence number seq is durable
+        """
+        with self._cond:
+            while self._durable < seq:
+                if self._flushing:
+                    self._cond.wait()  # Another thread leads this group
+                else:
+                    self.__flush_group()
+            full = self._file.tell() >= self.compact_bytes
+
+        if full:
+            self.compact()
+
+    def recover(self, server: Server):
+        """
+        Rebuilds the state of a server from the snapshot and every segment
+        written after it. Called by Server before the log is attached, so that
+        replayed procedures are not logged again.
+        :param server: Server in its initial state
+        """
+        gen, tree = self.__read_snapshot()
+        if tree is not None:
+            server.load_json(tree)
+
+        for seg in self.__segments():
+            if gen < seg < self._gen:
+                self.__replay(self.__segment_path(seg), server)
+
+    def compact(self, background: bool = True) -> Optional[Thread]:
+        """
+        Rotates the active segment and folds all closed segments into a new
+        snapshot. Does nothing if a compaction is already running.
+        :param background: Whether to fold in a background thread
+        :return: The background thread, if one was started
+        """
+        with self._cond:
+            if self._compactor is not None:
+                return None
+            while self._flushing:
+                self._cond.wait()
+
+            # Anything still buffered belongs to the segment being closed
+            if self._buf:
+                self.__write_out()
+            self._file.close()
+            closed = self._gen
+            self._gen += 1
+            self._file = open(self.__segment_path(self._gen), 'ab')
+
+            self._compactor = Thread(target=self.__fold, args=(closed,),
+                                     daemon=True)
+
+        if not background:
+            self._compactor.run()
+            return None
+        self._compactor.start()
+        return self._compactor
+
+    def close(self):
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            if self._buf:
+                self.__write_out()
+            compactor = self._compactor
+
+        if compactor is not None and compactor.is_alive():
+            compactor.join()
+        self._file.close()
+
+    def __flush_group(self):
+        """
+        Writes out the current group as its leader. Called with _cond held.
+        """
+        self._flushing = True
+        try:
+            if self.window:
+                # Let concurrent mutations join the group
+                self._cond.release()
+                try:
+                    time.sleep(self.window)
+                finally:
+                    self._cond.acquire()
+            self.__write_out(release=True)
+        finally:
+            self._flushing = False
+            self._cond.notify_all()
+
+    def __write_out(self, release: bool = False):
+        """
+        Writes and fsyncs everything buffered so far. Called with _cond held.
+        :param release: Whether to drop _cond during the I/O. Only the group
+        leader may do so, as _flushing keeps the file from being rotated.
+        """
+        batch, self._buf = self._buf, []
+        last = self._seq
+        file = self._file
+
+        if release:
+            self._cond.release()
+        try:
+            file.write(b''.join(batch))
+            file.flush()
+            os.fsync(file.fileno())
+        finally:
+            if release:
+                self._cond.acquire()
+
+        self.fsyncs += 1
+        self._durable = last
+        self._cond.notify_all()
+
+    def __fold(self, closed: int):
+        """
+        Replays every segment up to and including closed on top of the last
+        snapshot in a scratch server, then writes the result as the new
+        snapshot and deletes the folded segments.
+        """
+        try:
+            scratch = Server()
+            gen, tree = self.__read_snapshot()
+            if tree is not None:
+                scratch.load_json(tree)
+
+            folded = [seg for seg in self.__segments() if seg <= closed]
+            for seg in folded:
+                if seg > gen:
+                    self.__replay(self.__segment_path(seg), scratch)
+
+            snapshot_path = os.path.join(self.path, WriteAheadLog.SNAPSHOT)
+            tmp_path = snapshot_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(json.dumps({'gen': closed}) + '\n')
+                f.write(scratch.to_json() + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, snapshot_path)
+
+            # The snapshot covers these now. A crash before they are all
+            # deleted is harmless, since replay skips segments it covers.
+            for seg in folded:
+                os.remove(self.__segment_path(seg))
+            self.compactions += 1
+        finally:
+            with self._cond:
+                self._compactor = None
+
+    @staticmethod
+    def __replay(path: str, server: Server):
+        with open(path, 'rb') as f:
+            for line in f:
+                crc, _, body = line.rstrip(b'\n').partition(b' ')
+                try:
+                    if int(crc, 16) != zlib.crc32(body):
+                        break
+                    proc, fpath, *args = json.loads(body)
+                except ValueError:
+                    break  # Torn record at the end of the segment
+
+                assert(proc in WriteAheadLog.PROCS)
+                getattr(server, proc)(FileHandle(fpath), *args)
+
+    def __read_snapshot(self):
+        """
+        :return: The generation of the last segment covered by the snapshot
+        and the serialized tree, or (0, None) if there is no snapshot yet
+        """
+        snapshot_path = os.path.join(self.path, WriteAheadLog.SNAPSHOT)
+        if not os.path.exists(snapshot_path):
+            return 0, None
+
+        with open(snapshot_path) as f:
+            header = json.loads(f.readline())
+            return header['gen'], f.readline()
+
+    def __segments(self) -> List[int]:
+        segs = []
+        for name in os.listdir(self.path):
+            match = WriteAheadLog.SEGMENT_RE.match(name)
+            if match:
+                segs.append(int(match.group(1)))
+        return sorted(segs)
+
+    def __segment_path(self, gen: int) -> str:
+        return os.path.join(self.path, WriteAheadLog.SEGMENT.format(gen))
@@ -0,0 +1,215 @@
+import itertools
+import json
+import random
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .client_filesys import ClientFileSystem
+from .server import Server
+
+
+class WorkloadSpec:
+    """
+    Parameters of a synthetic workload. Every field is plain data, so a spec
+    serializes to JSON and can be swept over (see sweep).
+    """
+
+    OPS = ('create', 'open', 'read', 'write', 'append', 'seek', 'mkdir',
+           'rmdir', 'remove')
+
+    DEFAULT_MIX = {'create': 1, 'open': 1, 'read': 3, 'write': 2, 'append': 2,
+                   'seek': 1, 'mkdir': 0.5, 'rmdir': 0.5, 'remove': 0.5}
+
+    def __init__(self, processes: int = 2, ops: int = 3,
+                 mix: Optional[Dict[str, float]] = None,
+                 distribution: str = 'hot', hot_files: int = 2,
+                 hot_fraction: float = 0.8, zipf_s: float = 1.0,
+                 dirs: int = 2, files_per_dir: int = 3,
+                 payload: Tuple[int, int] = (1, 3), seed: int = 0):
+        """
+        :param processes: Number of process mains
+        :param ops: Number of operations of each process, at least one so
+        that every process main issues a request
+        :param mix: Relative weight of each operation in OPS. Missing
+        operations are never generated.
+        :param distribution: 'hot' to pick one of the first hot_files paths
+        with probability hot_fraction and any path otherwise, or 'zipf' to
+        pick the path of rank k with probability proportional to 1 / k^zipf_s
+        :param dirs: Number of directories under the root
+        :param files_per_dir: Number of file names in the root and in each
+        directory, in addition to the files the server starts with
+        :param payload: Inclusive range of the length of written data, and
+        of the count of reads
+        :param seed: Seed of the generator
+        """
+        mix = dict(WorkloadSpec.DEFAULT_MIX if mix is None else mix)
+        for op in mix:
+            if op not in WorkloadSpec.OPS:
+                raise ValueError(f'Unknown operation {op}')
+        if ops < 1:
+            raise ValueError('Every process needs at least one operation')
+        if distribution not in {'hot', 'zipf'}:
+            raise ValueError(f'Unknown distribution {distribution}')
+
+        self.processes = processes
+        self.ops = ops
+        self.mix = mix
+        self.distribution = distribution
+        self.hot_files = hot_files
+        self.hot_fraction = hot_fraction
+        self.zipf_s = zipf_s
+        self.dirs = dirs
+        self.files_per_dir = files_per_dir
+        self.payload = tuple(payload)
+        self.seed = seed
+
+    def to_dict(self) -> dict:
+        d = dict(vars(self))
+        d['payload'] = list(self.payload)
+        return d
+
+    @staticmethod
+    def from_dict(d: dict) -> "WorkloadSpec":
+        return WorkloadSpec(**d)
+
+    def replace(self, **changes) -> "WorkloadSpec":
+        """
+        :return: A copy of the spec with some fields changed
+        """
+        d = self.to_dict()
+        d.update(changes)
+        return WorkloadSpec.from_dict(d)
+
+
+class Workload:
+    """
+    Client programs generated from a WorkloadSpec. A program is a list of
+    operations, each a list of the operation name and its arguments:
+
+    ["create", path], ["open", path], ["read", path, count],
+    ["write", path, data], ["append", path, data], ["seek", path, pos],
+    ["mkdir", path], ["rmdir", path] and ["remove", path]
+
+    Operations on a file refer to it by path; the process main opens the
+    file on first use, and skips the operation if it cannot. The programs
+    are serialized along with the spec, so a run is reproducible from its
+    description alone.
+    """
+
+    def __init__(self, spec: WorkloadSpec, programs: List[List[List[Any]]]):
+        self.spec = spec
+        self.programs = programs
+
+    @staticmethod
+    def generate(spec: WorkloadSpec) -> "Workload":
+        rng = random.Random(spec.seed)
+        files, dirs = Workload.__namespace(spec)
+        ops = [op for op in WorkloadSpec.OPS if spec.mix.get(op, 0) > 0]
+        weights = [spec.mix[op] for op in ops]
+        zipf = [1 / (k + 1) ** spec.zipf_s for k in range(len(files))]
+
+        def pick_file() -> str:
+            if spec.distribution == 'zipf':
+                return rng.choices(files, weights=zipf)[0]
+            if rng.random() < spec.hot_fraction:
+                return rng.choice(files[:max(spec.hot_files, 1)])
+            return rng.choice(files)
+
+        programs = []
+        for pid in range(spec.processes):
+            char = chr(ord('a') + pid % 26)  # Tells the writers apart
+            program = []
+            for op in rng.choices(ops, weights=weights, k=spec.ops):
+                if op in {'mkdir', 'rmdir'}:
+                    program.append([op, rng.choice(dirs)])
+                    continue
+
+                path = pick_file()
+                if op in {'write', 'append'}:
+                    program.append([op, path, char * rng.randint(
+                        *spec.payload)])
+                elif op == 'read':
+                    program.append([op, path, rng.randint(*spec.payload)])
+                elif op == 'seek':
+                    program.append([op, path, rng.randint(
+                        0, spec.payload[1])])
+                else:
+                    program.append([op, path])
+            programs.append(program)
+
+        return Workload(spec, programs)
+
+    def mains(self) -> List[Callable[[Server], Any]]:
+        """
+        :return: One process main per program, to be passed to Sim
+        """
+        return [Workload.__main(program) for program in self.programs]
+
+    def to_json(self) -> str:
+        return json.dumps({'spec': self.spec.to_dict(),
+                           'programs': self.programs})
+
+    @staticmethod
+    def from_json(s: str) -> "Workload":
+        d = json.loads(s)
+        return Workload(WorkloadSpec.from_dict(d['spec']), d['programs'])
+
+    @staticmethod
+    def __namespace(spec: WorkloadSpec) -> Tuple[List[str], List[str]]:
+        """
+        :return: File paths, ordered from the hottest, and directory paths
+        """
+        files = ['/foo.txt', '/bar.txt']  # Populated by the server
+        files += [f'/f{j}.txt' for j in range(spec.files_per_dir)]
+        dirs = [f'/d{i}' for i in range(spec.dirs)]
+        for d in dirs:
+            files += [f'{d}/f{j}.txt' for j in range(spec.files_per_dir)]
+        return files, dirs or ['/d0']
+
+    @staticmethod
+    def __main(program: List[List[Any]]) -> Callable[[Server], Any]:
+        def main(server: Server):
+            fs = ClientFileSystem(server)
+            fds = {}  # Path -> file descriptor
+
+            for op, path, *args in program:
+                if op == 'mkdir':
+                    yield from fs.mkdir(path)
+                    continue
+                if op == 'rmdir':
+                    yield from fs.rmdir(path)
+                    continue
+                if op == 'create':
+                    fd = yield from fs.create(path)
+                    if fd != -1:
+                        fds[path] = fd
+                    continue
+
+                if path not in fds:
+                    fd = yield from fs.open(path)
+                    if fd == -1:
+                        continue
+                    fds[path] = fd
+                fd = fds[path]
+
+                if op == 'read':
+                    yield from fs.read(fd, args[0])
+                elif op == 'write':
+                    yield from fs.write(fd, args[0])
+                elif op == 'append':
+                    yield from fs.append(fd, args[0])
+                elif op == 'seek':
+                    fs.seek(fd, args[0])
+                elif op == 'remove':
+                    if (yield from fs.remove(fd)):
+                        del fds[path]
+        return main
+
+
+def sweep(base: WorkloadSpec, **grid) -> Iterator[WorkloadSpec]:
+    """
+    Yields a spec for every combination of the given values, e.g.
+    sweep(spec, processes=[2, 3], seed=range(10))
+    """
+    keys = list(grid)
+    for values in itertools.product(*(grid[k] for k in keys)):
+        yield base.replace(**dict(zip(keys, values)))
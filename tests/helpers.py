@@ -0,0 +1,73 @@
+from sim.client_filesys import ClientFileSystem
+from sim.request import Await
+from sim.server import Server
+
+
+def appender_main(s: str, times: int = 1, path: str = '/bar.txt',
+                  create: bool = False, read: int = 0):
+    """
+    :param s: String appended to the file
+    :param times: Number of appends
+    :param path: File to append to
+    :param create: Whether to create the file first, opening it if the
+    create fails
+    :param read: Number of bytes read after the appends, if any
+    :return: Process main that appends to a file
+    """
+    def main(server: Server):
+        fs = ClientFileSystem(server)
+        fd = -1
+        if create:
+            fd = yield from fs.create(path)
+        if fd == -1:
+            fd = yield from fs.open(path)
+        for _ in range(times):
+            yield from fs.append(fd, s)
+        if read:
+            yield from fs.read(fd, read)
+    return main
+
+
+def reader_main(path: str = '/foo.txt', count: int = 10):
+    """
+    :return: Process main that reads count bytes from the start of a file
+    """
+    def main(server: Server):
+        fs = ClientFileSystem(server)
+        fd = yield from fs.open(path)
+        yield from fs.read(fd, count)
+    return main
+
+
+def writer_main(s: str, path: str = '/foo.txt'):
+    """
+    :return: Process main that writes s at the start of a file
+    """
+    def main(server: Server):
+        fs = ClientFileSystem(server)
+        fd = yield from fs.open(path)
+        yield from fs.write(fd, s)
+    return main
+
+
+def run(gen, served=None):
+    """
+    Serves the requests of a client operation in the order they are issued
+    :param served: List that receives every served request
+    :return: The return value of the operation
+    """
+    try:
+        yielded = next(gen)
+        while True:
+            if isinstance(yielded, Await):
+                for req in yielded.issued:
+                    req.serve()
+                if served is not None:
+                    served.extend(yielded.issued)
+                yielded = gen.send([req.resp for req in yielded.awaited])
+            else:
+                if served is not None:
+                    served.append(yielded)
+                yielded = gen.send(yielded.serve())
+    except StopIteration as e:
+        return e.value
@@ -0,0 +1,103 @@
+import json
+import unittest
+from sim.client_filesys import ClientFileSystem
+from sim.server import Server
+from sim.sim import Sim
+from tests.helpers import reader_main, run
+
+
+def overwriter_main(pipelined: bool):
+    def main(server: Server):
+        fs = ClientFileSystem(server)
+        fd = yield from fs.open('/foo.txt')
+        if pipelined:
+            first = yield from fs.write_async(fd, 'ab')
+            fs.seek(fd, 1)
+            second = yield from fs.write_async(fd, 'X')
+            yield from fs.wait([first, second])
+        else:
+            yield from fs.write(fd, 'ab')
+            fs.seek(fd, 1)
+            yield from fs.write(fd, 'X')
+    return main
+
+
+def pipelined_reader_main(server: Server):
+    fs = ClientFileSystem(server)
+    fd = yield from fs.open('/bar.txt')
+    tokens = []
+    for offset, count in [(1, 1), (1, 2), (2, 2)]:
+        fs.seek(fd, offset)
+        tokens.append((yield from fs.read_async(fd, count)))
+    yield from fs.wait(tokens)
+
+
+def seek_writer_main(server: Server):
+    fs = ClientFileSystem(server)
+    fd = yield from fs.open('/bar.txt')
+    fs.seek(fd, 1)
+    yield from fs.write(fd, 'xy')
+
+
+class AsyncClient(unittest.TestCase):
+    def test_pipelined_operations(self):
+        fs = ClientFileSystem(Server())
+        fd = run(fs.open('/foo.txt'))
+        tokens = [run(fs.write_async(fd, s)) for s in ['ab', 'cd']]
+        self.assertEqual(len(fs.outstanding), 2)
+        self.assertEqual(run(fs.wait(tokens)), [True, True])
+        self.assertEqual(fs.outstanding, {})
+
+        fs.seek(fd, 1)
+        tokens = [run(fs.read_async(fd, 2)) for _ in range(2)]
+        tokens.append(run(fs.read_async(-1, 1)))
+        self.assertEqual(run(fs.wait(tokens)), ['bc', 'd', None])
+        self.assertEqual(run(fs.wait(tokens)), [None, None, None])
+
+    def test_requests_in_flight(self):
+        mains = [overwriter_main(True), reader_main('/bar.txt', 1)]
+        execution = Sim.Execution(mains)
+        execution.step(0)  # Open
+        # Both writes are in flight, and either may be served first
+        self.assertEqual(execution.choices(), [0, 2, 1])
+        execution.step(2)
+        self.assertEqual(execution.choices(), [0, 1])
+        execution.step(0)
+        self.assertFalse(execution.alive[0])
+        self.assertEqual(json.loads(execution.server.to_json())['foo.txt'],
+                         'ab')
+
+    def test_reordering_explored(self):
+        plain = Sim([overwriter_main(False)])
+        plain.explore()
+        pipelined = Sim([overwriter_main(True)])
+        pipelined.explore()
+        self.assertEqual({json.loads(r.server_json)['foo.txt']
+                          for r in plain.results}, {'aX'})
+        self.assertEqual({json.loads(r.server_json)['foo.txt']
+                          for r in pipelined.results}, {'aX', 'ab'})
+
+    def test_pruning_keeps_results(self):
+        # Serving an earlier request in flight shifts the choices of the
+        # later ones, which must not make different histories look alike.
+        # Responses are in issue order, so the order in which the reads are
+        # served only matters through the write.
+        mains = [pipelined_reader_main, seek_writer_main]
+        pruned = Sim(mains)
+        pruned.explore()
+        unpruned = Sim(mains)
+        unpruned.explore(prune=False)
+        self.assertEqual(pruned.results, unpruned.results)
+        self.assertEqual(len(pruned.results), 8)
+
+    def test_count_matches_explore(self):
+        mains = [overwriter_main(True), reader_main('/bar.txt', 1)]
+        explored = Sim(mains)
+        explored.explore(prune=False)
+        counted = Sim(mains)
+        counts = counted.count()
+        self.assertEqual(counted.results, explored.results)
+        # The writes go in either order after the open, and the two steps
+        # of the reader anywhere among those three
+        self.assertEqual(sum(counts.values()), 2 * 10)
+        self.assertEqual(Sim(mains).count(prune=False), counts)
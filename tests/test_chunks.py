@@ -0,0 +1,55 @@
+import copy
+import gc
+import pickle
+import unittest
+from NFS.fhandle import FileHandle
+from sim.chunks import CHUNK_SIZE, CHUNKS, ChunkTable
+from sim.server import Server, RawFile
+
+
+class ChunkInterning(unittest.TestCase):
+    def test_intern(self):
+        table = ChunkTable()
+        a = table.intern('121212')
+        self.assertIs(table.intern('12' * 3), a)
+        self.assertIsNot(table.intern('2121'), a)
+        self.assertEqual(table.stats(), {'live': 1, 'hits': 1, 'misses': 2})
+
+        del a
+        gc.collect()
+        self.assertEqual(len(table), 0)
+
+    def test_copies_share_chunk(self):
+        chunk = CHUNKS.intern('abc')
+        self.assertIs(copy.deepcopy(chunk), chunk)
+        self.assertIs(pickle.loads(pickle.dumps(chunk)), chunk)
+
+    def test_servers_share_data(self):
+        servers = [Server(), Server()]
+        for server, parts in zip(servers, [['12', '12'], ['1212']]):
+            offset = 0
+            for part in parts:
+                server.write(FileHandle(['foo.txt']), offset, part)
+                offset += len(part)
+
+        a, b = (s.root.files['foo.txt'] for s in servers)
+        self.assertIs(a.extents[0], b.extents[0])
+        self.assertIs(copy.deepcopy(a).extents[0], a.extents[0])
+
+        b.write(1, 'x')
+        self.assertIsNot(a.extents[0], b.extents[0])
+
+    def test_fill_shares_blocks(self):
+        data = 'ab' * CHUNK_SIZE
+        chunk = CHUNKS.intern(data)
+        a, b = RawFile(), RawFile()
+        a.fill(chunk)
+        b.fill(chunk)
+        self.assertEqual(a.starts, [0, CHUNK_SIZE])
+        self.assertIs(a.extents[0], b.extents[0])
+        self.assertIs(a.extents[0], a.extents[1])
+        self.assertEqual(a.flatten(), data)
+
+        a.write(1, 'x')  # Only the first block is interned again
+        self.assertEqual(a.extents[0].data, 'ax' + 'ab' * (CHUNK_SIZE // 2 - 1))
+        self.assertIs(a.extents[1], b.extents[1])
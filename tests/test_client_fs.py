@@ -3,6 +3,7 @@ import unittest
 from NFS.stat import Stat
 from sim.server import Server
 from sim.client_filesys import ClientFileSystem
+from NFS.fhandle import FileHandle
 
 
 class ClientFileSystemOperations(unittest.TestCase):
@@ -224,5 +225,31 @@ class ClientFileSystemOperations(unittest.TestCase):
             'foo.txt': ''
         })
 
+    def test_listdir(self):
+        for i in range(200):
+            self.server.create(FileHandle([]), f'file{i:03d}.txt')
+
+        gen = self.fs.listdir('/')
+        req = next(gen)
+        n_requests = 0
+        while True:
+            n_requests += 1
+            try:
+                req = gen.send(req.serve())
+            except StopIteration as e:
+                names = e.value
+                break
+
+        self.assertGreater(n_requests, 1)
+        self.assertEqual(len(names), 202)
+        self.assertEqual(names, sorted(names))
+
+        gen = self.fs.listdir('/foo.txt')
+        req = next(gen)
+        with self.assertRaises(StopIteration) as cm:
+            gen.send(req.serve())
+        self.assertIsNone(cm.exception.value)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,4 +1,6 @@
+import random
 import unittest
+from NFS.fattr import FileAttribute
 from sim.request import Request
 from sim.server import Server
 from NFS.fhandle import FileHandle
@@ -75,6 +77,165 @@ class TestCommutivity(unittest.TestCase):
                 self.assertFalse(r.commutes_with(s))
                 # print('Passed', flush=True)
 
+    def test_readdir(self):
+        s = Request(Request.Type.READDIR, self.foo, FileHandle(['dir']), '',
+                    100)
+        commuting = [
+            Request(Request.Type.READDIR, self.foo, FileHandle(['dir']), '',
+                    100),
+            Request(Request.Type.WRITE, self.foo, FileHandle(['dir', 'a'])),
+            Request(Request.Type.LOOKUP, self.foo, FileHandle(['dir']), 'a'),
+            Request(Request.Type.CREATE, self.foo, FileHandle([]), 'a'),
+            Request(Request.Type.CREATE, self.foo, FileHandle(['dir', 'sub']),
+                    'a'),
+            Request(Request.Type.MKDIR, self.foo, FileHandle([]), 'dir2'),
+        ]
+        conflicting = [
+            Request(Request.Type.CREATE, self.foo, FileHandle(['dir']), 'a'),
+            Request(Request.Type.REMOVE, self.foo, FileHandle(['dir']), 'a'),
+            Request(Request.Type.MKDIR, self.foo, FileHandle(['dir']), 'sub'),
+            Request(Request.Type.RMDIR, self.foo, FileHandle([]), 'dir'),
+        ]
+
+        for r in commuting:
+            self.assertTrue(s.commutes_with(r))
+            self.assertTrue(r.commutes_with(s))
+        for r in conflicting:
+            self.assertFalse(s.commutes_with(r))
+            self.assertFalse(r.commutes_with(s))
+
+
+class TestByteRangeCommutivity(unittest.TestCase):
+    """
+    Property tests: whenever a served request and the next one commute,
+    serving them in the opposite order from the same state must give the
+    same server state and the same replies.
+    """
+
+    N_TRIALS = 3000
+
+    def setUp(self) -> None:
+        self.rng = random.Random(2233)
+
+    def random_server(self, content: str) -> Server:
+        server = Server()
+        if content:
+            server.write(FileHandle(['foo.txt']), 0, content)
+        return server
+
+    def random_request(self, server: Server, vectored=False) -> Request:
+        kinds = [Request.Type.GETATTR, Request.Type.LOOKUP,
+                 Request.Type.READ, Request.Type.WRITE, Request.Type.WRITE]
+        if vectored:
+            kinds += [Request.Type.READV, Request.Type.WRITEV,
+                      Request.Type.WRITEV]
+        kind = self.rng.choice(kinds)
+        fhandle = FileHandle(['foo.txt'])
+        if kind == Request.Type.GETATTR:
+            return Request(kind, server.getattr, fhandle)
+        elif kind == Request.Type.LOOKUP:
+            return Request(kind, server.lookup, FileHandle([]), 'foo.txt')
+        elif kind == Request.Type.READ:
+            return Request(kind, server.read, fhandle,
+                           self.rng.randrange(10), self.rng.randrange(1, 6))
+        elif kind == Request.Type.READV:
+            return Request(kind, server.readv, fhandle, [
+                (self.rng.randrange(10), self.rng.randrange(1, 4))
+                for _ in range(self.rng.randrange(1, 4))])
+        elif kind == Request.Type.WRITEV:
+            segments = []
+            for _ in range(self.rng.randrange(1, 4)):
+                data = ''.join(self.rng.choice('ab')
+                               for _ in range(self.rng.randrange(3)))
+                segments.append((self.rng.randrange(10), data))
+            return Request(kind, server.writev, fhandle, segments)
+        data = ''.join(self.rng.choice('ab')
+                       for _ in range(self.rng.randrange(4)))
+        return Request(kind, server.write, fhandle, self.rng.randrange(10),
+                       data)
+
+    @staticmethod
+    def rebind(r: Request, server: Server) -> Request:
+        return Request(r.type, getattr(server, r.func.__name__), *r.args)
+
+    @staticmethod
+    def normalize(resp):
+        return tuple(x.size if isinstance(x, FileAttribute) else
+                     x.path if isinstance(x, FileHandle) else x
+                     for x in resp)
+
+    def check_pairs(self, vectored=False):
+        """
+        :return: The (served, next) type pairs that were found to commute
+        """
+        commuting = set()
+        for _ in range(self.N_TRIALS):
+            content = ''.join(self.rng.choice('xyz')
+                              for _ in range(self.rng.randrange(8)))
+
+            server = self.random_server(content)
+            a = self.random_request(server, vectored)
+            b = self.random_request(server, vectored)
+            a.serve()
+
+            self.assertEqual(a.commutes_with(b), b.commutes_with(a))
+            if not b.commutes_with(a):
+                continue
+            commuting.add((a.type, b.type))
+            b.serve()
+
+            other = self.random_server(content)
+            b2 = self.rebind(b, other)
+            a2 = self.rebind(a, other)
+            b2.serve()
+            a2.serve()
+
+            self.assertEqual(server.to_json(), other.to_json())
+            self.assertEqual(self.normalize(a.resp), self.normalize(a2.resp))
+            self.assertEqual(self.normalize(b.resp), self.normalize(b2.resp))
+        return commuting
+
+    def test_commuting_pairs_reorder(self):
+        commuting = self.check_pairs()
+
+        # The refinement must actually let READs and WRITEs commute
+        self.assertIn((Request.Type.WRITE, Request.Type.WRITE), commuting)
+        self.assertIn((Request.Type.READ, Request.Type.WRITE), commuting)
+        self.assertIn((Request.Type.WRITE, Request.Type.READ), commuting)
+        self.assertIn((Request.Type.GETATTR, Request.Type.WRITE), commuting)
+
+    def test_vectored_pairs_reorder(self):
+        commuting = self.check_pairs(vectored=True)
+        self.assertIn((Request.Type.WRITEV, Request.Type.WRITEV), commuting)
+        self.assertIn((Request.Type.READV, Request.Type.WRITEV), commuting)
+        self.assertIn((Request.Type.WRITEV, Request.Type.READ), commuting)
+
+    def test_size_changing_writes(self):
+        server = self.random_server('abcd')
+        fhandle = FileHandle(['foo.txt'])
+
+        a = Request(Request.Type.GETATTR, server.getattr, fhandle)
+        a.serve()
+        inside = Request(Request.Type.WRITE, server.write, fhandle, 1, 'zz')
+        growing = Request(Request.Type.WRITE, server.write, fhandle, 3, 'zz')
+        self.assertTrue(inside.commutes_with(a))
+        self.assertFalse(growing.commutes_with(a))
+
+        # Disjoint writes within the file commute
+        w = Request(Request.Type.WRITE, server.write, fhandle, 0, 'q')
+        w.serve()
+        self.assertTrue(w.commutes_with(
+            Request(Request.Type.WRITE, server.write, fhandle, 2, 'rr')))
+        self.assertFalse(w.commutes_with(
+            Request(Request.Type.WRITE, server.write, fhandle, 0, 'r')))
+        self.assertTrue(w.commutes_with(
+            Request(Request.Type.WRITE, server.write, fhandle, 0, 'qq')))
+
+        # A write ending at the end of the file hides whether it grew it
+        w = Request(Request.Type.WRITE, server.write, fhandle, 2, 'cd')
+        w.serve()
+        self.assertFalse(w.commutes_with(
+            Request(Request.Type.READ, server.read, fhandle, 0, 1)))
 
 
 if __name__ == '__main__':
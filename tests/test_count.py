@@ -0,0 +1,36 @@
+import unittest
+from math import comb
+from sim.sim import Sim
+from tests.helpers import appender_main, reader_main
+
+
+class ScheduleCounts(unittest.TestCase):
+    def test_counts_match_enumeration(self):
+        mains = [appender_main('1'), appender_main('2', times=2)]
+        pruned = Sim(mains).count()
+        enumerated = Sim(mains).count(prune=False)
+        self.assertEqual(pruned, enumerated)
+
+        explored = Sim(mains)
+        explored.explore()
+        self.assertEqual(set(pruned), explored.results)
+
+    def test_total_is_number_of_schedules(self):
+        # 3 and 5 steps: an open, and a GETATTR and WRITE per append
+        counts = Sim([appender_main('1'), appender_main('2', times=2)]).count()
+        self.assertEqual(sum(counts.values()), comb(8, 3))
+
+    def test_three_processes(self):
+        mains = [appender_main('1'), appender_main('2'), reader_main()]
+        pruned = Sim(mains).count()
+        self.assertEqual(pruned, Sim(mains).count(prune=False))
+        self.assertEqual(sum(pruned.values()), comb(8, 2) * comb(6, 3))
+
+    def test_independent_processes_have_one_outcome(self):
+        # Reads of an untouched file commute with everything, so every
+        # schedule yields the same result
+        sim = Sim([reader_main(), reader_main()])
+        counts = sim.count()
+        self.assertEqual(len(counts), 1)
+        self.assertEqual(list(counts.values()), [comb(4, 2)])
+        self.assertEqual(sim.counts, counts)
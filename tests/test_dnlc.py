@@ -0,0 +1,137 @@
+import unittest
+from NFS.fattr import FileAttribute
+from NFS.fhandle import FileHandle
+from sim.dnlc import NameCache
+from sim.request import Request
+from sim.server import Server
+from sim.sim import Sim
+from sim.client_filesys import ClientFileSystem
+from tests.helpers import run
+
+
+class NameCacheOperations(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.cache = NameCache(capacity=2, timeout=5,
+                               clock=lambda: self.now)
+
+    def test_positive_and_negative(self):
+        fattr = FileAttribute()
+        fattr.size = 3
+        self.cache.put((), 'a', FileHandle(['a']), fattr)
+        self.cache.put_negative((), 'b')
+
+        fhandle, cached = self.cache.get((), 'a')
+        self.assertEqual(fhandle.path, ['a'])
+        self.assertEqual(cached.size, 3)
+        self.assertIs(self.cache.get((), 'b'), NameCache.NEGATIVE)
+        self.assertIsNone(self.cache.get((), 'c'))
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['negative_hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_lru_eviction(self):
+        self.cache.put_negative((), 'a')
+        self.cache.put_negative((), 'b')
+        self.cache.get((), 'a')  # b becomes least recently used
+        self.cache.put_negative((), 'c')
+        self.assertIsNone(self.cache.get((), 'b'))
+        self.assertIs(self.cache.get((), 'a'), NameCache.NEGATIVE)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_timeout(self):
+        self.cache.put_negative((), 'a')
+        self.now = 5
+        self.assertIs(self.cache.get((), 'a'), NameCache.NEGATIVE)
+        self.now = 6
+        self.assertIsNone(self.cache.get((), 'a'))
+        self.assertEqual(self.cache.stats()['expirations'], 1)
+
+    def test_invalidate_subtree(self):
+        self.cache.capacity = 8
+        self.cache.put_negative(('d',), 'x')
+        self.cache.put_negative(('d', 'e'), 'y')
+        self.cache.put_negative(('f',), 'z')
+        self.cache.invalidate((), 'd')
+        self.assertEqual(len(self.cache), 1)
+
+
+class ClientNameCache(unittest.TestCase):
+    def setUp(self):
+        self.server = Server()
+        self.fs = ClientFileSystem(self.server, dnlc_size=16)
+
+    def lookups(self, served):
+        return sum(req.type == Request.Type.LOOKUP for req in served)
+
+    def test_repeated_opens(self):
+        served = []
+        fds = [run(self.fs.open('/foo.txt'), served) for _ in range(5)]
+        self.assertEqual(self.lookups(served), 1)
+        self.assertEqual(len(set(fds)), 5)
+
+        run(self.fs.open('/missing.txt'), served)
+        self.assertEqual(run(self.fs.open('/missing.txt'), served), -1)
+        self.assertEqual(self.lookups(served), 2)
+
+    def test_no_cache_by_default(self):
+        fs = ClientFileSystem(self.server)
+        served = []
+        for _ in range(3):
+            run(fs.open('/foo.txt'), served)
+        self.assertEqual(self.lookups(served), 3)
+
+    def test_own_mutations_update_cache(self):
+        served = []
+        fd = run(self.fs.create('/baz.txt'), served)
+        self.assertNotEqual(run(self.fs.open('/baz.txt'), served), -1)
+        self.assertTrue(run(self.fs.remove(fd), served))
+        self.assertEqual(run(self.fs.open('/baz.txt'), served), -1)
+
+        self.assertTrue(run(self.fs.mkdir('/d'), served))
+        run(self.fs.create('/d/x.txt'), served)
+        self.assertNotEqual(run(self.fs.open('/d/x.txt')), -1)
+        # Removing the directory drops the names below it
+        run(self.fs.remove(run(self.fs.open('/d/x.txt'))), served)
+        self.assertTrue(run(self.fs.rmdir('/d'), served))
+        self.assertIsNone(self.fs.dnlc.get(('d',), 'x.txt'))
+        self.assertEqual(self.lookups(served), 0)
+
+    def test_entries_expire(self):
+        fs = ClientFileSystem(self.server, dnlc_size=16, dnlc_timeout=1)
+        served = []
+        fd = run(fs.open('/foo.txt'), served)
+        run(fs.append(fd, 'a'), served)  # Two more requests
+        run(fs.open('/foo.txt'), served)
+        self.assertEqual(self.lookups(served), 2)
+
+    def test_staleness_visible_in_sim(self):
+        def opener(dnlc_size):
+            def main(server: Server):
+                fs = ClientFileSystem(server, dnlc_size=dnlc_size)
+                first = yield from fs.open('/bar.txt')
+                yield from fs.read(first, 1)
+                second = yield from fs.open('/bar.txt')
+                if second != -1:
+                    yield from fs.read(second, 1)
+            return main
+
+        def remover(server: Server):
+            fs = ClientFileSystem(server)
+            fd = yield from fs.open('/bar.txt')
+            yield from fs.remove(fd)
+
+        def stale_reads(sim):
+            # The second open is answered from the cache after the remove,
+            # so the read through it is the third response and fails
+            return any(len(res.responses[0]) == 3 and
+                       res.responses[0][2][0] == 'NFSERR_NOENT' and
+                       len(res.responses[0][2]) == 2
+                       for res in sim.results)
+
+        plain = Sim([opener(0), remover])
+        plain.explore()
+        cached = Sim([opener(16), remover])
+        cached.explore()
+        self.assertFalse(stale_reads(plain))
+        self.assertTrue(stale_reads(cached))
@@ -0,0 +1,122 @@
+import json
+import threading
+import unittest
+from NFS.fhandle import FileHandle
+from NFS.stat import Stat
+from sim.drc import DuplicateRequestCache
+from sim.request import Request
+from sim.server import Server
+from sim.client_filesys import ClientFileSystem
+
+
+class DuplicateRequestCacheOperations(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.drc = DuplicateRequestCache(capacity=4, max_age=10.0,
+                                         clock=lambda: self.now)
+        self.server = Server(drc=self.drc)
+        self.fs = ClientFileSystem(self.server)
+
+    def test_retransmitted_create(self):
+        gen = self.fs.create('/baz.txt')
+        req = next(gen)
+        resp = req.serve()
+        self.assertEqual(resp[0], Stat.NFS_OK)
+
+        # The reply got lost and the client retransmits
+        resp = req.retransmit().serve()
+        self.assertEqual(resp[0], Stat.NFS_OK)
+        self.assertEqual(self.drc.stats(),
+                         {'hits': 1, 'misses': 1, 'evictions': 0, 'size': 1})
+
+        # A new request with a fresh xid is executed again
+        gen = self.fs.create('/baz.txt')
+        resp = next(gen).serve()
+        self.assertEqual(resp[0], Stat.NFSERR_EXIST)
+
+    def test_retransmitted_remove_does_not_touch_tree(self):
+        req = Request(Request.Type.REMOVE, self.server.remove, FileHandle([]),
+                      'foo.txt', client=1, xid=7)
+        self.assertEqual(req.serve(), Stat.NFS_OK)
+
+        self.server.create(FileHandle([]), 'foo.txt')
+        self.assertEqual(req.retransmit().serve(), Stat.NFS_OK)
+        self.assertEqual(json.loads(self.server.to_json()),
+                         {'foo.txt': '', 'bar.txt': ''})
+
+    def test_key_includes_client(self):
+        a = Request(Request.Type.MKDIR, self.server.mkdir, FileHandle([]),
+                    'dir', client=1, xid=1)
+        b = Request(Request.Type.MKDIR, self.server.mkdir, FileHandle([]),
+                    'dir', client=2, xid=1)
+        self.assertEqual(len(a.serve()), 3)
+        self.assertEqual(b.serve(), (Stat.NFSERR_EXIST,))
+
+    def test_idempotent_not_cached(self):
+        req = Request(Request.Type.GETATTR, self.server.getattr,
+                      FileHandle(['foo.txt']), client=1, xid=1)
+        req.serve()
+        self.assertEqual(self.drc.stats()['misses'], 0)
+
+    def test_client_ids_per_server(self):
+        # Clients of a server are numbered from 0 regardless of the clients
+        # of other servers, so replays of an execution reuse the same keys
+        self.assertEqual(self.fs.client_id, 0)
+        self.assertEqual(ClientFileSystem(self.server).client_id, 1)
+        self.assertEqual(ClientFileSystem(Server()).client_id, 0)
+
+    def test_lru_eviction(self):
+        for xid in range(6):
+            Request(Request.Type.CREATE, self.server.create, FileHandle([]),
+                    f'f{xid}', client=1, xid=xid).serve()
+        self.assertEqual(self.drc.stats()['size'], 4)
+        self.assertEqual(self.drc.evictions, 2)
+
+        # xid 0 was evicted, so the retransmission executes again
+        resp = Request(Request.Type.CREATE, self.server.create,
+                       FileHandle([]), 'f0', client=1, xid=0).serve()
+        self.assertEqual(resp, (Stat.NFSERR_EXIST,))
+
+    def test_in_progress_not_evicted(self):
+        executions = []
+        replies = []
+
+        def retransmit():
+            replies.append(self.drc.serve('a', executions.append, ('again',)))
+
+        def slow(name):
+            executions.append(name)
+            # Enough other requests complete meanwhile to fill the cache
+            for xid in range(4):
+                self.drc.serve(xid, lambda: None, ())
+            thread = threading.Thread(target=retransmit)
+            thread.start()
+            thread.join(0.1)  # Waits for this reply rather than executing
+            self.assertEqual(executions, [name])
+            return thread
+
+        thread = self.drc.serve('a', slow, ('first',))
+        thread.join()
+        self.assertEqual(replies, [thread])
+        self.assertEqual(executions, ['first'])
+        self.assertEqual(self.drc.stats()['size'], 4)
+
+    def test_requests_without_xid_bypass(self):
+        req = Request(Request.Type.MKDIR, self.server.mkdir, FileHandle([]),
+                      'dir')
+        self.assertEqual(len(req.serve()), 3)
+        self.assertEqual(self.drc.stats()['misses'], 0)
+
+    def test_age_eviction(self):
+        req = Request(Request.Type.RMDIR, self.server.rmdir, FileHandle([]),
+                      'dir', client=1, xid=1)
+        self.server.mkdir(FileHandle([]), 'dir')
+        self.assertEqual(req.serve(), Stat.NFS_OK)
+
+        self.now = 11.0
+        self.assertEqual(req.retransmit().serve(), Stat.NFSERR_NOENT)
+        self.assertEqual(self.drc.evictions, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
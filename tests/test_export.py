@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+import unittest
+from sim.sim import Sim
+from sim.export import JSONLExporter, BinaryExporter, BinaryReader
+from tests.helpers import appender_main, reader_main
+
+
+class ResultExport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.jsonl_path = os.path.join(self.tmp.name, 'results.jsonl')
+        self.bin_path = os.path.join(self.tmp.name, 'results.bin')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_export(self):
+        with JSONLExporter(self.jsonl_path) as jsonl, \
+                BinaryExporter(self.bin_path) as binary:
+            sim = Sim([appender_main('1', times=2, path='/foo.txt'),
+                       reader_main()],
+                      exporters=[jsonl, binary])
+            sim.explore()
+
+        with open(self.jsonl_path) as f:
+            jsonl_records = [json.loads(line) for line in f]
+        with BinaryReader(self.bin_path) as reader:
+            bin_records = list(reader)
+
+        self.assertEqual(len(jsonl_records), len(sim.results))
+        self.assertEqual(len(bin_records), len(sim.results))
+
+        for j, b in zip(jsonl_records, bin_records):
+            self.assertEqual(j['server'], b['server'])
+            self.assertEqual(j['hist'], list(b['hist']))
+            self.assertEqual(j['responses'],
+                             [[list(r) for r in resp]
+                              for resp in b['responses']])
+
+        # Each record matches the result found with the same witness
+        by_hist = {tuple(res.hist): res for res in sim.results}
+        for record in jsonl_records:
+            res = by_hist[tuple(record['hist'])]
+            self.assertEqual(record['server'], json.loads(res.server_json))
+
+    def test_strings_interned(self):
+        with JSONLExporter(self.jsonl_path) as jsonl, \
+                BinaryExporter(self.bin_path) as binary:
+            sim = Sim([appender_main('1', times=2, path='/foo.txt'),
+                       appender_main('2', times=2, path='/foo.txt')],
+                      exporters=[jsonl, binary])
+            sim.explore()
+
+        self.assertLess(os.path.getsize(self.bin_path),
+                        os.path.getsize(self.jsonl_path) / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import re
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from sim.sim import Sim
+from sim.server import Server
+from sim.client_filesys import ClientFileSystem
+from sim.graph import DOTWriter, GraphMLWriter
+from sim.observation import Observation
+from tests.helpers import appender_main, reader_main
+
+NS = {'g': 'http://graphml.graphdrawing.org/xmlns'}
+
+
+def lookup_main(server: Server):
+    fs = ClientFileSystem(server)
+    yield from fs.open('/bar.txt')
+
+
+def idle_main(server: Server):
+    return
+    yield
+
+
+class GraphExport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.mains = [appender_main('1'), appender_main('2')]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def graphml(self, prune=True, observation=None):
+        path = os.path.join(self.tmp.name, 'graph.graphml')
+        sim = Sim(self.mains, observation=observation)
+        with GraphMLWriter(path) as graph:
+            sim.explore(prune=prune, graph=graph)
+
+        root = ET.parse(path).getroot()
+        nodes = root.findall('g:graph/g:node', NS)
+        edges = root.findall('g:graph/g:edge', NS)
+        return sim, nodes, edges
+
+    def check_wellformed(self, nodes, edges):
+        ids = [n.get('id') for n in nodes]
+        self.assertEqual(len(ids), len(set(ids)))
+        for e in edges:
+            self.assertIn(e.get('source'), ids)
+            self.assertIn(e.get('target'), ids)
+
+    def test_unpruned_is_tree(self):
+        # 3 steps each, so C(6, 3) schedules
+        sim, nodes, edges = self.graphml(prune=False)
+        self.check_wellformed(nodes, edges)
+        self.assertEqual(len(edges), len(nodes) - 1)
+        terminal = [n for n in nodes
+                    if n.find('g:data[@key="terminal"]', NS).text == 'true']
+        self.assertEqual(len(terminal), 20)
+
+    def test_unpruned_ids_with_many_processes(self):
+        # Serving p1 then p0 then p10 must not be named like p10, p1, p0
+        self.mains = [lookup_main] * 2 + [idle_main] * 8 + [lookup_main]
+        _, nodes, edges = self.graphml(prune=False)
+        self.check_wellformed(nodes, edges)
+        self.assertEqual(len(nodes), 16)
+
+    def test_pruned_shares_nodes(self):
+        _, tree_nodes, _ = self.graphml(prune=False)
+        sim, nodes, edges = self.graphml()
+        self.check_wellformed(nodes, edges)
+        self.assertLess(len(nodes), len(tree_nodes))
+        # Merged histories have several incoming edges
+        targets = [e.get('target') for e in edges]
+        self.assertGreater(len(targets), len(set(targets)))
+
+        labels = {e.find('g:data[@key="label"]', NS).text for e in edges}
+        self.assertIn("WRITE /bar.txt 0 '1'", labels)
+
+    def test_state_merged_nodes_declared(self):
+        observation = Observation(processes=[], paths=['/bar.txt'])
+        _, nodes, edges = self.graphml(observation=observation)
+        self.check_wellformed(nodes, edges)
+
+        self.mains = [appender_main('1', times=2), appender_main('2'),
+                      reader_main('/bar.txt')]
+        _, nodes, edges = self.graphml(observation=observation)
+        self.check_wellformed(nodes, edges)
+        # Merged states lead to the node of the state rather than ending
+        # the graph early
+        sources = {e.get('source') for e in edges}
+        for n in nodes:
+            if n.find('g:data[@key="terminal"]', NS).text == 'false':
+                self.assertIn(n.get('id'), sources)
+
+    def test_dot(self):
+        path = os.path.join(self.tmp.name, 'graph.dot')
+        with DOTWriter(path) as graph:
+            Sim(self.mains).explore(graph=graph)
+
+        with open(path) as f:
+            text = f.read()
+        self.assertTrue(text.startswith('digraph "interleavings" {'))
+        self.assertTrue(text.endswith('}\n'))
+        declared = re.findall(r'^  ("[^"]*") \[label', text, re.M)
+        self.assertEqual(len(declared), len(set(declared)))
+        self.assertIn('"s" -> "s0.0" [label="p0 LOOKUP /bar.txt"];', text)
+        self.assertIn("[label=\"p1 WRITE /bar.txt 0 '2'\"]", text)
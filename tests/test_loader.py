@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+import unittest
+from NFS.fhandle import FileHandle
+from NFS.stat import Stat
+from sim.loader import NamespaceLoader
+from sim.server import Server
+from sim.storage import MmapStorage
+from sim.wal import WriteAheadLog
+from sim.sim import Sim
+from tests.helpers import reader_main
+
+
+class NamespaceLoading(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_jsonl_manifest(self):
+        path = os.path.join(self.tmp.name, 'manifest.jsonl')
+        with open(path, 'w') as f:
+            f.write('{"path": "/data/a.txt", "data": "121212"}\n\n')
+            f.write('{"path": "/data/b.txt", "data": "121212"}\n')
+            f.write('{"path": "/empty", "type": "dir"}\n')
+            f.write('{"path": "/c.txt"}\n')
+        loader = NamespaceLoader.from_manifest(path)
+        self.assertEqual(loader.stats(), {'files': 3, 'dirs': 2, 'bytes': 12,
+                                          'unique_contents': 2})
+
+        server = loader.populate(Server())
+        self.assertEqual(json.loads(server.to_json()),
+                         {'data': {'a.txt': '121212', 'b.txt': '121212'},
+                          'empty': {}, 'c.txt': ''})
+        self.assertEqual(server.root.index, ['c.txt', 'data', 'empty'])
+
+        # Equal files share their data, also across servers
+        a = server.root.files['data'].files['a.txt']
+        b = loader.populate(Server()).root.files['data'].files['b.txt']
+        self.assertIs(a.extents[0], b.extents[0])
+
+        resp = server.read(FileHandle(['data', 'a.txt']), 2, 3)
+        self.assertEqual(resp[2], '121')
+        server.write(FileHandle(['data', 'a.txt']), 0, 'x')
+        self.assertEqual(server.read(FileHandle(['data', 'b.txt']), 0, 1)[2],
+                         '1')
+
+    def test_json_manifest_round_trip(self):
+        server = Server()
+        server.mkdir(FileHandle([]), 'd')
+        server.create(FileHandle(['d']), 'x')
+        server.write(FileHandle(['d', 'x']), 2, 'yz')
+        path = os.path.join(self.tmp.name, 'manifest.json')
+        with open(path, 'w') as f:
+            f.write(server.to_json())
+
+        loaded = NamespaceLoader.from_manifest(path).populate(Server())
+        self.assertEqual(loaded.to_json(), server.to_json())
+
+    def test_local_directory(self):
+        os.makedirs(os.path.join(self.tmp.name, 'sub', 'deep'))
+        with open(os.path.join(self.tmp.name, 'sub', 'f.bin'), 'wb') as f:
+            f.write(b'\x00\xff')
+        loader = NamespaceLoader.from_directory(self.tmp.name)
+        self.assertEqual(loader.populate(Server()).root.flatten(),
+                         {'sub': {'deep': {}, 'f.bin': '\x00\xff'}})
+
+    def test_keeps_loaded_image(self):
+        loader = NamespaceLoader.from_dict({'data': {'b.txt': 'hello'}})
+        storage = MmapStorage(self.tmp.name, initial_size=256)
+        server = loader.populate(Server(storage=storage))
+        server.write(FileHandle(['data', 'b.txt']), 0, 'J')
+        server.sync()
+        storage.close()
+
+        storage = MmapStorage(self.tmp.name, initial_size=256)
+        server = loader.populate(Server(storage=storage))
+        self.assertEqual(json.loads(server.to_json()),
+                         {'data': {'b.txt': 'Jello'}})
+        storage.close()
+
+    def test_rejects_wal(self):
+        loader = NamespaceLoader.from_dict({'a.txt': 'x'})
+        wal = WriteAheadLog(os.path.join(self.tmp.name, 'wal'))
+        with self.assertRaises(ValueError):
+            loader.populate(Server(wal=wal))
+        wal.close()
+
+    def test_conflicts(self):
+        loader = NamespaceLoader()
+        loader.add_file('/a', 'x')
+        with self.assertRaises(ValueError):
+            loader.add_file('/a/b', 'y')
+        with self.assertRaises(ValueError):
+            loader.add_dir('/a')
+        with self.assertRaises(ValueError):
+            loader.add_file('/', 'z')
+
+    def test_sim_factory(self):
+        loader = NamespaceLoader.from_dict({'data': {'b.txt': 'hello'}})
+        sim = Sim([reader_main('/data/b.txt'), reader_main('/data/b.txt')],
+                  server_factory=loader.factory(concurrent=True))
+        sim.explore()
+        self.assertEqual(len(sim.results), 1)
+        res = next(iter(sim.results))
+        self.assertEqual(res.responses[0][-1], (Stat.NFS_OK.name, 'hello'))
@@ -0,0 +1,128 @@
+import os
+import tempfile
+import threading
+import unittest
+from NFS.fhandle import FileHandle
+from sim.client_filesys import ClientFileSystem
+from sim.drc import DuplicateRequestCache
+from sim.metrics import LatencyHistogram, Tracer
+from sim.request import Request
+from sim.server import Server
+from tests.helpers import run
+
+
+class Histogram(unittest.TestCase):
+    def test_buckets_bound_values(self):
+        for value in [0, 1, 31, 32, 33, 100, 1000, 12345, 10 ** 9]:
+            i = LatencyHistogram.index(value)
+            self.assertLess(value, LatencyHistogram.upper_bound(i))
+            if i:
+                self.assertGreaterEqual(value,
+                                        LatencyHistogram.upper_bound(i - 1))
+            # Relative error of the bucket stays within about 3%
+            width = LatencyHistogram.upper_bound(i) - \
+                (LatencyHistogram.upper_bound(i - 1) if i else 0)
+            self.assertLessEqual(width, max(1, value / 16))
+        self.assertEqual(LatencyHistogram.index(1 << 60),
+                         LatencyHistogram.SIZE - 1)
+
+    def test_percentiles(self):
+        hist = LatencyHistogram()
+        for value in range(1, 1001):
+            hist.record(value)
+        self.assertEqual((hist.count, hist.min, hist.max), (1000, 1, 1000))
+        self.assertAlmostEqual(hist.percentile(0.5), 500, delta=16)
+        self.assertAlmostEqual(hist.percentile(0.99), 990, delta=32)
+        self.assertEqual(hist.percentile(1.0), 1000)
+
+        other = LatencyHistogram()
+        other.record(5000)
+        hist.merge(other)
+        self.assertEqual((hist.count, hist.max), (1001, 5000))
+        self.assertEqual(list(hist.buckets())[-1][1], 1001)
+
+
+class Tracing(unittest.TestCase):
+    def setUp(self):
+        self.server = Server(drc=DuplicateRequestCache())
+        self.server_tracer = Tracer('nfs_server')
+        self.server_tracer.instrument(self.server)
+        self.client_tracer = Tracer('nfs_client')
+        self.fs = ClientFileSystem(self.server, tracer=self.client_tracer)
+
+    def workload(self):
+        fd = run(self.fs.open('/foo.txt'))
+        run(self.fs.write(fd, 'hello'))
+        run(self.fs.writev(fd, [(0, 'j'), (5, '!')]))
+        self.fs.seek(fd, 0)
+        run(self.fs.read(fd, 10))
+        run(self.fs.open('/missing.txt'))
+
+    def test_counters(self):
+        self.workload()
+        for tracer in [self.server_tracer, self.client_tracer]:
+            procs = tracer.snapshot()['procs']
+            self.assertEqual(procs['lookup']['calls'], 2)
+            self.assertEqual(procs['lookup']['errors'], {'NFSERR_NOENT': 1})
+            self.assertEqual(procs['write']['bytes_written'], 5)
+            self.assertEqual(procs['writev']['bytes_written'], 2)
+            self.assertEqual(procs['read']['bytes_read'], 6)
+            self.assertEqual(procs['read']['latency_ns']['count'], 1)
+
+    def test_wrappers_keep_server_identity(self):
+        self.assertIs(self.server.read.__self__, self.server)
+        self.assertEqual(self.server.read.__name__, 'read')
+        # Non-idempotent requests still go through the duplicate cache
+        req = Request(Request.Type.CREATE, self.server.create,
+                      FileHandle([]), 'x', client=0, xid=1,
+                      tracer=self.client_tracer)
+        req.serve()
+        req.retransmit().serve()
+        self.assertEqual(self.server_tracer.procs['create'].calls, 1)
+        self.assertEqual(self.client_tracer.procs['create'].calls, 2)
+
+    def test_sampling_and_toggle(self):
+        tracer = Tracer(sample_every=3)
+        tracer.instrument(self.server)
+        for _ in range(9):
+            self.server.getattr(FileHandle(['foo.txt']))
+        self.assertEqual(tracer.procs['getattr'].calls, 3)
+
+        tracer.enabled = False
+        self.server.getattr(FileHandle(['foo.txt']))
+        self.assertEqual(tracer.procs['getattr'].calls, 3)
+
+        Tracer.uninstrument(self.server)
+        self.assertNotIn('getattr', vars(self.server))
+        self.assertEqual(self.server.getattr.__func__, Server.getattr)
+
+    def test_sampling_across_threads(self):
+        tracer = Tracer(sample_every=4)
+        sampled = []
+
+        def work():
+            sampled.append(sum(tracer.sampled() for _ in range(10000)))
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(sampled), 8 * 10000 // 4)
+
+    def test_prometheus(self):
+        self.workload()
+        text = self.server_tracer.to_prometheus()
+        self.assertIn('# TYPE nfs_server_latency_seconds histogram', text)
+        self.assertIn('nfs_server_calls_total{proc="lookup"} 2', text)
+        self.assertIn('nfs_server_errors_total{proc="lookup",'
+                      'stat="NFSERR_NOENT"} 1', text)
+        self.assertIn('nfs_server_latency_seconds_bucket{proc="read",'
+                      'le="+Inf"} 1', text)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'nfs.prom')
+            self.server_tracer.write_prometheus(path)
+            with open(path) as f:
+                self.assertEqual(f.read(), text)
+            self.assertEqual(os.listdir(tmp), ['nfs.prom'])
@@ -0,0 +1,83 @@
+import json
+import unittest
+from sim.sim import Sim
+from sim.server import Server
+from sim.client_filesys import ClientFileSystem
+from sim.observation import Observation
+from tests.helpers import appender_main
+
+
+def copier_main(server: Server):
+    # Reads bar.txt and copies what it saw into foo.txt
+    fs = ClientFileSystem(server)
+    fd = yield from fs.open('/bar.txt')
+    data = yield from fs.read(fd, 10)
+    fd = yield from fs.open('/foo.txt')
+    yield from fs.append(fd, data or '-')
+
+
+class ObservationEquivalence(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mains = [appender_main('1'), appender_main('2'), copier_main]
+        cls.full = Sim(cls.mains)
+        cls.full.explore()
+
+    def project(self, observation: Observation):
+        # Projection of the fully explored results, computed after the fact
+        projected = set()
+        for res in self.full.results:
+            server = json.loads(res.server_json)
+            files = {f'/{k}': v for k, v in server.items()}
+            responses = tuple(
+                tuple(observation.response(pid, s) for s in resp
+                      if observation.response(pid, s) is not None)
+                for pid, resp in enumerate(res.responses))
+            paths = observation.paths or files
+            projected.add((responses, tuple(files.get(p) for p in paths)))
+        return projected
+
+    def observed(self, sim: Sim):
+        return {(tuple(map(tuple, res.responses)),
+                 tuple(json.loads(res.server_json).values()))
+                for res in sim.results}
+
+    def test_identity(self):
+        self.assertTrue(Observation().is_identity())
+        sim = Sim(self.mains, observation=Observation())
+        sim.explore()
+        self.assertEqual(sim.results, self.full.results)
+
+    def test_single_file(self):
+        observation = Observation(processes=[], paths=['/foo.txt'])
+        sim = Sim(self.mains, observation=observation)
+        sim.explore()
+        self.assertEqual(self.observed(sim), self.project(observation))
+        self.assertLess(len(sim.results), len(self.full.results))
+        for res in sim.results:
+            self.assertEqual(list(json.loads(res.server_json)), ['/foo.txt'])
+
+    def test_process_fields(self):
+        observation = Observation(processes=[2], fields=[0],
+                                  paths=['/bar.txt', '/missing'])
+        sim = Sim(self.mains, observation=observation)
+        sim.explore()
+        self.assertEqual(self.observed(sim), self.project(observation))
+        for res in sim.results:
+            self.assertEqual(res.responses[0], [])
+            self.assertTrue(all(len(s) == 1 for s in res.responses[2]))
+            self.assertIsNone(json.loads(res.server_json)['/missing'])
+
+    def test_counts_under_observation(self):
+        observation = Observation(processes=[], paths=['/bar.txt'])
+        counts = Sim(self.mains, observation=observation).count()
+        full = Sim(self.mains).count()
+        self.assertEqual(sum(counts.values()), sum(full.values()))
+
+        by_content = {}
+        for res, n in full.items():
+            content = json.loads(res.server_json)['bar.txt']
+            by_content[content] = by_content.get(content, 0) + n
+        self.assertEqual(
+            {json.loads(res.server_json)['/bar.txt']: n
+             for res, n in counts.items()}, by_content)
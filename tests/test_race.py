@@ -0,0 +1,85 @@
+import unittest
+from sim.request import Request
+from sim.sim import Sim
+from sim.server import Server
+from sim.client_filesys import ClientFileSystem
+from sim.race import RaceDetector
+from sim.loader import NamespaceLoader
+from tests.helpers import reader_main, writer_main
+
+
+def async_writer_main(server: Server):
+    fs = ClientFileSystem(server)
+    fd = yield from fs.open('/foo.txt')
+    yield from fs.write_async(fd, 'abc')  # Returns with the write in flight
+
+
+class RaceDetection(unittest.TestCase):
+    def test_predict_write_read(self):
+        detector = RaceDetector([writer_main('abc'), reader_main(count=3)])
+        races = detector.predict()
+
+        # The write races with the read, and with the lookup of the reader
+        # since the lookup reports the file size
+        self.assertEqual(len(races), 2)
+        types = [{race.first.req.type, race.second.req.type}
+                 for race in races]
+        self.assertIn({Request.Type.WRITE, Request.Type.READ}, types)
+        self.assertIn({Request.Type.WRITE, Request.Type.LOOKUP}, types)
+        for race in races:
+            self.assertEqual({race.first.pid, race.second.pid}, {0, 1})
+
+        # The location points at the line of the process main
+        _, lineno, func = races[0].first.location
+        self.assertEqual(func, 'main')
+        self.assertIn('helpers.py', str(races[0]))
+
+    def test_no_race_on_different_files(self):
+        detector = RaceDetector([writer_main('abc'),
+                                 writer_main('xyz', '/bar.txt')])
+        self.assertEqual(detector.predict(), [])
+
+    def test_program_order_is_not_a_race(self):
+        # Both requests of p0 conflict with p1's write, but once p1's write
+        # is ordered after p0's read it is also ordered after p0's open
+        detector = RaceDetector([reader_main(count=3), writer_main('abc')])
+        races = detector.predict([0, 0, 1, 1])
+        self.assertEqual(len(races), 1)
+        self.assertEqual(races[0].first.req.type, Request.Type.READ)
+
+    def test_location_after_main_returns(self):
+        detector = RaceDetector([async_writer_main, reader_main(count=3)])
+        races = detector.predict([0, 1, 1, 0])
+        self.assertEqual(len(races), 1)
+        self.assertEqual(races[0].second.req.type, Request.Type.WRITE)
+        self.assertEqual(races[0].second.location[2], 'async_writer_main')
+
+    def test_server_factory(self):
+        # /data/b.txt only exists on the loaded server, where the write
+        # races with the read
+        loader = NamespaceLoader.from_dict({'data': {'b.txt': 'xyz'}})
+        mains = [reader_main('/data/b.txt', 3),
+                 writer_main('abc', '/data/b.txt')]
+        self.assertEqual(RaceDetector(mains).predict([0, 1]), [])
+
+        detector = RaceDetector(mains, loader.factory())
+        Sim(mains, server_factory=loader.factory()).explore(
+            race_detector=detector)
+        self.assertEqual(len(detector.races), 1)
+        race = next(iter(detector.races.values()))
+        self.assertEqual({race.first.req.type, race.second.req.type},
+                         {Request.Type.READ, Request.Type.WRITE})
+
+    def test_dedupe_across_exploration(self):
+        mains = [writer_main('abc'), reader_main(count=3)]
+        detector = RaceDetector(mains)
+        sim = Sim(mains)
+        sim.explore(race_detector=detector)
+
+        self.assertGreater(detector.executions, 1)
+        self.assertEqual(len(detector.races), 2)
+        self.assertIn('Found 2 racing pairs', detector.report())
+
+
+if __name__ == '__main__':
+    unittest.main()
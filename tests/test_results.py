@@ -0,0 +1,76 @@
+import unittest
+from sim.sim import Sim
+from sim.results import ResultStore, ResultCounts
+from tests.helpers import appender_main
+
+
+def make_result(content: str, hist):
+    res = Sim.Result(1)
+    res.add_response(0, ('NFS_OK',))
+    res.server_json = content
+    res.hist = hist
+    return res
+
+
+class LazyResults(unittest.TestCase):
+    def setUp(self):
+        self.mains = [appender_main('1', read=1), appender_main('2', read=1)]
+
+    def test_same_results_as_full(self):
+        full = Sim(self.mains)
+        full.explore()
+        lazy = Sim(self.mains, result_cache=2)
+        lazy.explore()
+
+        self.assertIsInstance(lazy.results, ResultStore)
+        self.assertEqual(len(lazy.results), len(full.results))
+        self.assertEqual(lazy.results, full.results)
+        for res in lazy.results:
+            self.assertIn(res, full.results)
+            self.assertEqual(lazy.witness(res.hist), res)
+        self.assertEqual(lazy.discovery_times, sorted(lazy.discovery_times))
+
+    def test_cache(self):
+        lazy = Sim(self.mains, result_cache=2)
+        lazy.explore()
+        n = len(lazy.results)
+        self.assertGreater(n, 2)
+
+        list(lazy.results)
+        self.assertEqual(lazy.results.stats()['replays'], n)
+        self.assertEqual(lazy.results.stats()['cached'], 2)
+        list(lazy.results)  # The cache only holds the last two
+        self.assertEqual(lazy.results.stats()['replays'], 2 * n)
+
+    def test_count(self):
+        lazy = Sim(self.mains, result_cache=0)
+        counts = lazy.count()
+        self.assertIsInstance(counts, ResultCounts)
+        self.assertEqual(lazy.results, set(counts))
+        self.assertEqual(lazy.results.stats()['replays'], len(counts))
+
+        # Counts are looked up by fingerprint, without replaying
+        full = Sim(self.mains).count()
+        for res, n in full.items():
+            self.assertEqual(counts[res], n)
+        self.assertEqual(lazy.results.stats()['replays'], len(counts))
+        self.assertEqual(sum(counts.values()), sum(full.values()))
+
+    def test_shortest_witness(self):
+        replayed = []
+
+        def replay(hist):
+            replayed.append(hist)
+            return make_result('a' if hist[0] else 'b', hist)
+
+        store = ResultStore(replay)
+        store.add(make_result('a', [1, 0, 0]))
+        store.add(make_result('a', [1, 0]))
+        store.add(make_result('a', [1, 1, 1]))
+        store.add(make_result('b', [0]))
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.witness(make_result('a', [])), [1, 0])
+        self.assertNotIn(make_result('c', []), store)
+
+        self.assertEqual({res.server_json for res in store}, {'a', 'b'})
+        self.assertEqual(sorted(replayed), [[0], [1, 0]])
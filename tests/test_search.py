@@ -0,0 +1,68 @@
+import unittest
+from sim.sim import Sim
+from sim.server import Server
+from tests.helpers import appender_main
+
+
+def content(server: Server, name: str) -> str:
+    return server.root.files[name].flatten()
+
+
+class PropertySearch(unittest.TestCase):
+    def test_lost_update_found(self):
+        # Both processes may read the size before either writes, in which
+        # case one append overwrites the other
+        sim = Sim([appender_main('1'), appender_main('2')])
+        res = sim.search(
+            predicate=lambda server, _: len(content(server, 'bar.txt')) == 2)
+
+        self.assertIsNotNone(res)
+        self.assertEqual(res.kind, 'predicate')
+        self.assertEqual(len(res.hist), 6)
+        self.assertEqual(len(res.digests), len(res.hist))
+        self.assertIn(res.server_json, {'{"foo.txt": "", "bar.txt": "1"}',
+                                        '{"foo.txt": "", "bar.txt": "2"}'})
+        self.assertEqual(res.preemptions, 1)
+
+    def test_invariant_stops_early(self):
+        sim = Sim([appender_main('1', times=2), appender_main('2')])
+        res = sim.search(
+            invariant=lambda server, _: '2' not in content(server, 'bar.txt'),
+            minimize='length')
+
+        self.assertIsNotNone(res)
+        self.assertEqual(res.kind, 'invariant')
+        # open, getattr and write of the second process
+        self.assertEqual(res.hist, [1, 1, 1])
+        self.assertEqual(res.server_json, '{"foo.txt": "", "bar.txt": "2"}')
+
+    def test_no_violation(self):
+        sim = Sim([appender_main('1'), appender_main('2')])
+        res = sim.search(
+            predicate=lambda server, _: len(content(server, 'bar.txt')) >= 1,
+            invariant=lambda server, _: 'foo.txt' in server.root.files)
+        self.assertIsNone(res)
+
+    def test_minimized_preemptions(self):
+        mains = [appender_main('1', times=2), appender_main('2', times=2)]
+
+        def predicate(server, _):
+            return len(content(server, 'bar.txt')) == 4
+
+        first = Sim(mains).search(predicate=predicate, minimize=None)
+        minimal = Sim(mains).search(predicate=predicate)
+        self.assertIsNotNone(first)
+        self.assertIsNotNone(minimal)
+        self.assertLessEqual(minimal.preemptions, first.preemptions)
+        self.assertEqual(minimal.preemptions, 1)
+
+    def test_matches_unpruned(self):
+        mains = [appender_main('1'), appender_main('2')]
+
+        def predicate(server, _):
+            return content(server, 'bar.txt') != '21'
+
+        pruned = Sim(mains).search(predicate=predicate)
+        unpruned = Sim(mains).search(predicate=predicate, prune=False)
+        self.assertEqual(pruned.server_json, unpruned.server_json)
+        self.assertEqual(pruned.preemptions, unpruned.preemptions)
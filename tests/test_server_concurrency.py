@@ -0,0 +1,109 @@
+import json
+import threading
+import unittest
+from NFS.fhandle import FileHandle
+from NFS.stat import Stat
+from sim.server import Server
+
+
+class ConcurrentServerOperations(unittest.TestCase):
+    N_THREADS = 8
+    N_OPS = 50
+
+    def setUp(self):
+        self.server = Server(concurrent=True)
+
+    def run_threads(self, target) -> list:
+        """
+        Runs target(i) in N_THREADS threads. Assertions only fail the test
+        from the main thread, so the workers return what they saw instead.
+        :return: The return value of every target, in order of i
+        """
+        results = [None] * self.N_THREADS
+
+        def run(i):
+            try:
+                results[i] = target(i)
+            except BaseException as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=run, args=(i,))
+                   for i in range(self.N_THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    def test_create_in_separate_dirs(self):
+        def work(i):
+            stats = [self.server.mkdir(FileHandle([]), f'd{i}')[0]]
+            for j in range(self.N_OPS):
+                stats.append(
+                    self.server.create(FileHandle([f'd{i}']), f'f{j}')[0])
+            return stats
+
+        for stats in self.run_threads(work):
+            self.assertEqual(stats, [Stat.NFS_OK] * (self.N_OPS + 1))
+
+        tree = json.loads(self.server.to_json())
+        for i in range(self.N_THREADS):
+            self.assertEqual(len(tree[f'd{i}']), self.N_OPS)
+
+    def test_concurrent_writes_same_file(self):
+        fhandle = FileHandle(['foo.txt'])
+
+        def work(i):
+            return [self.server.write(fhandle, i * self.N_OPS + j, str(i))[0]
+                    for j in range(self.N_OPS)]
+
+        for stats in self.run_threads(work):
+            self.assertEqual(stats, [Stat.NFS_OK] * self.N_OPS)
+
+        resp = self.server.read(fhandle, 0, self.N_THREADS * self.N_OPS)
+        self.assertEqual(resp[0], Stat.NFS_OK)
+        self.assertEqual(resp[2], ''.join(str(i) * self.N_OPS
+                                          for i in range(self.N_THREADS)))
+
+    def test_rmdir_races_with_create(self):
+        def work(i):
+            if i % 2:
+                return self.server.rmdir(FileHandle([]), 'dir')
+            return self.server.create(FileHandle(['dir']), f'f{i}')[0]
+
+        for _ in range(self.N_OPS):
+            self.server = Server(concurrent=True)
+            self.server.mkdir(FileHandle([]), 'dir')
+            stats = self.run_threads(work)
+            created = {f'f{i}' for i in range(0, self.N_THREADS, 2)
+                       if stats[i] == Stat.NFS_OK}
+            removed = [i for i in range(1, self.N_THREADS, 2)
+                       if stats[i] == Stat.NFS_OK]
+
+            # Either the directory survived with exactly the files whose
+            # create succeeded, or it was removed while empty, in which case
+            # no create may have succeeded in it
+            tree = json.loads(self.server.to_json())
+            if 'dir' in tree:
+                self.assertEqual(removed, [])
+                self.assertEqual(set(tree['dir']), created)
+            else:
+                self.assertEqual(len(removed), 1)
+                self.assertEqual(created, set())
+
+    def test_failed_lookup_releases_locks(self):
+        resp = self.server.lookup(FileHandle(['nodir']), 'foo.txt')
+        self.assertEqual(resp[0], Stat.NFSERR_NOENT)
+        resp = self.server.read(FileHandle(['foo.txt', 'x']), 0, 1)
+        self.assertEqual(resp[0], Stat.NFSERR_NOENT)
+
+        # Would block forever if the root were still read-locked
+        resp = self.server.create(FileHandle([]), 'baz.txt')
+        self.assertEqual(resp[0], Stat.NFS_OK)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,7 @@ import unittest
 import json
 from NFS.fhandle import FileHandle
 from NFS.stat import Stat
-from sim.server import Server
+from sim.server import Server, RawFile, Directory
 
 
 class ServerFileOperations(unittest.TestCase):
@@ -214,6 +214,135 @@ class ServerFileOperations(unittest.TestCase):
         self.assertEqual(json.loads(self.server.to_json()),
                          {'dir': {'bar.txt': ''}, 'foo.txt': ''})
 
+    def test_readdir(self):
+        for i in range(20):
+            self.server.create(FileHandle([]), f'file{i:02d}.txt')
+
+        resp = self.server.readdir(FileHandle([]), '', 8192)
+        self.assertEqual(resp[0], Stat.NFS_OK)
+        _, entries, eof = resp
+        self.assertTrue(eof)
+        self.assertEqual([name for name, _ in entries],
+                         sorted(['foo.txt', 'bar.txt',
+                                 *[f'file{i:02d}.txt' for i in range(20)]]))
+
+    def test_readdir_paging(self):
+        for i in range(20):
+            self.server.create(FileHandle([]), f'file{i:02d}.txt')
+
+        names = []
+        cookie = ''
+        while True:
+            resp = self.server.readdir(FileHandle([]), cookie, 100)
+            self.assertEqual(resp[0], Stat.NFS_OK)
+            _, entries, eof = resp
+            self.assertLessEqual(len(entries), 3)
+            names.extend(name for name, _ in entries)
+            if eof:
+                break
+            cookie = entries[-1][1]
+
+            # Entries removed behind the cookie do not disturb the listing
+            self.server.remove(FileHandle([]), entries[0][0])
+
+        self.assertEqual(len(names), 22)
+        self.assertEqual(names, sorted(names))
+
+    def test_vectored(self):
+        fhandle = FileHandle(['foo.txt'])
+        resp = self.server.writev(fhandle, [(4, 'ef'), (0, 'abc'), (1, 'X')])
+        self.assertEqual(resp[0], Stat.NFS_OK)
+        self.assertEqual(resp[1].size, 6)
+
+        resp = self.server.readv(fhandle, [(0, 2), (3, 10), (9, 1)])
+        self.assertEqual(resp[0], Stat.NFS_OK)
+        self.assertEqual(resp[2], ['aX', '\0ef', ''])
+
+        resp = self.server.readv(FileHandle([]), [(0, 1)])
+        self.assertEqual(resp, (Stat.NFSERR_ISDIR,))
+        resp = self.server.writev(FileHandle(['baz.txt']), [(0, 'a')])
+        self.assertEqual(resp, (Stat.NFSERR_NOENT,))
+
+    def test_invalid_readdir(self):
+        resp = self.server.readdir(FileHandle(['foo.txt']), '', 100)
+        self.assertEqual(resp, (Stat.NFSERR_NOTDIR,))
+
+        resp = self.server.readdir(FileHandle(['dir']), '', 100)
+        self.assertEqual(resp, (Stat.NFSERR_NOENT,))
+
+
+class SparseFileOperations(unittest.TestCase):
+    @staticmethod
+    def extents(file: RawFile):
+        return [(start, chunk.data)
+                for start, chunk in zip(file.starts, file.extents)]
+
+    def test_large_offset(self):
+        server = Server()
+        fhandle = FileHandle(['foo.txt'])
+        resp = server.write(fhandle, 1 << 30, 'x')
+        self.assertEqual(resp[1].size, (1 << 30) + 1)
+        self.assertEqual(server.getattr(fhandle)[1].size, (1 << 30) + 1)
+
+        resp = server.read(fhandle, (1 << 30) - 2, 10)
+        self.assertEqual(resp[2], '\0\0x')
+        self.assertEqual(server.root.files['foo.txt'].allocated(), 1)
+
+    def test_extents_merge(self):
+        file = RawFile()
+        file.write(4, 'ef')
+        file.write(10, 'k')
+        self.assertEqual(file.starts, [4, 10])
+        file.write(2, 'cdXgh')  # Covers the first extent
+        self.assertEqual(self.extents(file), [(2, 'cdXgh'), (10, 'k')])
+        file.write(7, 'hij')  # Bridges the hole between both
+        self.assertEqual(self.extents(file), [(2, 'cdXghhijk')])
+        self.assertEqual(file.flatten(), '\0\0cdXghhijk')
+
+    def test_extents_split_at_blocks(self):
+        size = RawFile.EXTENT_SIZE
+        file = RawFile()
+        file.write(size - 2, 'ab')
+        file.write(size, 'cd')  # Touches the extent of the previous block
+        self.assertEqual(self.extents(file), [(size - 2, 'ab'), (size, 'cd')])
+
+        data = ''.join(chr(ord('a') + i % 26) for i in range(3 * size))
+        for i in range(0, len(data), 100):  # Appends
+            file.write(i, data[i:i+100])
+        self.assertEqual(file.starts, [0, size, 2 * size])
+        self.assertEqual(file.flatten(), data)
+
+    def test_punch_hole(self):
+        file = RawFile()
+        file.write(0, 'abcdefgh')
+        file.punch_hole(2, 3)
+        file.punch_hole(7, 10)
+        self.assertEqual(file.flatten(), 'ab\0\0\0fg\0')
+        self.assertEqual(file.size(), 8)
+        self.assertEqual(file.allocated(), 4)
+        self.assertEqual(file.read(1, 3), 'b\0\0')
+
+
+class DirectoryIndex(unittest.TestCase):
+    def test_sorted_index(self):
+        directory = Directory()
+        for name in ['b', 'd', 'a']:
+            directory.link(name, RawFile())
+        directory.unlink('d')
+        directory.link('c', RawFile())
+        directory.link('c', RawFile())  # Replacing keeps one entry
+        self.assertEqual(directory.index, ['a', 'b', 'c'])
+
+        directory.link('e', RawFile())  # Sorts last
+        directory.unlink('a')
+        self.assertEqual(directory.index, ['b', 'c', 'e'])
+
+        server = Server()
+        for name in ['z.txt', 'a.txt']:
+            server.create(FileHandle([]), name)
+        resp = server.readdir(FileHandle([]), 'bar.txt', 100)
+        self.assertEqual([name for name, _ in resp[1]],
+                         ['foo.txt', 'z.txt'])
 
 
 if __name__ == '__main__':
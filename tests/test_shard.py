@@ -0,0 +1,107 @@
+import json
+import unittest
+from NFS.fhandle import FileHandle
+from sim.client_filesys import ClientFileSystem
+from sim.loader import NamespaceLoader
+from sim.request import Request
+from sim.server import Server
+from sim.shard import ShardedServer
+from sim.sim import Sim
+from tests.helpers import run
+
+
+def creator_main(name: str):
+    def main(server):
+        fs = ClientFileSystem(server)
+        fd = yield from fs.create(name)
+        yield from fs.append(fd, 'x')
+        yield from fs.mkdir(name + '.d')
+    return main
+
+
+class ShardedNamespace(unittest.TestCase):
+    def setUp(self):
+        self.mounts = {'foo.txt': 0, 'bar.txt': 1, 'a': 0, 'b': 1}
+        self.cluster = ShardedServer(2, self.mounts)
+        self.fs = ClientFileSystem(self.cluster)
+
+    def test_initial_namespace_partitioned(self):
+        self.assertEqual(list(self.cluster.shards[0].root.files), ['foo.txt'])
+        self.assertEqual(list(self.cluster.shards[1].root.files), ['bar.txt'])
+        self.assertEqual(json.loads(self.cluster.to_json()),
+                         json.loads(Server().to_json()))
+        self.assertEqual(set(self.cluster.root.files), {'foo.txt', 'bar.txt'})
+
+    def test_routing(self):
+        self.assertTrue(run(self.fs.mkdir('/b')))
+        fd = run(self.fs.create('/b/x.txt'))
+        self.assertTrue(run(self.fs.append(fd, 'hi')))
+        fd = run(self.fs.create('/a'))
+        self.assertTrue(run(self.fs.write(fd, 'yo')))
+
+        self.assertEqual(self.cluster.shards[1].root.flatten(),
+                         {'bar.txt': '', 'b': {'x.txt': 'hi'}})
+        self.assertEqual(self.cluster.shards[0].root.flatten(),
+                         {'foo.txt': '', 'a': 'yo'})
+
+        fd = run(self.fs.open('/b/x.txt'))
+        self.assertEqual(run(self.fs.read(fd, 10)), 'hi')
+        self.assertEqual(run(self.fs.size(fd)), 2)
+
+    def test_listdir_root_spans_shards(self):
+        run(self.fs.mkdir('/b'))
+        run(self.fs.create('/a'))
+        self.assertEqual(run(self.fs.listdir('/')),
+                         ['a', 'b', 'bar.txt', 'foo.txt'])
+        self.assertEqual(run(self.fs.listdir('/b')), [])
+
+    def test_consistent_hashing(self):
+        names = [f'n{i}' for i in range(400)]
+        two = ShardedServer(2)
+        three = ShardedServer(3)
+        owners = [two.owner(name) for name in names]
+        self.assertEqual(owners, [ShardedServer(2).owner(n) for n in names])
+        self.assertEqual(set(owners), {0, 1})
+
+        # Adding a shard only moves names onto the new shard
+        moved = [n for n in names if two.owner(n) != three.owner(n)]
+        self.assertTrue(all(three.owner(n) == 2 for n in moved))
+        self.assertLess(len(moved), len(names) * 2 // 3)
+
+    def test_cross_shard_requests_commute(self):
+        s0, s1 = self.cluster.shards
+        readdir = Request(Request.Type.READDIR, s0.readdir, FileHandle([]),
+                          '', 4096)
+        create = Request(Request.Type.CREATE, s1.create, FileHandle([]), 'b')
+        self.assertTrue(readdir.commutes_with(create))
+
+        # On a single server the same pair conflicts
+        server = Server()
+        readdir = Request(Request.Type.READDIR, server.readdir,
+                          FileHandle([]), '', 4096)
+        create = Request(Request.Type.CREATE, server.create, FileHandle([]),
+                         'b')
+        self.assertFalse(readdir.commutes_with(create))
+
+    def test_sim(self):
+        mains = [creator_main('/a'), creator_main('/b')]
+        mounts = {**self.mounts, 'a.d': 0, 'b.d': 1}
+        sim = Sim(mains, server_factory=ShardedServer.factory(2, mounts))
+        sim.explore()
+        self.assertEqual(len(sim.results), 1)
+        res = next(iter(sim.results))
+        self.assertEqual(json.loads(res.server_json),
+                         {'foo.txt': '', 'a': 'x', 'a.d': {},
+                          'bar.txt': '', 'b': 'x', 'b.d': {}})
+
+    def test_sim_loaded_namespace(self):
+        loader = NamespaceLoader.from_dict({'a': {}, 'b': {'c': 'y'}})
+        mains = [creator_main('/a/n'), creator_main('/b/n')]
+        sim = Sim(mains, server_factory=ShardedServer.factory(
+            2, {'a': 0, 'b': 1}, loader.factory()))
+        sim.explore()
+        self.assertEqual(len(sim.results), 1)
+        res = next(iter(sim.results))
+        flat = json.loads(res.server_json)
+        self.assertEqual(flat['a'], {'n': 'x', 'n.d': {}})
+        self.assertEqual(flat['b'], {'c': 'y', 'n': 'x', 'n.d': {}})
@@ -0,0 +1,161 @@
+import json
+import mmap
+import os
+import tempfile
+import unittest
+from NFS.fhandle import FileHandle
+from NFS.stat import Stat
+from sim.server import Server
+from sim.storage import MmapStorage, ExtentAllocator
+
+
+class ExtentAllocatorOperations(unittest.TestCase):
+    def test_first_fit_and_coalesce(self):
+        allocator = ExtentAllocator()
+        a = allocator.allocate(10)
+        b = allocator.allocate(20)
+        c = allocator.allocate(30)
+        self.assertEqual((a, b, c), (0, 10, 30))
+
+        allocator.release(a, 10)
+        allocator.release(b, 20)
+        self.assertEqual(allocator.free, [(0, 30)])
+        self.assertEqual(allocator.allocate(25), 0)
+
+        allocator.release(c, 30)
+        self.assertEqual(allocator.free, [(25, 35)])
+        self.assertEqual(allocator.allocate(40), 25)
+        self.assertEqual(allocator.end, 65)
+
+    def test_from_used(self):
+        allocator = ExtentAllocator.from_used([(40, 10), (0, 8)])
+        self.assertEqual(allocator.free, [(8, 32)])
+        self.assertEqual(allocator.end, 50)
+
+
+class MmapStorageOperations(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = MmapStorage(self.tmp.name, initial_size=256)
+        self.server = Server(storage=self.storage)
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp.cleanup()
+
+    def reopen(self):
+        self.server.sync()
+        self.storage.close()
+        self.storage = MmapStorage(self.tmp.name, initial_size=256)
+        self.server = Server(storage=self.storage)
+
+    def test_fresh_image_has_default_files(self):
+        self.assertEqual(json.loads(self.server.to_json()),
+                         {'foo.txt': '', 'bar.txt': ''})
+
+    def test_read_write(self):
+        fhandle = FileHandle(['foo.txt'])
+        self.server.write(fhandle, 0, "Hello, world!")
+        self.server.write(fhandle, 2, "abcdefg")
+        self.server.write(fhandle, 15, "x")
+
+        resp = self.server.read(fhandle, 0, 100)
+        self.assertEqual(resp[0], Stat.NFS_OK)
+        self.assertEqual(resp[1].size, 16)
+        self.assertEqual(resp[2], "Heabcdefgrld!\0\0x")
+
+    def test_writev(self):
+        fhandle = FileHandle(['foo.txt'])
+        self.server.writev(fhandle, [(0, 'ab'), (300, 'z'), (1, 'B')])
+        resp = self.server.readv(fhandle, [(0, 3), (300, 5)])
+        self.assertEqual(resp[2], ['aB\0', 'z'])
+
+    def test_growth_beyond_initial_size(self):
+        fhandle = FileHandle(['foo.txt'])
+        size = mmap.PAGESIZE + 1000  # The data file starts at one page
+        data = ''.join(chr(ord('a') + i % 26) for i in range(size))
+        for i in range(0, len(data), 100):
+            self.server.write(fhandle, i, data[i:i+100])
+
+        self.assertEqual(self.server.read(fhandle, 0, 2 * size)[2], data)
+        self.assertGreaterEqual(len(self.storage._mm), size)
+
+    def test_persistence(self):
+        self.server.mkdir(FileHandle([]), 'dir')
+        self.server.create(FileHandle(['dir']), 'a.txt')
+        self.server.write(FileHandle(['dir', 'a.txt']), 0, "persisted")
+        self.server.write(FileHandle(['foo.txt']), 0, "foo")
+        self.server.remove(FileHandle([]), 'bar.txt')
+        self.reopen()
+
+        self.assertEqual(json.loads(self.server.to_json()),
+                         {'foo.txt': 'foo', 'dir': {'a.txt': 'persisted'}})
+
+        # The reloaded allocator must not hand out extents still in use
+        self.server.create(FileHandle([]), 'new.txt')
+        self.server.write(FileHandle(['new.txt']), 0, "new")
+        self.assertEqual(json.loads(self.server.to_json()),
+                         {'foo.txt': 'foo', 'new.txt': 'new',
+                          'dir': {'a.txt': 'persisted'}})
+
+    def test_remove_frees_extent(self):
+        self.server.write(FileHandle(['bar.txt']), 0, "bar")
+        offset = self.server.root.files['bar.txt'].offset
+        self.server.remove(FileHandle([]), 'bar.txt')
+        self.server.sync()  # The image no longer points at the extent
+
+        self.server.create(FileHandle([]), 'baz.txt')
+        self.server.write(FileHandle(['baz.txt']), 2, "z")
+        self.assertEqual(self.server.root.files['baz.txt'].offset, offset)
+        self.assertEqual(self.server.read(FileHandle(['baz.txt']), 0, 10)[2],
+                         "\0\0z")
+
+    def test_crash_keeps_synced_data(self):
+        foo, bar = FileHandle(['foo.txt']), FileHandle(['bar.txt'])
+        self.server.write(foo, 0, 'A' * 10)
+        self.server.sync()
+        self.server.write(foo, 10, 'a' * 100)  # Moves foo.txt to a new extent
+        self.server.write(bar, 0, 'B' * 10)
+
+        # Reopen without syncing, as after a crash
+        self.storage.close()
+        self.storage = MmapStorage(self.tmp.name, initial_size=256)
+        self.server = Server(storage=self.storage)
+        self.assertEqual(json.loads(self.server.to_json()),
+                         {'foo.txt': 'A' * 10, 'bar.txt': ''})
+
+    def test_data_beyond_latin1(self):
+        fhandle = FileHandle(['foo.txt'])
+        self.server.write(fhandle, 0, 'ab')
+        file = self.server.root.files['foo.txt']
+        extent = file.offset, file.capacity
+
+        self.assertEqual(self.server.write(fhandle, 0, 'x' * 100 + '\u20ac'),
+                         (Stat.NFSERR_IO,))
+        resp = self.server.writev(fhandle, [(0, 'c'), (1, '\u20ac')])
+        self.assertEqual(resp, (Stat.NFSERR_IO,))
+        self.assertEqual((file.offset, file.capacity), extent)
+        self.assertEqual(self.server.read(fhandle, 0, 10)[2], 'ab')
+
+    def test_empty_initial_size(self):
+        storage = MmapStorage(os.path.join(self.tmp.name, 'empty'),
+                              initial_size=0)
+        server = Server(storage=storage)
+        server.write(FileHandle(['foo.txt']), 0, 'x')
+        self.assertEqual(server.read(FileHandle(['foo.txt']), 0, 1)[2], 'x')
+        storage.close()
+
+    def test_mapped_file_attributes(self):
+        file = self.server.root.files['foo.txt']
+        self.assertEqual((file.starts, file.extents), ([], []))
+
+    def test_not_sparse(self):
+        file = self.server.root.files['foo.txt']
+        file.write(1000, 'x')
+        file.punch_hole(0, 1001)
+        self.assertEqual(file.allocated(), file.size())
+        self.assertEqual(file.flatten(), '\0' * 1001)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from sim.sim import Sim
+from sim.strategy import Strategy, ConflictFirst, FewestExplored, \
+    RandomRestart
+from tests.helpers import appender_main, reader_main
+
+
+class ExplorationStrategies(unittest.TestCase):
+    def setUp(self):
+        self.mains = [appender_main('1', times=2), appender_main('2')]
+        self.expected = Sim(self.mains)
+        self.expected.explore()
+
+    def test_same_results(self):
+        for strategy in [Strategy(), ConflictFirst(), FewestExplored(),
+                         RandomRestart(restarts=4, seed=7)]:
+            sim = Sim(self.mains)
+            sim.explore(strategy=strategy)
+            self.assertEqual(sim.results, self.expected.results)
+
+    def test_time_to_k(self):
+        n = len(self.expected.results)
+        self.assertEqual(len(self.expected.discovery_times), n)
+        self.assertEqual(self.expected.time_to(0), 0.0)
+        self.assertIsNone(self.expected.time_to(n + 1))
+        self.assertLessEqual(self.expected.time_to(1),
+                             self.expected.time_to(n))
+
+    def test_random_restart_is_seeded(self):
+        hists = []
+        for _ in range(2):
+            sim = Sim(self.mains)
+            sim.explore(strategy=RandomRestart(restarts=2, seed=3))
+            hists.append([res.hist for res in sim.results])
+        self.assertEqual(sorted(hists[0]), sorted(hists[1]))
+
+    def test_conflict_first_order(self):
+        sim = Sim([appender_main('1'), reader_main(), appender_main('2')])
+        execution, _ = sim._replay([0, 0, 1, 2, 2])
+        # Processes 0 and 2 are about to extend the file whose size process 2
+        # just read, while process 1 reads another file
+        self.assertEqual(ConflictFirst().order([0, 0, 1, 2, 2], execution),
+                         [0, 2, 1])
+
+    def test_fewest_explored_rotates(self):
+        strategy = FewestExplored()
+        sim = Sim(self.mains)
+        execution, _ = sim._replay([])
+        self.assertEqual(strategy.order([], execution), [0, 1])
+        execution, _ = sim._replay([0])
+        strategy.order([0], execution)
+        execution, _ = sim._replay([])
+        self.assertEqual(strategy.order([], execution), [1, 0])
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from sim.sim import Sim
+from sim.loader import NamespaceLoader
+from sim.trace import Trace, TraceExporter, TraceMismatch, read_traces, \
+    replay, bench
+from tests.helpers import appender_main, reader_main
+
+
+def creator_main(s: str):
+    return appender_main(s, path='/baz.txt', create=True)
+
+
+class ScheduleTraces(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'traces.bin')
+        self.mains = [creator_main('1'), creator_main('2')]
+
+        with TraceExporter(self.path) as exporter:
+            self.sim = Sim(self.mains, exporters=[exporter])
+            self.sim.explore()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_encode_decode(self):
+        trace = Trace([0, 1, 1, 0], [0, 2 ** 32 - 1, 300, 5])
+        decoded = Trace.decode(trace.encode())
+        self.assertEqual(decoded.pids, trace.pids)
+        self.assertEqual(decoded.digests, trace.digests)
+
+    def test_replay_reproduces_results(self):
+        traces = list(read_traces(self.path))
+        self.assertEqual(len(traces), len(self.sim.results))
+
+        replayed = {replay(self.mains, trace) for trace in traces}
+        self.assertEqual(replayed, self.sim.results)
+
+    def test_nondeterministic_main_detected(self):
+        trace = next(read_traces(self.path))
+        mains = [creator_main('1'), creator_main('3')]
+        with self.assertRaises(TraceMismatch):
+            replay(mains, trace)
+
+        # Without verification the replay goes through
+        replay(mains, trace, verify=False)
+
+    def test_bench(self):
+        stats = bench(self.mains, self.path, repeat=2)
+        self.assertEqual(stats['traces'], 2 * len(self.sim.results))
+        self.assertEqual(stats['steps'], 2 * sum(
+            len(t) for t in read_traces(self.path)))
+
+    def test_server_factory(self):
+        loader = NamespaceLoader.from_dict({'data': {'b.txt': 'xyz'}})
+        mains = [reader_main('/data/b.txt'), creator_main('1')]
+        path = os.path.join(self.tmp.name, 'loaded.bin')
+        with TraceExporter(path) as exporter:
+            sim = Sim(mains, exporters=[exporter],
+                      server_factory=loader.factory())
+            sim.explore()
+
+        replayed = {replay(mains, trace, server_factory=loader.factory())
+                    for trace in read_traces(path)}
+        self.assertEqual(replayed, sim.results)
+        stats = bench(mains, path, server_factory=loader.factory())
+        self.assertEqual(stats['traces'], len(sim.results))
+
+
+if __name__ == '__main__':
+    unittest.main()
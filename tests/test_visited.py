@@ -0,0 +1,81 @@
+import multiprocessing
+import unittest
+from sim.sim import Sim
+from sim.visited import SharedVisitedTable
+from tests.helpers import appender_main
+
+
+def insert_range(table: SharedVisitedTable, start: int, stop: int):
+    fresh = sum(table.insert(fp) for fp in range(start, stop))
+    table.close()
+    return fresh
+
+
+class SharedVisited(unittest.TestCase):
+    def setUp(self):
+        self.table = SharedVisitedTable(capacity=1000)
+
+    def tearDown(self):
+        self.table.close()
+
+    def test_insert_if_absent(self):
+        self.assertEqual(self.table.capacity, 1024)
+        self.assertTrue(self.table.insert(5))
+        self.assertFalse(self.table.insert(5))
+        self.assertTrue(self.table.contains(5))
+        self.assertFalse(self.table.contains(6))
+
+        # Colliding fingerprints probe to the next slot
+        self.assertTrue(self.table.insert(5 + self.table.capacity))
+        self.assertTrue(self.table.contains(5 + self.table.capacity))
+        self.assertEqual(self.table.stats()['collisions'], 1)
+        self.assertEqual(len(self.table), 2)
+
+    def test_full_table_never_prunes(self):
+        with SharedVisitedTable(capacity=2) as table:
+            self.assertTrue(table.insert(1))
+            self.assertTrue(table.insert(2))
+            self.assertTrue(table.insert(3))
+            self.assertTrue(table.insert(3))
+            self.assertEqual(table.stats()['overflows'], 2)
+            self.assertEqual(table.stats()['fill_ratio'], 1.0)
+
+    def test_len_spans_scan_windows(self):
+        capacity = 4 * SharedVisitedTable.SCAN_SLOTS
+        with SharedVisitedTable(capacity=capacity) as table:
+            for fp in range(1, capacity, 7):
+                table.insert(fp)
+            self.assertEqual(len(table), len(range(1, capacity, 7)))
+
+    def test_attach_by_name(self):
+        self.table.add('01*1')
+        with SharedVisitedTable(name=self.table.name) as other:
+            self.assertIn('01*1', other)
+            other.add('10')
+        self.assertIn('10', self.table)
+        self.assertNotIn('01', self.table)
+
+    def test_workers_share_table(self):
+        with multiprocessing.Pool(2) as pool:
+            fresh = pool.starmap(insert_range, [(self.table, 1, 501),
+                                                (self.table, 1, 501)])
+        # A fingerprint may be claimed by both workers in a race, but since
+        # they store the same value it is never lost
+        self.assertGreaterEqual(sum(fresh), 500)
+        for fp in range(1, 501):
+            self.assertTrue(self.table.contains(fp))
+
+    def test_sim_prunes_against_shared_memo(self):
+        mains = [appender_main('1'), appender_main('2')]
+        expected = Sim(mains)
+        expected.explore()
+
+        sim = Sim(mains, memo=self.table)
+        sim.explore()
+        self.assertEqual(sim.results, expected.results)
+        self.assertGreater(self.table.stats()['fill_ratio'], 0)
+
+        # Every subtree has been searched already
+        again = Sim(mains, memo=self.table)
+        again.explore()
+        self.assertEqual(len(again.results), 0)
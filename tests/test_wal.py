@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from NFS.fhandle import FileHandle
+from NFS.stat import Stat
+from sim.server import Server
+from sim.wal import WriteAheadLog
+
+
+class WriteAheadLogOperations(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.wal = WriteAheadLog(self.tmp.name, window=0)
+        self.server = Server(wal=self.wal)
+
+    def tearDown(self):
+        self.wal.close()
+        self.tmp.cleanup()
+
+    def restart(self, **kwargs):
+        self.wal.close()
+        self.wal = WriteAheadLog(self.tmp.name, **kwargs)
+        self.server = Server(wal=self.wal)
+
+    def populate(self):
+        self.server.mkdir(FileHandle([]), 'dir')
+        self.server.create(FileHandle(['dir']), 'a.txt')
+        self.server.write(FileHandle(['dir', 'a.txt']), 0, "hello")
+        self.server.write(FileHandle(['dir', 'a.txt']), 3, "p!")
+        self.server.remove(FileHandle([]), 'bar.txt')
+        self.server.mkdir(FileHandle([]), 'tmp')
+        self.server.rmdir(FileHandle([]), 'tmp')
+        return json.loads(self.server.to_json())
+
+    def test_replay(self):
+        state = self.populate()
+        self.assertEqual(state, {'foo.txt': '', 'dir': {'a.txt': 'help!'}})
+        self.assertEqual(self.wal.records, 7)
+
+        self.restart()
+        self.assertEqual(json.loads(self.server.to_json()), state)
+
+    def test_replay_writev(self):
+        self.server.writev(FileHandle(['foo.txt']), [(2, 'cd'), (0, 'ab')])
+        self.restart()
+        self.assertEqual(json.loads(self.server.to_json())['foo.txt'], 'abcd')
+
+    def test_failed_ops_not_logged(self):
+        resp = self.server.create(FileHandle([]), 'foo.txt')
+        self.assertEqual(resp[0], Stat.NFSERR_EXIST)
+        resp = self.server.rmdir(FileHandle([]), 'nodir')
+        self.assertEqual(resp, Stat.NFSERR_NOENT)
+        self.assertEqual(self.wal.records, 0)
+
+    def test_torn_tail_ignored(self):
+        state = self.populate()
+        self.wal.close()
+        segs = sorted(f for f in os.listdir(self.tmp.name) if f.endswith('.log'))
+        with open(os.path.join(self.tmp.name, segs[-1]), 'ab') as f:
+            f.write(b'0000dead ["create", [], "torn')
+
+        self.restart()
+        self.assertEqual(json.loads(self.server.to_json()), state)
+
+    def test_compaction(self):
+        state = self.populate()
+        self.wal.compact(background=False)
+        self.assertEqual(self.wal.compactions, 1)
+
+        self.server.create(FileHandle([]), 'after.txt')
+        state['after.txt'] = ''
+
+        self.restart()
+        self.assertEqual(json.loads(self.server.to_json()), state)
+        segs = [f for f in os.listdir(self.tmp.name) if f.endswith('.log')]
+        self.assertEqual(len(segs), 2)  # Segment after compaction + new one
+
+    def test_background_compaction(self):
+        self.restart(window=0, compact_bytes=256)
+        for i in range(20):
+            self.server.create(FileHandle([]), f'f{i}.txt')
+        state = json.loads(self.server.to_json())
+
+        self.restart()
+        self.assertTrue(os.path.exists(
+            os.path.join(self.tmp.name, WriteAheadLog.SNAPSHOT)))
+        self.assertEqual(json.loads(self.server.to_json()), state)
+
+    def test_group_commit(self):
+        self.restart(window=0.01)
+        server = Server(concurrent=True, wal=self.wal)
+        n_threads, n_ops = 8, 10
+
+        def work(i):
+            server.mkdir(FileHandle([]), f'd{i}')
+            for j in range(n_ops):
+                server.create(FileHandle([f'd{i}']), f'f{j}')
+
+        threads = [threading.Thread(target=work, args=(i,))
+                   for i in range(n_threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(self.wal.records, n_threads * (n_ops + 1))
+        self.assertLess(self.wal.fsyncs, self.wal.records)
+
+        state = json.loads(server.to_json())
+        self.restart()
+        self.assertEqual(json.loads(self.server.to_json()), state)
+
+
+if __name__ == '__main__':
+    unittest.main()
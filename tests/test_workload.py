@@ -0,0 +1,82 @@
+import unittest
+from collections import Counter
+from sim.sim import Sim
+from sim.workload import Workload, WorkloadSpec, sweep
+
+
+class SyntheticWorkloads(unittest.TestCase):
+    def test_reproducible(self):
+        spec = WorkloadSpec(processes=3, ops=5, seed=42)
+        a = Workload.generate(spec)
+        b = Workload.generate(WorkloadSpec(processes=3, ops=5, seed=42))
+        self.assertEqual(a.programs, b.programs)
+        self.assertEqual(len(a.programs), 3)
+        self.assertTrue(all(len(p) == 5 for p in a.programs))
+
+        c = Workload.generate(spec.replace(seed=43))
+        self.assertNotEqual(a.programs, c.programs)
+
+    def test_json_round_trip(self):
+        workload = Workload.generate(WorkloadSpec(seed=1))
+        loaded = Workload.from_json(workload.to_json())
+        self.assertEqual(loaded.programs, workload.programs)
+        self.assertEqual(loaded.spec.to_dict(), workload.spec.to_dict())
+
+        # The loaded mains behave exactly like the generated ones
+        sims = [Sim(w.mains()) for w in [workload, loaded]]
+        for sim in sims:
+            sim.explore()
+        self.assertEqual(sims[0].results, sims[1].results)
+
+    def test_op_mix(self):
+        spec = WorkloadSpec(processes=1, ops=200,
+                            mix={'append': 1, 'mkdir': 1})
+        program = Workload.generate(spec).programs[0]
+        ops = Counter(op[0] for op in program)
+        self.assertEqual(set(ops), {'append', 'mkdir'})
+        for op in program:
+            if op[0] == 'append':
+                self.assertTrue(1 <= len(op[2]) <= 3)
+                self.assertEqual(set(op[2]), {'a'})
+            else:
+                self.assertIn(op[1], {'/d0', '/d1'})
+
+    def test_path_distributions(self):
+        hot = WorkloadSpec(processes=1, ops=500, mix={'read': 1},
+                           hot_fraction=1.0)
+        paths = {op[1] for op in Workload.generate(hot).programs[0]}
+        self.assertEqual(paths, {'/foo.txt', '/bar.txt'})
+
+        zipf = hot.replace(distribution='zipf', zipf_s=2.0)
+        paths = Counter(op[1] for op in Workload.generate(zipf).programs[0])
+        self.assertGreater(paths['/foo.txt'], paths['/bar.txt'])
+        self.assertGreater(paths['/bar.txt'], paths['/d1/f2.txt'])
+
+    def test_invalid_spec(self):
+        with self.assertRaises(ValueError):
+            WorkloadSpec(mix={'truncate': 1})
+        with self.assertRaises(ValueError):
+            WorkloadSpec(distribution='uniform')
+        with self.assertRaises(ValueError):
+            WorkloadSpec(ops=0)
+
+    def test_sweep(self):
+        specs = list(sweep(WorkloadSpec(), processes=[2, 3],
+                           seed=range(4)))
+        self.assertEqual(len(specs), 8)
+        self.assertEqual({(s.processes, s.seed) for s in specs},
+                         {(p, s) for p in [2, 3] for s in range(4)})
+
+    def test_all_ops_run(self):
+        programs = [[['mkdir', '/d0'], ['create', '/d0/f0.txt'],
+                     ['write', '/d0/f0.txt', 'xyz'], ['seek', '/d0/f0.txt', 1],
+                     ['write', '/d0/f0.txt', 'a'], ['append', '/foo.txt', 'b'],
+                     ['read', '/foo.txt', 1], ['open', '/bar.txt'],
+                     ['remove', '/bar.txt'], ['mkdir', '/d1'],
+                     ['rmdir', '/d1'], ['read', '/missing.txt', 1]]]
+        sim = Sim(Workload(WorkloadSpec(), programs).mains())
+        sim.explore()
+        self.assertEqual(len(sim.results), 1)
+        res = next(iter(sim.results))
+        self.assertEqual(res.server_json,
+                         '{"foo.txt": "b", "d0": {"f0.txt": "xaz"}}')